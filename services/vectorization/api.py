@@ -5,17 +5,84 @@ A generic text→vector service with NO knowledge of music schemas.
 TypeScript handles domain-specific extraction, Python just embeds text.
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
 import torch
 import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
-from enum import Enum
 
-app = FastAPI(title="Text Vectorization API")
+from model_registry import (
+    MODEL_DIMENSIONS, MODEL_NAMES, MODEL_REVISIONS, SENTIMENT_MODEL_NAME, ModelType, model_fingerprint, model_source
+)
+from projection import ProjectionRegistry, Projection, evaluate_projection, fit_projection
+from vector_store import VectorStore
+from pq_codec import PQIndex, PQRegistry, ProductQuantizer, evaluate_quantizer
+from playlist_centroids import PlaylistCentroids
+from playlist_profiles import PlaylistProfiles
+from embedding_jobs import TERMINAL_STATUSES, InteractiveGate, JobQueue, JobWorker
+from profiling import RequestProfiler, server_timing_header, stage, start_timing
+from tokenization import TokenCache
+from hybrid import combine_components, resolve_weights, stack_components
+from scheduler import Overloaded, Scheduler
+from migration import hybrid_source, migration_status, start_migration
+from vad_features import VADAnchors
+from long_text import POOLING_MODES, compare_to_truncated, pool_windows, tokenize_windows
+from sentiment_head import SENTIMENT_LABELS, SentimentHead, SentimentHeadRegistry, fit_sentiment_head
+from model_store import CLASSIFIER, ENCODER, ModelStore
+from traffic_capture import TrafficCapture
+from arrow_io import FORMATS, MEDIA_TYPES, export_table, import_snapshot, iter_snapshot, read_snapshot
+from cancellation import (
+    DEADLINE, TIMEOUT_HEADER, CancellationStats, Cancelled, CancelToken, check_cancelled, checkpoint, set_token
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler.start()
+    job_worker.start()
+
+    # Embed the VAD keyword anchors before traffic arrives
+    for model_type in ModelType:
+        await scheduler.run(model_type.value, "bulk", get_vad_anchors, model_type)
+
+    # Optional gRPC transport sharing this process's models and scheduler
+    grpc_server = None
+    grpc_port = os.environ.get("VECTORIZATION_GRPC_PORT")
+    if grpc_port:
+        from grpc_server import create_server
+        grpc_server = create_server(sys.modules[__name__], int(grpc_port))
+        grpc_server.start()
+        print(f"gRPC transport listening on port {grpc_port}")
+
+    yield
+
+    if grpc_server is not None:
+        grpc_server.stop(grace=2)
+    job_worker.stop()
+    scheduler.stop()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response whose encoding time shows up as the `render` stage"""
+
+    def render(self, content) -> bytes:
+        with stage("render"):
+            return super().render(content)
+
+
+app = FastAPI(title="Text Vectorization API", lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,54 +90,114 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
+)
+
+
+# Persisted service state (projections, ...) lives here
+DATA_DIR = os.environ.get(
+    "VECTORIZATION_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 )
 
+os.makedirs(DATA_DIR, exist_ok=True)
+projections = ProjectionRegistry(os.path.join(DATA_DIR, "projections"))
+sentiment_heads = SentimentHeadRegistry(os.path.join(DATA_DIR, "sentiment_heads"))
+store = VectorStore(os.path.join(DATA_DIR, "vectors.db"))
+pq_indexes = PQRegistry(os.path.join(DATA_DIR, "pq"))
+centroids = PlaylistCentroids(store)
+profiles = PlaylistProfiles(centroids)
+profiler = RequestProfiler(os.path.join(DATA_DIR, "profiles"))
+
+# Request log for replay.py: VECTORIZATION_CAPTURE=1 (text hashes) or "payloads", or /admin/capture
+capture = TrafficCapture(os.path.join(DATA_DIR, "captures"))
+if os.environ.get("VECTORIZATION_CAPTURE", "0") not in ("", "0"):
+    capture.start(include_payloads=os.environ["VECTORIZATION_CAPTURE"] == "payloads")
+
 
-class ModelType(str, Enum):
-    GENERAL = "general"
-    CREATIVE = "creative"
-    SEMANTIC = "semantic"
-    FAST = "fast"
+# Prepared copies with memory-mapped weights start much faster (see model_store.py)
+MODEL_STORE_DIR = os.environ.get("VECTORIZATION_MODEL_STORE")
+model_store = ModelStore(MODEL_STORE_DIR) if MODEL_STORE_DIR else None
+
+
+def load_pretrained(name: str, kind: str = ENCODER, revision: Optional[str] = None):
+    """(tokenizer, model) from the model store when configured, otherwise from the hub"""
+    if model_store is not None:
+        return model_store.load(name, kind, revision)
+    model_class = AutoModelForSequenceClassification if kind == CLASSIFIER else AutoModel
+    return (AutoTokenizer.from_pretrained(model_source(name), revision=revision),
+            model_class.from_pretrained(model_source(name), revision=revision))
 
 
 # Load models
 print("Loading models...")
+load_started = time.perf_counter()
 models = {
-    ModelType.GENERAL: {
-        "tokenizer": AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2"),
-        "model": AutoModel.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
-    },
-    ModelType.CREATIVE: {
-        "tokenizer": AutoTokenizer.from_pretrained("sentence-transformers/all-mpnet-base-v2"),
-        "model": AutoModel.from_pretrained("sentence-transformers/all-mpnet-base-v2")
-    },
-    ModelType.SEMANTIC: {
-        "tokenizer": AutoTokenizer.from_pretrained("sentence-transformers/multi-qa-mpnet-base-dot-v1"),
-        "model": AutoModel.from_pretrained("sentence-transformers/multi-qa-mpnet-base-dot-v1")
-    },
-    ModelType.FAST: {
-        "tokenizer": AutoTokenizer.from_pretrained("sentence-transformers/paraphrase-MiniLM-L3-v2"),
-        "model": AutoModel.from_pretrained("sentence-transformers/paraphrase-MiniLM-L3-v2")
-    }
+    model_type: dict(zip(("tokenizer", "model"), load_pretrained(name, ENCODER, MODEL_REVISIONS[model_type])))
+    for model_type, name in MODEL_NAMES.items()
 }
-
-sentiment_tokenizer = AutoTokenizer.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment-latest")
-sentiment_model = AutoModelForSequenceClassification.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment-latest")
-print("Models loaded successfully!")
+for model_info in models.values():
+    model_info["tokens"] = TokenCache(model_info["tokenizer"])
+
+# Every stored or returned embedding is tagged with its model's fingerprint;
+# the resolved hub commit pins "main" to the exact weights that were loaded
+fingerprints = {
+    model_type: model_fingerprint(
+        model_type, getattr(info["model"].config, "_commit_hash", None), info["tokens"].max_length
+    )
+    for model_type, info in models.items()
+}
+for model_type, spec in fingerprints.items():
+    store.register_fingerprint(model_type.value, spec)
+
+sentiment_tokenizer, sentiment_model = load_pretrained(SENTIMENT_MODEL_NAME, CLASSIFIER)
+sentiment_tokens = TokenCache(sentiment_tokenizer)
+print(f"Models loaded successfully in {time.perf_counter() - load_started:.2f}s"
+      f"{' (model store)' if model_store is not None else ''}!")
+
+# Inference runs on one worker per model with bounded interactive/bulk lanes;
+# batches larger than INTERACTIVE_BATCH_LIMIT go to the bulk lane in slices
+INTERACTIVE_BATCH_LIMIT = 32
+BULK_SLICE_SIZE = 32
+scheduler = Scheduler(
+    [model_type.value for model_type in ModelType] + ["sentiment"],
+    interactive_capacity=int(os.environ.get("VECTORIZATION_INTERACTIVE_QUEUE", 64)),
+    bulk_capacity=int(os.environ.get("VECTORIZATION_BULK_QUEUE", 256)),
+)
 
 
 # =============================================================================
 # Request/Response Models
 # =============================================================================
 
+class LongTextOptions(BaseModel):
+    """Embed texts as overlapping token windows instead of truncating at max_length (see long_text.py)"""
+    window: int = 128  # Tokens per window, without special tokens
+    overlap: int = 32
+    pooling: str = "weighted"  # "weighted" (by window token count) or "mean"
+
+
 class EmbedRequest(BaseModel):
     text: str
     model_type: ModelType = ModelType.GENERAL
+    dimensions: Optional[int] = None  # Reduced output dimension, needs a fitted projection
+    include_vad: bool = False  # Also return valence/arousal/dominance features
+    long_text: Optional[LongTextOptions] = None
 
 
 class EmbedBatchRequest(BaseModel):
     texts: List[str]
     model_type: ModelType = ModelType.GENERAL
+    dimensions: Optional[int] = None
+    include_vad: bool = False
+    long_text: Optional[LongTextOptions] = None
+
+
+class LongTextEvaluateRequest(BaseModel):
+    """Texts to embed both windowed and truncated, for the quality/cost report"""
+    texts: List[str]
+    model_type: ModelType = ModelType.GENERAL
+    long_text: LongTextOptions = LongTextOptions()
 
 
 class HybridEmbedRequest(BaseModel):
@@ -80,10 +207,33 @@ class HybridEmbedRequest(BaseModel):
     """
     texts: Dict[str, str]  # {"metadata": "...", "analysis": "...", "context": "..."}
     weights: Optional[Dict[str, float]] = None  # Optional custom weights
+    dimensions: Optional[int] = None
+    item_id: Optional[str] = None  # Store the component embeddings under this id
+    include_vad: bool = False
+
+
+class HybridBatchRequest(BaseModel):
+    """Several items to embed like /embed/hybrid, with shared weights"""
+    items: List[Dict[str, str]]
+    weights: Optional[Dict[str, float]] = None
+    dimensions: Optional[int] = None
+    item_ids: Optional[List[str]] = None  # Store each item's component embeddings under its id
+    include_vad: bool = False
+
+
+class HybridReweightRequest(BaseModel):
+    """New category weights applied to stored component embeddings"""
+    weights: Dict[str, float]
+    item_ids: Optional[List[str]] = None  # None re-weights every item with stored components
+    dimensions: Optional[int] = None
+    store: bool = False  # Write the re-weighted vectors into the vector store
+    include_embeddings: bool = True
 
 
 class SentimentRequest(BaseModel):
     text: str
+    # Predict from this embedding model's fitted sentiment head instead of the full sentiment model
+    head: Optional[ModelType] = None
 
 
 class SentimentResponse(BaseModel):
@@ -97,6 +247,126 @@ class SimilarityRequest(BaseModel):
     vec2: List[float]
 
 
+class SentimentHeadFitRequest(BaseModel):
+    """Corpus texts to distil the sentiment model into a head on an embedding model"""
+    texts: List[str]
+    model_type: ModelType = ModelType.GENERAL
+    hidden: int = Field(0, ge=0, le=1024)  # Hidden units; 0 fits a linear (softmax regression) head
+    holdout: float = Field(0.2, ge=0, lt=1)  # Fraction of the corpus kept out of fitting for the agreement report
+    epochs: int = Field(300, ge=1, le=10000)
+
+
+class EmbedSentimentRequest(BaseModel):
+    texts: List[str]
+    model_type: ModelType = ModelType.GENERAL
+    dimensions: Optional[int] = None
+
+
+class ProjectionFitRequest(BaseModel):
+    """Corpus texts to fit PCA projections from, one per target dimension"""
+    texts: List[str]
+    model_type: ModelType = ModelType.CREATIVE
+    target_dims: List[int] = [128, 256]
+    k: int = Field(10, ge=1)  # Neighbourhood size for the retrieval-quality report
+
+
+class StoredItem(BaseModel):
+    """An item to store: either pre-computed embedding or text to embed"""
+    item_id: str
+    text: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+
+class VectorUpsertRequest(BaseModel):
+    items: List[StoredItem]
+    model_type: ModelType = ModelType.CREATIVE
+    fingerprint: Optional[str] = None  # Fingerprint the pre-computed embeddings were returned with
+
+
+class PQTrainRequest(BaseModel):
+    model_type: ModelType = ModelType.CREATIVE
+    num_subspaces: Optional[int] = None  # Bytes per code; defaults to dim / 16
+    num_centroids: int = 256
+    iterations: int = 20
+
+
+class PQEncodeRequest(BaseModel):
+    model_type: ModelType = ModelType.CREATIVE
+    vectors: Optional[List[List[float]]] = None
+    texts: Optional[List[str]] = None
+
+
+class PQDecodeRequest(BaseModel):
+    model_type: ModelType = ModelType.CREATIVE
+    codes: List[List[int]]
+
+
+class PQSearchRequest(BaseModel):
+    model_type: ModelType = ModelType.CREATIVE
+    query_text: Optional[str] = None
+    query_vector: Optional[List[float]] = None
+    top_k: int = 10
+    rerank: int = 100  # ADC candidates re-scored with exact vectors
+
+
+class PlaylistTracksRequest(BaseModel):
+    """Add/remove-track event; songs must already be in the vector store"""
+    item_ids: List[str]
+    model_type: ModelType = ModelType.CREATIVE
+
+
+class EmbeddingJobRequest(BaseModel):
+    """
+    Background vectorization job: either plain `texts` (embedded with `model_type`)
+    or categorized `items` combined like /embed/hybrid.
+    """
+    texts: Optional[List[str]] = None
+    items: Optional[List[Dict[str, str]]] = None
+    item_ids: Optional[List[str]] = None  # Required when store is set
+    model_type: ModelType = ModelType.GENERAL
+    weights: Optional[Dict[str, float]] = None
+    dimensions: Optional[int] = None
+    store: bool = False  # Write results into the vector store under item_ids
+
+
+class ProfileScoreRequest(BaseModel):
+    """Candidates scored against a playlist profile: stored songs or raw vectors"""
+    item_ids: Optional[List[str]] = None
+    vectors: Optional[List[List[float]]] = None
+    model_type: ModelType = ModelType.CREATIVE
+    mode: str = "max"  # "max" (best prototype) or "weighted" (weight-averaged)
+    top_k: Optional[int] = None
+
+
+class CentroidRebuildRequest(BaseModel):
+    playlist_id: Optional[str] = None  # None rebuilds every playlist
+    model_type: ModelType = ModelType.CREATIVE
+
+
+class VADFilterRequest(BaseModel):
+    """Inclusive [min, max] per feature, e.g. {"valence": [0.05, 1], "arousal": [-1, 0]}"""
+    ranges: Dict[str, List[float]]
+    model_type: ModelType = ModelType.CREATIVE
+    limit: Optional[int] = 100
+
+
+class MigrationRequest(BaseModel):
+    model_types: Optional[List[ModelType]] = None  # None migrates every model
+    throttle: float = 0.5  # Seconds between re-embedding batches
+    limit: Optional[int] = None  # Max items per model in this run
+
+
+class CaptureRequest(BaseModel):
+    enabled: bool = True  # False stops the capture in progress
+    include_payloads: bool = False  # Keep request bodies as sent instead of text hashes and lengths
+
+
+class ProfileRequest(BaseModel):
+    requests: int = 10  # Upcoming requests eligible for capture
+    mode: str = "torch"  # "torch" (Chrome trace) or "cprofile"
+    sample_rate: float = 1.0  # Fraction of eligible requests actually profiled
+
+
 # =============================================================================
 # Core Embedding Functions
 # =============================================================================
@@ -108,36 +378,80 @@ def mean_pooling(model_output, attention_mask):
     return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
 
 
-def get_embedding(text: str, model_type: ModelType = ModelType.GENERAL) -> List[float]:
+def get_projection(model_type: ModelType, dimensions: Optional[int]) -> Optional[Projection]:
+    """Fitted projection for a requested output dimension, None for native size"""
+    if dimensions is None or dimensions == MODEL_DIMENSIONS[model_type]:
+        return None
+
+    projection = projections.get(model_type.value, dimensions)
+    if projection is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No {dimensions}d projection fitted for model '{model_type.value}'. Use /projection/fit first."
+        )
+    if projection.fingerprint != fingerprints[model_type]["fingerprint"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"The {dimensions}d projection for model '{model_type.value}' was fitted on a different model "
+                   f"version. Fit it again with /projection/fit."
+        )
+    return projection
+
+
+def project_embeddings(embeddings: List[List[float]], projection: Optional[Projection]) -> List[List[float]]:
+    """Apply a projection to normalized embeddings, keeping zero vectors zero"""
+    if projection is None or not embeddings:
+        return embeddings
+
+    vectors = np.array(embeddings, dtype=np.float32)
+    empty = ~vectors.any(axis=1)
+    projected = projection.apply(vectors)
+    projected[empty] = 0.0
+    return projected.tolist()
+
+
+def get_embedding(text: str, model_type: ModelType = ModelType.GENERAL,
+                  dimensions: Optional[int] = None) -> List[float]:
     """Generate embedding for a single text"""
+    projection = get_projection(model_type, dimensions)
+
     if not text or not text.strip():
         # Return zero vector for empty text
-        dim = 384 if model_type in [ModelType.GENERAL, ModelType.FAST] else 768
-        return [0.0] * dim
+        return [0.0] * (dimensions or MODEL_DIMENSIONS[model_type])
 
     model_info = models[model_type]
-    tokenizer = model_info["tokenizer"]
     model = model_info["model"]
 
-    inputs = tokenizer(text, padding=True, truncation=True,
-                       return_tensors="pt", max_length=512)
+    with stage("tokenize"):
+        inputs = model_info["tokens"]([text])
 
-    with torch.no_grad():
+    checkpoint()
+    with stage("forward"), torch.no_grad():
         outputs = model(**inputs)
 
-    embeddings = mean_pooling(outputs, inputs["attention_mask"])
-    embeddings = F.normalize(embeddings, p=2, dim=1)
+    with stage("pool"):
+        embeddings = mean_pooling(outputs, inputs["attention_mask"])
+        embeddings = F.normalize(embeddings, p=2, dim=1)
 
-    return embeddings[0].tolist()
+    with stage("tolist"):
+        embedding = embeddings[0].tolist()
 
+    with stage("project"):
+        return project_embeddings([embedding], projection)[0]
 
-def get_embeddings_batch(texts: List[str], model_type: ModelType = ModelType.GENERAL) -> List[List[float]]:
+
+def get_embeddings_batch(texts: List[str], model_type: ModelType = ModelType.GENERAL,
+                         dimensions: Optional[int] = None,
+                         long_text: Optional[LongTextOptions] = None) -> List[List[float]]:
     """Generate embeddings for multiple texts efficiently"""
     if not texts:
         return []
+    if long_text is not None:
+        return get_embeddings_windowed(texts, model_type, dimensions, long_text)
+
+    projection = get_projection(model_type, dimensions)
 
     model_info = models[model_type]
-    tokenizer = model_info["tokenizer"]
     model = model_info["model"]
 
     # Filter empty texts but track their positions
@@ -145,25 +459,29 @@ def get_embeddings_batch(texts: List[str], model_type: ModelType = ModelType.GEN
     non_empty_texts = [texts[i] for i in non_empty_indices]
 
     if not non_empty_texts:
-        dim = 384 if model_type in [ModelType.GENERAL, ModelType.FAST] else 768
+        dim = dimensions or MODEL_DIMENSIONS[model_type]
         return [[0.0] * dim for _ in texts]
 
-    # Process in batches
+    # Process in length-sorted batches, tokenized ahead of the forward pass
     batch_size = 8
-    all_embeddings = []
+    all_embeddings = [None] * len(non_empty_texts)
 
-    for i in range(0, len(non_empty_texts), batch_size):
-        batch = non_empty_texts[i:i + batch_size]
+    for positions, inputs in model_info["tokens"].batches(non_empty_texts, batch_size):
+        # An abandoned request stops here instead of running its remaining batches
+        checkpoint()
+        with stage("forward"), torch.no_grad():
+            outputs = model(**inputs)
 
-        inputs = tokenizer(batch, padding=True, truncation=True,
-                           return_tensors="pt", max_length=512)
+        with stage("pool"):
+            embeddings = mean_pooling(outputs, inputs["attention_mask"])
+            embeddings = F.normalize(embeddings, p=2, dim=1)
 
-        with torch.no_grad():
-            outputs = model(**inputs)
+        with stage("tolist"):
+            for position, embedding in zip(positions, embeddings.tolist()):
+                all_embeddings[position] = embedding
 
-        embeddings = mean_pooling(outputs, inputs["attention_mask"])
-        embeddings = F.normalize(embeddings, p=2, dim=1)
-        all_embeddings.extend(embeddings.tolist())
+    with stage("project"):
+        all_embeddings = project_embeddings(all_embeddings, projection)
 
     # Reconstruct full list with zero vectors for empty texts
     dim = len(all_embeddings[0]) if all_embeddings else 384
@@ -174,6 +492,355 @@ def get_embeddings_batch(texts: List[str], model_type: ModelType = ModelType.GEN
     return result
 
 
+def check_long_text(options: Optional[LongTextOptions], model_type: ModelType) -> None:
+    """Reject window settings the model cannot run (400) before any work is queued"""
+    if options is None:
+        return
+    tokens = models[model_type]["tokens"]
+    longest = tokens.max_length - tokens.tokenizer.num_special_tokens_to_add()
+    if not 1 <= options.window <= longest:
+        raise HTTPException(status_code=400, detail=f"window must be between 1 and {longest} tokens for '{model_type.value}'")
+    if not 0 <= options.overlap < options.window:
+        raise HTTPException(status_code=400, detail="overlap must be at least 0 and smaller than window")
+    if options.pooling not in POOLING_MODES:
+        raise HTTPException(status_code=400, detail=f"pooling must be one of {', '.join(POOLING_MODES)}")
+
+
+def embed_windows(texts: List[str], model_type: ModelType, options: LongTextOptions) -> Tuple[np.ndarray, List[int]]:
+    """
+    (normalized native-size embeddings, window lengths) for non-empty texts.
+    Windows of every text share the same length-sorted batches.
+    """
+    model_info = models[model_type]
+    model = model_info["model"]
+
+    with stage("tokenize"):
+        windows, owners = tokenize_windows(model_info["tokenizer"], texts, options.window, options.overlap)
+
+    # Windows are short, so a batch holds as many tokens as 8 full-length texts would
+    batch_size = max(8, 8 * model_info["tokens"].max_length // (options.window + 2))
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+    window_means = [None] * len(windows)
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        inputs = model_info["tokens"].collate([windows[i] for i in rows])
+        checkpoint()
+        with stage("forward"), torch.no_grad():
+            outputs = model(**inputs)
+
+        with stage("pool"):
+            for row, mean in zip(rows, mean_pooling(outputs, inputs["attention_mask"]).numpy()):
+                window_means[row] = mean
+
+    lengths = [len(ids) for ids in windows]
+    with stage("pool"):
+        pooled = pool_windows(np.stack(window_means), lengths, owners, len(texts), options.pooling)
+    return pooled, lengths
+
+
+def get_embeddings_windowed(texts: List[str], model_type: ModelType, dimensions: Optional[int],
+                            options: LongTextOptions) -> List[List[float]]:
+    """Like get_embeddings_batch, reading the whole of every text through overlapping windows"""
+    projection = get_projection(model_type, dimensions)
+
+    non_empty_indices = [i for i, t in enumerate(texts) if t and t.strip()]
+    dim = dimensions or MODEL_DIMENSIONS[model_type]
+    result = [[0.0] * dim for _ in texts]
+    if not non_empty_indices:
+        return result
+
+    pooled, _ = embed_windows([texts[i] for i in non_empty_indices], model_type, options)
+    with stage("project"):
+        embeddings = project_embeddings(pooled.tolist(), projection)
+    for idx, embedding in zip(non_empty_indices, embeddings):
+        result[idx] = embedding
+    return result
+
+
+def evaluate_long_text(texts: List[str], model_type: ModelType, options: LongTextOptions) -> Dict:
+    """Windowed vs truncated embeddings of the same texts: quality, coverage, FLOPs and seconds"""
+    texts = [text for text in texts if text and text.strip()]
+    if not texts:
+        raise HTTPException(status_code=400, detail="No non-empty texts to evaluate")
+    model_info = models[model_type]
+
+    started = time.perf_counter()
+    truncated = np.array(get_embeddings_batch(texts, model_type), dtype=np.float32)
+    truncated_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    windowed, window_lengths = embed_windows(texts, model_type, options)
+    windowed_seconds = time.perf_counter() - started
+
+    tokenizer = model_info["tokenizer"]
+    text_lengths = [len(ids) for ids in tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+    truncated_lengths = [len(ids) for ids in model_info["tokens"].encode(texts)]
+    report = compare_to_truncated(
+        windowed, truncated, text_lengths, window_lengths, truncated_lengths, tokenizer.num_special_tokens_to_add(),
+        model_info["model"].config, {"truncated": truncated_seconds, "windowed": windowed_seconds}
+    )
+    report["max_length"] = model_info["tokens"].max_length
+    report["long_text"] = options.model_dump()
+    return report
+
+
+# Keyword anchor matrices per model, embedded once (warmed in lifespan)
+vad_anchors: Dict[ModelType, VADAnchors] = {}
+vad_anchors_lock = threading.Lock()
+
+
+def get_vad_anchors(model_type: ModelType) -> VADAnchors:
+    with vad_anchors_lock:
+        if model_type not in vad_anchors:
+            vad_anchors[model_type] = VADAnchors(lambda keywords: get_embeddings_batch(keywords, model_type))
+        return vad_anchors[model_type]
+
+
+def get_embeddings_with_vad(texts: List[str], model_type: ModelType = ModelType.GENERAL,
+                            dimensions: Optional[int] = None,
+                            long_text: Optional[LongTextOptions] = None) -> List[Dict]:
+    """
+    {embedding, vad} per text. Features are scored on the native-size
+    embeddings against the cached anchors, so they cost no extra forward pass.
+    """
+    projection = get_projection(model_type, dimensions)
+    embeddings = get_embeddings_batch(texts, model_type, None, long_text)
+    if not embeddings:
+        return []
+
+    with stage("vad"):
+        vad = get_vad_anchors(model_type).describe(np.array(embeddings, dtype=np.float32))
+
+    with stage("project"):
+        embeddings = project_embeddings(embeddings, projection)
+
+    return [{"embedding": embedding, "vad": features} for embedding, features in zip(embeddings, vad)]
+
+
+def embed_hybrid_components(items: List[Dict[str, str]]) -> List[Dict[str, np.ndarray]]:
+    """
+    Embed every non-empty text category of every item in one batched pass,
+    returning {category: vector} per item
+    """
+    # Use creative model for richer semantic content
+    keys = [[k for k, v in texts.items() if v and v.strip()] for texts in items]
+    flat_texts = [texts[k] for texts, item_keys in zip(items, keys) for k in item_keys]
+    vectors = iter(np.array(get_embeddings_batch(flat_texts, ModelType.CREATIVE), dtype=np.float32))
+    return [{k: next(vectors) for k in item_keys} for item_keys in keys]
+
+
+def get_hybrid_embeddings_batch(items: List[Dict[str, str]], weights: Optional[Dict[str, float]] = None,
+                                dimensions: Optional[int] = None,
+                                item_ids: Optional[List[str]] = None,
+                                include_vad: bool = False) -> List[Dict]:
+    """
+    Embed each text category separately and combine them with normalized weights.
+    With `item_ids`, the full-size component vectors are stored so the items can
+    later be re-weighted without inference (see /embed/hybrid/reweight).
+    With `include_vad`, each result also gets the combined vector's VAD features.
+    """
+    model_type = ModelType.CREATIVE
+    projection = get_projection(model_type, dimensions)
+
+    fingerprint = fingerprints[model_type]["fingerprint"]
+    components = embed_hybrid_components(items)
+    check_cancelled()
+    if item_ids is not None:
+        store.set_components(model_type.value, zip(item_ids, components), fingerprint)
+
+    with stage("combine"):
+        names, stacked, present = stack_components(components)
+        if names:
+            combined = combine_components(names, stacked, present, weights)
+        else:
+            # No valid text anywhere, every item gets a zero vector
+            combined = np.zeros((len(items), MODEL_DIMENSIONS[model_type]), dtype=np.float32)
+
+    vad = None
+    if include_vad:
+        with stage("vad"):
+            vad = get_vad_anchors(model_type).describe(combined)
+
+    # Project the combined vectors; projection is linear so this matches
+    # combining projected components before renormalizing
+    with stage("project"):
+        combined = project_embeddings(combined.tolist(), projection)
+
+    results = [
+        {
+            "embedding": embedding,
+            "components": list(item_components.keys()),
+            "weights": resolve_weights(list(item_components.keys()), weights),
+            "dimensions": len(embedding),
+            "fingerprint": fingerprint
+        }
+        for embedding, item_components in zip(combined, components)
+    ]
+    if vad is not None:
+        for result, features in zip(results, vad):
+            result["vad"] = features
+    return results
+
+
+def get_hybrid_embedding(texts: Dict[str, str], weights: Optional[Dict[str, float]] = None,
+                         dimensions: Optional[int] = None, item_id: Optional[str] = None,
+                         include_vad: bool = False) -> Dict:
+    """Hybrid embedding for a single item"""
+    return get_hybrid_embeddings_batch(
+        [texts], weights, dimensions, None if item_id is None else [item_id], include_vad
+    )[0]
+
+
+def embed_hybrid_pairs(pairs: List, weights: Optional[Dict[str, float]] = None,
+                       dimensions: Optional[int] = None, include_vad: bool = False) -> List[Dict]:
+    """`get_hybrid_embeddings_batch` over (texts, item_id) pairs, so ids stay aligned when sliced"""
+    item_ids = [item_id for _, item_id in pairs]
+    return get_hybrid_embeddings_batch(
+        [texts for texts, _ in pairs], weights, dimensions, item_ids if item_ids[0] is not None else None,
+        include_vad
+    )
+
+
+def get_sentiment(text: str) -> SentimentResponse:
+    """Sentiment probabilities for a non-empty text"""
+    with stage("tokenize"):
+        inputs = sentiment_tokens([text])
+
+    checkpoint()
+    with stage("forward"), torch.no_grad():
+        outputs = sentiment_model(**inputs)
+
+    with stage("softmax"):
+        probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)[0]
+
+    # Model outputs: [negative, neutral, positive]
+    return SentimentResponse(
+        negative=probabilities[0].item(),
+        neutral=probabilities[1].item(),
+        positive=probabilities[2].item()
+    )
+
+
+def get_sentiment_batch(texts: List[str]) -> List[List[float]]:
+    """[negative, neutral, positive] probabilities for non-empty texts, in length-sorted batches"""
+    results = [None] * len(texts)
+    for positions, inputs in sentiment_tokens.batches(texts, 8):
+        checkpoint()
+        with stage("forward"), torch.no_grad():
+            outputs = sentiment_model(**inputs)
+
+        with stage("softmax"):
+            probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1).tolist()
+        for position, row in zip(positions, probabilities):
+            results[position] = row
+    return results
+
+
+def get_sentiment_head(model_type: ModelType) -> SentimentHead:
+    """Fitted sentiment head for an embedding model, fitted on the weights currently loaded"""
+    head = sentiment_heads.get(model_type.value)
+    if head is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No sentiment head fitted for model '{model_type.value}'. Use /sentiment/head/fit first."
+        )
+    if head.fingerprint != fingerprints[model_type]["fingerprint"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"The sentiment head for model '{model_type.value}' was fitted on a different model version. "
+                   f"Fit it again with /sentiment/head/fit."
+        )
+    return head
+
+
+def get_embeddings_with_sentiment(texts: List[str], model_type: ModelType = ModelType.GENERAL,
+                                  dimensions: Optional[int] = None) -> List[Dict]:
+    """
+    {embedding, sentiment} per text from one embedding forward pass: the head
+    reads the native-size embedding, then the embedding is projected.
+    Empty texts get the same neutral default as /sentiment.
+    """
+    head = get_sentiment_head(model_type)
+    projection = get_projection(model_type, dimensions)
+    embeddings = get_embeddings_batch(texts, model_type)
+    if not embeddings:
+        return []
+
+    with stage("sentiment_head"):
+        vectors = np.array(embeddings, dtype=np.float32)
+        sentiment = head.describe(vectors)
+        for i in np.flatnonzero(~vectors.any(axis=1)):
+            sentiment[i] = dict(zip(SENTIMENT_LABELS, (0.33, 0.34, 0.33)))
+
+    with stage("project"):
+        embeddings = project_embeddings(embeddings, projection)
+
+    return [{"embedding": embedding, "sentiment": scores} for embedding, scores in zip(embeddings, sentiment)]
+
+
+def similarity_metrics(v1: np.ndarray, v2: np.ndarray) -> Dict[str, float]:
+    """Cosine, euclidean and manhattan similarity between two vectors"""
+    # Reject dimension mismatch - indicates bug or misconfiguration
+    if len(v1) != len(v2):
+        raise ValueError(
+            f"Vector dimension mismatch: vec1 has {len(v1)} dimensions, vec2 has {len(v2)} dimensions"
+        )
+
+    # Cosine similarity
+    norm1, norm2 = np.linalg.norm(v1), np.linalg.norm(v2)
+    if norm1 == 0 or norm2 == 0:
+        cosine_sim = 0.0
+    else:
+        cosine_sim = float(np.dot(v1, v2) / (norm1 * norm2))
+
+    # Euclidean distance → similarity
+    euclidean_dist = float(np.linalg.norm(v1 - v2))
+    euclidean_sim = 1 / (1 + euclidean_dist)
+
+    # Manhattan distance → similarity
+    manhattan_dist = float(np.sum(np.abs(v1 - v2)))
+    manhattan_sim = 1 / (1 + manhattan_dist)
+
+    return {
+        "cosine": cosine_sim,
+        "euclidean": euclidean_sim,
+        "manhattan": manhattan_sim,
+        "average": (cosine_sim + euclidean_sim + manhattan_sim) / 3
+    }
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def cancelled_error(e: Cancelled) -> HTTPException:
+    # 499 (client closed request) is never seen by the client, but shows up in access logs
+    return HTTPException(status_code=504 if e.reason == DEADLINE else 499, detail=str(e))
+
+
+async def run_model_work(model: str, lane: str, fn, *args):
+    """Run inference on the model's scheduler lane, mapping rejections to 429/503"""
+    try:
+        return await scheduler.run(model, lane, fn, *args)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except Cancelled as e:
+        raise cancelled_error(e)
+
+
+async def run_texts_batch(texts: List[str], model_type: ModelType, dimensions: Optional[int] = None,
+                          fn=get_embeddings_batch, *args):
+    """Embed texts interactively when small, otherwise as interleaved bulk slices"""
+    if len(texts) <= INTERACTIVE_BATCH_LIMIT:
+        return await run_model_work(model_type.value, "interactive", fn, texts, model_type, dimensions, *args)
+    try:
+        return await scheduler.run_sliced(model_type.value, fn, texts, BULK_SLICE_SIZE, model_type, dimensions, *args)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except Cancelled as e:
+        raise cancelled_error(e)
+
+
 # =============================================================================
 # API Endpoints
 # =============================================================================
@@ -187,12 +854,33 @@ async def embed(request: EmbedRequest) -> Dict:
     and sends it here for embedding.
     """
     try:
-        embedding = get_embedding(request.text, request.model_type)
-        return {
+        check_long_text(request.long_text, request.model_type)
+        if request.include_vad:
+            result = (await run_model_work(
+                request.model_type.value, "interactive", get_embeddings_with_vad,
+                [request.text], request.model_type, request.dimensions, request.long_text
+            ))[0]
+            embedding = result["embedding"]
+        elif request.long_text is not None:
+            embedding = (await run_model_work(
+                request.model_type.value, "interactive", get_embeddings_windowed,
+                [request.text], request.model_type, request.dimensions, request.long_text
+            ))[0]
+        else:
+            embedding = await run_model_work(
+                request.model_type.value, "interactive", get_embedding, request.text, request.model_type, request.dimensions
+            )
+        response = {
             "embedding": embedding,
             "model": request.model_type,
-            "dimensions": len(embedding)
+            "dimensions": len(embedding),
+            "fingerprint": fingerprints[request.model_type]["fingerprint"]
         }
+        if request.include_vad:
+            response["vad"] = result["vad"]
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -203,12 +891,44 @@ async def embed_batch(request: EmbedBatchRequest) -> Dict:
     Batch embed multiple texts efficiently.
     """
     try:
-        embeddings = get_embeddings_batch(request.texts, request.model_type)
-        return {
+        check_long_text(request.long_text, request.model_type)
+        if request.include_vad:
+            results = await run_texts_batch(request.texts, request.model_type, request.dimensions,
+                                            get_embeddings_with_vad, request.long_text)
+            embeddings = [result["embedding"] for result in results]
+        else:
+            embeddings = await run_texts_batch(request.texts, request.model_type, request.dimensions,
+                                               get_embeddings_batch, request.long_text)
+        response = {
             "embeddings": embeddings,
             "count": len(embeddings),
-            "model": request.model_type
+            "model": request.model_type,
+            "fingerprint": fingerprints[request.model_type]["fingerprint"]
         }
+        if request.include_vad:
+            response["vad"] = [result["vad"] for result in results]
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/embed/long/evaluate")
+async def evaluate_long_text_embedding(request: LongTextEvaluateRequest) -> Dict:
+    """
+    Embed texts both through overlapping windows and truncated at max_length.
+
+    Reports how close the two embeddings are, how many tokens each reads, and
+    the estimated FLOPs and measured seconds of each.
+    """
+    try:
+        check_long_text(request.long_text, request.model_type)
+        return await run_model_work(
+            request.model_type.value, "bulk", evaluate_long_text, request.texts, request.model_type, request.long_text
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -226,77 +946,89 @@ async def embed_hybrid(request: HybridEmbedRequest) -> Dict:
     Each category is embedded separately and combined with weights.
     """
     try:
-        # Get keys that have actual text content
-        text_keys = [k for k, v in request.texts.items() if v and v.strip()]
-
-        if not text_keys:
-            # No valid text, return zero vector
-            return {
-                "embedding": [0.0] * 768,
-                "components": [],
-                "weights": {},
-                "dimensions": 768
-            }
+        return await run_model_work(
+            ModelType.CREATIVE.value, "interactive", get_hybrid_embedding,
+            request.texts, request.weights, request.dimensions, request.item_id, request.include_vad
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        # Build weights only for keys present in request.texts
-        if request.weights:
-            # Filter to only keys that exist in texts
-            filtered_weights = {k: v for k, v in request.weights.items() if k in text_keys}
-            if filtered_weights:
-                # Normalize filtered weights
-                total = sum(filtered_weights.values())
-                if total > 0:
-                    weights = {k: v / total for k, v in filtered_weights.items()}
-                else:
-                    # All zero weights, use equal distribution
-                    weights = {k: 1.0 / len(text_keys) for k in text_keys}
-            else:
-                # No matching keys, use equal distribution
-                weights = {k: 1.0 / len(text_keys) for k in text_keys}
+@app.post("/embed/hybrid/batch")
+async def embed_hybrid_batch(request: HybridBatchRequest) -> Dict:
+    """
+    Hybrid embeddings for several items in one call, scheduled like
+    /embed/batch: interactive when small, bulk slices otherwise.
+    """
+    try:
+        if request.item_ids is not None and len(request.item_ids) != len(request.items):
+            raise HTTPException(status_code=400, detail="item_ids must match the number of items")
+        if not request.items:
+            return {"results": [], "count": 0}
+
+        pairs = list(zip(request.items, request.item_ids or [None] * len(request.items)))
+        if len(pairs) <= INTERACTIVE_BATCH_LIMIT:
+            results = await run_model_work(
+                ModelType.CREATIVE.value, "interactive", embed_hybrid_pairs,
+                pairs, request.weights, request.dimensions, request.include_vad
+            )
         else:
-            # No custom weights provided, use equal distribution
-            weights = {k: 1.0 / len(text_keys) for k in text_keys}
+            try:
+                results = await scheduler.run_sliced(ModelType.CREATIVE.value, embed_hybrid_pairs, pairs,
+                                                     BULK_SLICE_SIZE, request.weights, request.dimensions,
+                                                     request.include_vad)
+            except Overloaded as e:
+                raise overloaded_error(e)
+            except Cancelled as e:
+                raise cancelled_error(e)
+        return {"results": results, "count": len(results)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Choose model based on content
-        # Use creative model for richer semantic content
-        model_type = ModelType.CREATIVE
 
-        # Generate embeddings for each category
-        embeddings = {}
-        combined = None
-
-        for key in text_keys:
-            text = request.texts[key]
-            emb = get_embedding(text, model_type)
-            embeddings[key] = emb
-
-            weight = weights[key]  # Guaranteed to exist now
-            if combined is None:
-                combined = np.array(emb) * weight
-            else:
-                # Handle dimension mismatch by padding/truncating
-                emb_array = np.array(emb)
-                if len(emb_array) != len(combined):
-                    # Use the longer dimension
-                    if len(emb_array) > len(combined):
-                        combined = np.pad(combined, (0, len(emb_array) - len(combined)))
-                    else:
-                        emb_array = np.pad(emb_array, (0, len(combined) - len(emb_array)))
-                combined += emb_array * weight
-
-        # combined is guaranteed to exist since text_keys is non-empty
-
-        # Normalize the combined embedding
-        norm = np.linalg.norm(combined)
-        if norm > 0:
-            combined = combined / norm
+@app.post("/embed/hybrid/reweight")
+async def reweight_hybrid(request: HybridReweightRequest) -> Dict:
+    """
+    Recombine stored component embeddings (from /embed/hybrid with item_id or
+    stored hybrid jobs) with new weights in one vectorized pass, no inference.
+    """
+    try:
+        model_type = ModelType.CREATIVE
+        projection = get_projection(model_type, request.dimensions)
+        if request.store and request.dimensions:
+            raise HTTPException(status_code=400, detail="store needs full-dimension embeddings")
+
+        # Components from an older model version are not mixed in; they count as missing
+        fingerprint = fingerprints[model_type]["fingerprint"]
+        stored = store.load_components(model_type.value, request.item_ids, fingerprint)
+        item_ids = [i for i in (request.item_ids or stored.keys()) if i in stored]
+        missing = [i for i in (request.item_ids or []) if i not in stored]
+
+        with stage("combine"):
+            names, components, present = stack_components([stored[i] for i in item_ids])
+            combined = (combine_components(names, components, present, request.weights)
+                        if item_ids else np.zeros((0, MODEL_DIMENSIONS[model_type]), dtype=np.float32))
+
+        if request.store and item_ids:
+            await run_in_threadpool(
+                store_vectors, model_type, [(item_id, vector, None) for item_id, vector in zip(item_ids, combined)],
+                fingerprint
+            )
 
-        return {
-            "embedding": combined.tolist(),
-            "components": list(embeddings.keys()),
-            "weights": weights,
-            "dimensions": len(combined)
-        }
+        response = {"count": len(item_ids), "missing": missing, "stored": len(item_ids) if request.store else 0,
+                    "fingerprint": fingerprint}
+        if request.include_embeddings:
+            with stage("project"):
+                embeddings = project_embeddings(combined.tolist(), projection)
+            response["item_ids"] = item_ids
+            response["embeddings"] = embeddings
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -310,20 +1042,15 @@ async def analyze_sentiment(request: SentimentRequest) -> SentimentResponse:
         if not text.strip():
             return SentimentResponse(negative=0.33, neutral=0.34, positive=0.33)
 
-        inputs = sentiment_tokenizer(text, truncation=True, padding=True,
-                                     return_tensors="pt", max_length=512)
-
-        with torch.no_grad():
-            outputs = sentiment_model(**inputs)
-
-        probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)[0]
+        if request.head is not None:
+            result = await run_model_work(
+                request.head.value, "interactive", get_embeddings_with_sentiment, [text], request.head
+            )
+            return SentimentResponse(**result[0]["sentiment"])
 
-        # Model outputs: [negative, neutral, positive]
-        return SentimentResponse(
-            negative=probabilities[0].item(),
-            neutral=probabilities[1].item(),
-            positive=probabilities[2].item()
-        )
+        return await run_model_work("sentiment", "interactive", get_sentiment, text)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -332,43 +1059,885 @@ async def analyze_sentiment(request: SentimentRequest) -> SentimentResponse:
 async def calculate_similarity(request: SimilarityRequest) -> Dict[str, float]:
     """Calculate similarity metrics between two vectors"""
     try:
-        v1 = np.array(request.vec1)
-        v2 = np.array(request.vec2)
+        return similarity_metrics(np.array(request.vec1), np.array(request.vec2))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/embed/sentiment")
+async def embed_with_sentiment(request: EmbedSentimentRequest) -> Dict:
+    """
+    Embeddings and sentiment from a single embedding forward pass per text,
+    using the model's fitted sentiment head instead of the sentiment model.
+    """
+    try:
+        results = await run_texts_batch(request.texts, request.model_type, request.dimensions,
+                                        get_embeddings_with_sentiment)
+        return {
+            "embeddings": [result["embedding"] for result in results],
+            "sentiment": [result["sentiment"] for result in results],
+            "count": len(results),
+            "model": request.model_type,
+            "fingerprint": fingerprints[request.model_type]["fingerprint"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def save_sentiment_head(request: SentimentHeadFitRequest, embeddings: np.ndarray, targets: np.ndarray) -> Dict:
+    """Fit a head on the labelled embeddings and persist it; returns its report"""
+    fingerprint = fingerprints[request.model_type]["fingerprint"]
+    head, report = fit_sentiment_head(
+        embeddings, targets, hidden=request.hidden, holdout=request.holdout, epochs=request.epochs,
+        fingerprint=fingerprint
+    )
+    report["fingerprint"] = fingerprint
+    report["sentiment_model_parameters"] = sum(p.numel() for p in sentiment_model.parameters())
+    sentiment_heads.save(request.model_type.value, head, report)
+    return report
+
+
+@app.post("/sentiment/head/fit")
+async def fit_sentiment_head_from_corpus(request: SentimentHeadFitRequest) -> Dict:
+    """
+    Fit and persist a sentiment head for an embedding model from a corpus of
+    texts, labelled by the full sentiment model.
+
+    Returns the head's agreement with the full model on the fitted and the
+    held-out texts.
+    """
+    try:
+        # Same truncation as /sentiment, so the head learns the labels /sentiment serves
+        texts = [text[:512] for text in request.texts if text and text.strip()]
+        embeddings = np.array(await run_texts_batch(texts, request.model_type), dtype=np.float32)
+        try:
+            targets = np.array(
+                await scheduler.run_sliced("sentiment", get_sentiment_batch, texts, BULK_SLICE_SIZE), dtype=np.float32
+            )
+        except Overloaded as e:
+            raise overloaded_error(e)
+        except Cancelled as e:
+            raise cancelled_error(e)
+
+        try:
+            # Training and the .npz write take seconds; keep them off the event loop
+            report = await run_in_threadpool(save_sentiment_head, request, embeddings, targets)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"model": request.model_type, "report": report}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/sentiment/head")
+async def list_sentiment_heads() -> Dict:
+    """List fitted sentiment heads with their agreement reports"""
+    return {"sentiment_heads": sentiment_heads.list()}
+
+
+def save_projection(model_type: ModelType, embeddings: np.ndarray, target_dim: int, k: int) -> Dict:
+    """Fit a projection on the corpus embeddings, evaluate and persist it; returns its report"""
+    fingerprint = fingerprints[model_type]["fingerprint"]
+    projection = fit_projection(embeddings, target_dim, fingerprint)
+    report = evaluate_projection(embeddings, projection, k=k)
+    report["fingerprint"] = fingerprint
+    projections.save(model_type.value, projection, report)
+    return report
+
+
+@app.post("/projection/fit")
+async def fit_projections(request: ProjectionFitRequest) -> Dict:
+    """
+    Fit and persist PCA projections for a model from a corpus of texts.
+
+    Returns a report per target dimension comparing retrieval quality on the
+    corpus against the storage and similarity-compute savings.
+    """
+    try:
+        embeddings = np.array(await run_texts_batch(request.texts, request.model_type), dtype=np.float32)
+        embeddings = embeddings[embeddings.any(axis=1)]
+
+        results = []
+        for target_dim in request.target_dims:
+            # SVD and the neighbour evaluation take seconds on a large corpus; keep them off the event loop
+            try:
+                report = await run_in_threadpool(save_projection, request.model_type, embeddings, target_dim, request.k)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            results.append({"dimensions": target_dim, "report": report})
+
+        return {"model": request.model_type, "projections": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/projection")
+async def list_projections() -> Dict:
+    """List fitted projections with their quality/savings reports"""
+    return {"projections": projections.list()}
+
+
+def get_pq_index(model_type: ModelType) -> PQIndex:
+    """Trained PQ index for a model, or 404"""
+    index = pq_indexes.get(model_type.value, store.load_codes)
+    if index is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No PQ codebooks trained for model '{model_type.value}'. Use /pq/train first."
+        )
+    if index.quantizer.fingerprint != fingerprints[model_type]["fingerprint"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"The PQ codebooks for model '{model_type.value}' were trained on a different model version. "
+                   f"Train them again with /pq/train."
+        )
+    return index
+
+
+# Held while a model's stored vectors change: reading the previous vectors, writing the
+# new ones and applying the centroid/profile deltas must not interleave with another
+# write (or playlist membership change) of the same model, or a delta is applied twice
+vector_write_locks: Dict[str, threading.Lock] = {model_type.value: threading.Lock() for model_type in ModelType}
+
+
+def store_vectors(model_type: ModelType, rows: List, fingerprint: Optional[str]) -> None:
+    """
+    Write (item_id, vector, text) rows produced by `fingerprint` to the vector
+    store with their VAD features, keeping playlist centroids and PQ codes in
+    sync with the new vectors.
+    """
+    model_key = model_type.value
+    features = get_vad_anchors(model_type).features(np.stack([vector for _, vector, _ in rows])) if rows else None
+    with vector_write_locks[model_key]:
+        # Playlist sums containing a re-embedded song must follow the new vector
+        members = centroids.member_items(model_key, [item_id for item_id, _, _ in rows])
+        previous = store.get_many(members, model_key)
+
+        store.upsert_many(model_key, rows, fingerprint)
+        if rows:
+            store.set_vad(model_key, [item_id for item_id, _, _ in rows], features)
+
+        for item_id, vector, _ in rows:
+            if item_id in previous and not np.array_equal(previous[item_id], vector):
+                centroids.apply_vector_update(model_key, item_id, previous[item_id], vector)
+                profiles.apply_vector_update(model_key, item_id, previous[item_id], vector)
+
+        index = pq_indexes.get(model_key, store.load_codes)
+        # Codebooks of another model version are retrained (and every code rewritten) before use
+        if index is not None and rows and index.quantizer.fingerprint == fingerprints[model_type]["fingerprint"]:
+            item_ids = [item_id for item_id, _, _ in rows]
+            codes = index.add(item_ids, np.stack([vector for _, vector, _ in rows]))
+            store.set_codes(model_key, item_ids, codes)
+
+
+def delete_stored_vector(model_type: ModelType, item_id: str) -> bool:
+    with vector_write_locks[model_type.value]:
+        previous = store.get(item_id, model_type.value)
+        if previous is not None:
+            centroids.apply_vector_update(model_type.value, item_id, previous, None)
+            profiles.apply_vector_update(model_type.value, item_id, previous, None)
+        deleted = store.delete(item_id, model_type.value)
+        index = pq_indexes.get(model_type.value, store.load_codes)
+        if index is not None:
+            index.remove(item_id)
+        return deleted
+
+
+def update_playlist_tracks(playlist_id: str, model_type: ModelType, item_ids: List[str], add: bool) -> Dict:
+    """Add or remove songs in a playlist's centroid and profile from their stored embeddings"""
+    with vector_write_locks[model_type.value]:
+        if add:
+            result = centroids.add_tracks(playlist_id, model_type.value, item_ids)
+            result["profile"] = profiles.add_tracks(playlist_id, model_type.value, item_ids)
+        else:
+            result = centroids.remove_tracks(playlist_id, model_type.value, item_ids)
+            result["profile"] = profiles.remove_tracks(playlist_id, model_type.value, item_ids)
+        return result
+
+
+@app.post("/vectors/upsert")
+async def upsert_vectors(request: VectorUpsertRequest) -> Dict:
+    """
+    Store item embeddings, embedding any items sent as text.
+    Items are also PQ-encoded when the model has trained codebooks.
+    Pre-computed embeddings are tagged with the request's fingerprint (unknown
+    when not given); texts embedded here get the current one.
+    """
+    try:
+        missing = [item for item in request.items if item.embedding is None and item.text is None]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Item '{missing[0].item_id}' needs text or embedding")
+
+        to_embed = [item for item in request.items if item.embedding is None]
+        embedded = await run_texts_batch([item.text for item in to_embed], request.model_type)
+        vectors = {item.item_id: emb for item, emb in zip(to_embed, embedded)}
+
+        dim = MODEL_DIMENSIONS[request.model_type]
+        rows, provided = [], []
+        for item in request.items:
+            vector = np.array(vectors.get(item.item_id, item.embedding), dtype=np.float32)
+            if len(vector) != dim:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Item '{item.item_id}' has {len(vector)} dimensions, model expects {dim}"
+                )
+            (provided if item.embedding is not None else rows).append((item.item_id, vector, item.text))
+
+        fingerprint = fingerprints[request.model_type]["fingerprint"]
+        # store_vectors waits for the model's write lock and writes to SQLite; keep both off the event loop
+        if rows:
+            await run_in_threadpool(store_vectors, request.model_type, rows, fingerprint)
+        if provided:
+            await run_in_threadpool(store_vectors, request.model_type, provided, request.fingerprint)
+        return {"stored": len(rows) + len(provided), "model": request.model_type, "fingerprint": fingerprint}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/vectors/export")
+async def export_vectors(model_type: ModelType = ModelType.GENERAL, format: str = "arrow") -> Response:
+    """
+    Every stored vector of a model, with item ids, fingerprints, hybrid
+    components and VAD features, as an Arrow IPC stream or a Parquet file
+    (see arrow_io.py). Import it on another node with /vectors/import.
+    The snapshot is streamed one record batch at a time.
+    """
+    try:
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+        try:
+            table = await run_in_threadpool(export_table, store, model_type.value)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        # Batches are serialized in the threadpool as the client reads them
+        return StreamingResponse(
+            iter_snapshot(table, format), media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{model_type.value}.{format}"',
+                     "X-Item-Count": str(table.num_rows)}
+        )
+    except HTTPException:
+        raise
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/vectors/import")
+async def import_vectors(request: Request) -> Dict:
+    """
+    Write an Arrow IPC stream or Parquet snapshot from /vectors/export (the
+    raw request body) into the vector store, keeping playlist centroids,
+    profiles and PQ codes in sync. Vectors keep the fingerprints they were
+    exported with; `stale` counts those not produced by the model loaded here.
+    """
+    try:
+        body = await request.body()
+        try:
+            metadata, _ = read_snapshot(body)
+            model_type = ModelType(metadata["model"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        dim = MODEL_DIMENSIONS[model_type]
+        if metadata["dimensions"] != dim:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Snapshot vectors have {metadata['dimensions']} dimensions, model expects {dim}"
+            )
+
+        report = await run_in_threadpool(
+            import_snapshot, store, body,
+            lambda model_key, rows, fingerprint: store_vectors(model_type, rows, fingerprint)
+        )
+        current = fingerprints[model_type]["fingerprint"]
+        report["stale"] = sum(entry["count"] for entry in report["fingerprints"] if entry["fingerprint"] != current)
+        return report
+    except HTTPException:
+        raise
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/vectors/{item_id}")
+async def get_vector(item_id: str, model_type: ModelType = ModelType.CREATIVE) -> Dict:
+    """Fetch a stored embedding"""
+    vector = store.get(item_id, model_type.value)
+    if vector is None:
+        raise HTTPException(status_code=404, detail=f"No stored vector for '{item_id}'")
+    fingerprint = store.get_fingerprints([item_id], model_type.value).get(item_id)
+    return {
+        "item_id": item_id,
+        "embedding": vector.tolist(),
+        "model": model_type,
+        "dimensions": len(vector),
+        "fingerprint": fingerprint,
+        "stale": fingerprint != fingerprints[model_type]["fingerprint"],
+        "vad": store.get_vad([item_id], model_type.value).get(item_id)
+    }
+
+
+@app.post("/vectors/vad/filter")
+async def filter_vectors_by_vad(request: VADFilterRequest) -> Dict:
+    """
+    Stored items whose valence/arousal/dominance fall inside the given ranges,
+    answered from the stored features without loading any vectors.
+    """
+    try:
+        ranges = {}
+        for name, bounds in request.ranges.items():
+            if len(bounds) != 2 or bounds[0] > bounds[1]:
+                raise HTTPException(status_code=400, detail=f"Range for '{name}' must be [min, max]")
+            ranges[name] = (bounds[0], bounds[1])
+        items = store.filter_vad(request.model_type.value, ranges, request.limit)
+        return {"items": items, "count": len(items), "model": request.model_type}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/vectors/{item_id}")
+async def delete_vector(item_id: str, model_type: ModelType = ModelType.CREATIVE) -> Dict:
+    """Delete a stored embedding and its PQ code, dropping it from playlist centroids and profiles"""
+    return {"deleted": await run_in_threadpool(delete_stored_vector, model_type, item_id)}
+
+
+def train_pq_index(request: PQTrainRequest) -> Dict:
+    """Train codebooks from every stored vector of the model and re-encode them all"""
+    model_key = request.model_type.value
+    empty = np.zeros((0, MODEL_DIMENSIONS[request.model_type]), dtype=np.float32)
+    item_ids, vectors = store.load_matrix(model_key)
+    quantizer = ProductQuantizer.train(
+        vectors if len(item_ids) else empty,
+        num_subspaces=request.num_subspaces,
+        num_centroids=request.num_centroids,
+        iterations=request.iterations,
+        fingerprint=fingerprints[request.model_type]["fingerprint"]
+    )
+    report = evaluate_quantizer(quantizer, vectors)
+
+    # Vectors written or deleted while training ran are picked up by encoding the
+    # store as it is now; writes wait until the new codes and index are in place
+    with vector_write_locks[model_key]:
+        item_ids, vectors = store.load_matrix(model_key)
+        codes = quantizer.encode(vectors if len(item_ids) else empty)
+        store.clear_codes(model_key)
+        store.set_codes(model_key, item_ids, codes)
+        pq_indexes.set(model_key, PQIndex(quantizer, item_ids, codes))
+    return report
+
+
+@app.post("/pq/train")
+async def train_pq(request: PQTrainRequest) -> Dict:
+    """
+    Train product-quantization codebooks from every stored embedding of a model,
+    then encode all stored vectors. Returns compression and ADC recall stats.
+    """
+    try:
+        # k-means over the whole store takes seconds; keep it off the event loop
+        try:
+            report = await run_in_threadpool(train_pq_index, request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"model": request.model_type, "report": report}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/pq/encode")
+async def pq_encode(request: PQEncodeRequest) -> Dict:
+    """Encode vectors (or texts, embedded first) to PQ codes"""
+    index = get_pq_index(request.model_type)
+    try:
+        vectors = request.vectors
+        if vectors is None:
+            vectors = await run_texts_batch(request.texts or [], request.model_type)
+        if not vectors:
+            return {"codes": [], "code_size": index.quantizer.code_size}
+        try:
+            codes = index.quantizer.encode(np.array(vectors, dtype=np.float32))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"codes": codes.tolist(), "code_size": index.quantizer.code_size}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/pq/decode")
+async def pq_decode(request: PQDecodeRequest) -> Dict:
+    """Decode PQ codes back to approximate vectors"""
+    index = get_pq_index(request.model_type)
+    try:
+        if not request.codes:
+            return {"vectors": []}
+        code_size, num_centroids = index.quantizer.code_size, index.quantizer.num_centroids
+        if any(len(row) != code_size for row in request.codes):
+            raise HTTPException(status_code=400, detail=f"Codes must be {code_size} ids per vector")
+        codes = np.array(request.codes, dtype=np.int64)
+        if codes.min() < 0 or codes.max() >= num_centroids:
+            raise HTTPException(status_code=400, detail=f"Code ids must be in [0, {num_centroids})")
+        return {"vectors": index.quantizer.decode(codes).tolist()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/pq/search")
+async def pq_search(request: PQSearchRequest) -> Dict:
+    """
+    Rank stored items against a query with asymmetric distance computation,
+    re-ranking the best `rerank` candidates with their exact stored vectors.
+    """
+    index = get_pq_index(request.model_type)
+    try:
+        if request.query_vector is not None:
+            query = np.array(request.query_vector, dtype=np.float32)
+        elif request.query_text:
+            query = np.array(await run_model_work(
+                request.model_type.value, "interactive", get_embedding, request.query_text, request.model_type
+            ), dtype=np.float32)
+        else:
+            raise HTTPException(status_code=400, detail="Provide query_text or query_vector")
 
-        # Reject dimension mismatch - indicates bug or misconfiguration
-        if len(v1) != len(v2):
+        if len(query) != index.quantizer.dim:
             raise HTTPException(
                 status_code=400,
-                detail=f"Vector dimension mismatch: vec1 has {len(v1)} dimensions, vec2 has {len(v2)} dimensions"
+                detail=f"Query has {len(query)} dimensions, codebooks expect {index.quantizer.dim}"
             )
 
-        # Cosine similarity
-        norm1, norm2 = np.linalg.norm(v1), np.linalg.norm(v2)
-        if norm1 == 0 or norm2 == 0:
-            cosine_sim = 0.0
+        results = index.search(
+            query,
+            top_k=request.top_k,
+            rerank=request.rerank,
+            fetch_vectors=lambda ids: store.get_many(ids, request.model_type.value)
+        )
+        return {"results": results, "searched": len(index)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/playlists/{playlist_id}/tracks/add")
+async def add_playlist_tracks(playlist_id: str, request: PlaylistTracksRequest) -> Dict:
+    """Add songs to a playlist's running centroid and prototype profile using their stored embeddings"""
+    try:
+        return await run_in_threadpool(update_playlist_tracks, playlist_id, request.model_type, request.item_ids, True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/playlists/{playlist_id}/tracks/remove")
+async def remove_playlist_tracks(playlist_id: str, request: PlaylistTracksRequest) -> Dict:
+    """Remove songs from a playlist's running centroid and prototype profile"""
+    try:
+        return await run_in_threadpool(update_playlist_tracks, playlist_id, request.model_type, request.item_ids, False)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/playlists/{playlist_id}/centroid")
+async def get_playlist_centroid(playlist_id: str, model_type: ModelType = ModelType.CREATIVE) -> Dict:
+    """Exact centroid over every song in the playlist (O(1) lookup)"""
+    result = centroids.centroid(playlist_id, model_type.value)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No songs tracked for playlist '{playlist_id}'")
+    return {
+        "playlist_id": playlist_id,
+        "centroid": result["centroid"].tolist(),
+        "count": result["count"],
+        "model": model_type
+    }
+
+
+def rebuild_playlists(model_type: ModelType, playlist_id: Optional[str]) -> Dict:
+    with vector_write_locks[model_type.value]:
+        report = centroids.rebuild(model_type.value, playlist_id)
+        report["profiles"] = profiles.rebuild(model_type.value, playlist_id)
+        return report
+
+
+@app.post("/playlists/rebuild")
+async def rebuild_playlist_centroids(request: CentroidRebuildRequest) -> Dict:
+    """Recompute centroids from stored embeddings and report drift (consistency check); re-cluster profiles"""
+    try:
+        return await run_in_threadpool(rebuild_playlists, request.model_type, request.playlist_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/playlists/{playlist_id}/profile")
+async def get_playlist_profile(playlist_id: str, model_type: ModelType = ModelType.CREATIVE) -> Dict:
+    """Prototype vectors and weights clustered from the playlist's songs"""
+    result = profiles.profile(playlist_id, model_type.value)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No songs tracked for playlist '{playlist_id}'")
+    return {
+        "playlist_id": playlist_id,
+        "prototypes": result["prototypes"].tolist(),
+        "weights": result["weights"].tolist(),
+        "counts": result["counts"].tolist(),
+        "model": model_type
+    }
+
+
+@app.post("/playlists/{playlist_id}/score")
+async def score_against_profile(playlist_id: str, request: ProfileScoreRequest) -> Dict:
+    """
+    Score candidate songs against the playlist's prototypes only, so the cost
+    stays constant as the playlist grows.
+    """
+    try:
+        model_key = request.model_type.value
+        if request.item_ids is not None:
+            vectors = store.get_many(request.item_ids, model_key)
+            item_ids = [i for i in request.item_ids if i in vectors]
+            candidates = [vectors[i] for i in item_ids]
+        elif request.vectors is not None:
+            item_ids = list(range(len(request.vectors)))
+            candidates = request.vectors
         else:
-            cosine_sim = float(np.dot(v1, v2) / (norm1 * norm2))
+            raise HTTPException(status_code=400, detail="Provide item_ids or vectors")
 
-        # Euclidean distance → similarity
-        euclidean_dist = float(np.linalg.norm(v1 - v2))
-        euclidean_sim = 1 / (1 + euclidean_dist)
+        if not candidates:
+            return {"results": [], "missing": [i for i in request.item_ids or [] if i not in item_ids]}
 
-        # Manhattan distance → similarity
-        manhattan_dist = float(np.sum(np.abs(v1 - v2)))
-        manhattan_sim = 1 / (1 + manhattan_dist)
+        scored = profiles.score(playlist_id, model_key, np.array(candidates, dtype=np.float32), request.mode)
+        if scored is None:
+            raise HTTPException(status_code=404, detail=f"No songs tracked for playlist '{playlist_id}'")
+        scores, best = scored
 
+        results = [
+            {"item_id": item_id, "score": float(score), "prototype": int(proto)}
+            for item_id, score, proto in zip(item_ids, scores, best)
+        ]
+        results.sort(key=lambda r: r["score"], reverse=True)
         return {
-            "cosine": cosine_sim,
-            "euclidean": euclidean_sim,
-            "manhattan": manhattan_sim,
-            "average": (cosine_sim + euclidean_sim + manhattan_sim) / 3
+            "results": results[:request.top_k] if request.top_k else results,
+            "missing": [i for i in request.item_ids or [] if i not in set(item_ids)]
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def process_job_batch(job: Dict, items: List[Dict]) -> List[List[float]]:
+    """Embed one batch of a background job"""
+    options = job["options"]
+    payloads = [item["payload"] for item in items]
+    if job["kind"] == "hybrid":
+        # Stored items keep their components for later re-weighting
+        item_ids = [item["item_id"] for item in items] if options.get("store") else None
+        results = scheduler.call(job["model"], "bulk", get_hybrid_embeddings_batch,
+                                 payloads, options.get("weights"), options.get("dimensions"), item_ids)
+        return [result["embedding"] for result in results]
+    return scheduler.call(job["model"], "bulk", get_embeddings_batch,
+                          payloads, ModelType(job["model"]), options.get("dimensions"))
+
+
+def store_job_results(job: Dict, items: List[Dict], embeddings: List[List[float]]) -> None:
+    """Persist finished job items into the vector store when the job asked for it"""
+    options = job["options"]
+    if not options.get("store") or options.get("dimensions"):
+        return
+    model_type = ModelType(job["model"])
+    fingerprint = fingerprints[model_type]["fingerprint"]
+    results = list(zip(items, embeddings))
+    if options.get("migration"):
+        # Skip items deleted or re-embedded by a client while the migration ran
+        stored = store.get_fingerprints([item["item_id"] for item in items], model_type.value)
+        results = [(item, emb) for item, emb in results
+                   if item["item_id"] in stored and stored[item["item_id"]] != fingerprint]
+    rows = [
+        (item["item_id"], np.array(emb, dtype=np.float32),
+         item["payload"] if isinstance(item["payload"], str) else hybrid_source(item["payload"], options.get("weights")))
+        for item, emb in results
+    ]
+    store_vectors(model_type, rows, fingerprint)
+
+
+interactive_gate = InteractiveGate()
+job_queue = JobQueue(os.path.join(DATA_DIR, "jobs.db"))
+job_worker = JobWorker(job_queue, process_job_batch, interactive_gate, on_results=store_job_results)
+
+INTERACTIVE_PATHS = {"/embed", "/embed/batch", "/embed/hybrid", "/embed/hybrid/batch", "/embed/sentiment",
+                     "/sentiment"}
+CANCELLABLE_PATHS = INTERACTIVE_PATHS | {"/vectors/upsert"}
+cancellation_stats = CancellationStats()
+
+
+@app.middleware("http")
+async def track_interactive_requests(request: Request, call_next):
+    """Background jobs pause while synchronous embedding requests are in flight"""
+    if request.url.path not in INTERACTIVE_PATHS:
+        return await call_next(request)
+
+    interactive_gate.enter()
+    try:
+        return await call_next(request)
+    finally:
+        interactive_gate.exit()
+
+
+async def watch_disconnect(request: Request, token: CancelToken) -> None:
+    """Cancel `token` when the client goes away; the body has been read, so only disconnects arrive"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            token.cancel()
+            return
+
+
+@app.middleware("http")
+async def cancel_abandoned_requests(request: Request, call_next):
+    """
+    Give inference requests a cancel token: cancelled when the client goes
+    away, expiring at the X-Request-Timeout deadline. Remaining batches and
+    queued slices of an abandoned request are skipped.
+    """
+    if request.url.path not in CANCELLABLE_PATHS:
+        return await call_next(request)
+
+    try:
+        token = CancelToken.from_header(request.headers.get(TIMEOUT_HEADER))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"detail": f"{TIMEOUT_HEADER} must be a positive number"})
+
+    await request.body()
+    set_token(token)
+    watcher = asyncio.create_task(watch_disconnect(request, token))
+    try:
+        return await call_next(request)
+    finally:
+        watcher.cancel()
+        cancellation_stats.record(token)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """
+    Report per-stage timings (tokenize, forward, pool, tolist, render, ...) in a
+    Server-Timing header and capture profiles for requests sampled by /admin/profile.
+    """
+    timings = start_timing()
+    start = time.perf_counter()
+
+    if not request.url.path.startswith("/admin") and profiler.claim():
+        with profiler.capture(request.url.path):
+            response = await call_next(request)
+    else:
+        response = await call_next(request)
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+@app.middleware("http")
+async def capture_traffic(request: Request, call_next):
+    """Log each request to the active traffic capture, if any (see traffic_capture.py)"""
+    if not capture.active or request.url.path.startswith("/admin"):
+        return await call_next(request)
+
+    offset = capture.offset()
+    body = await request.body()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    capture.record(
+        offset, request.method, request.url.path + (f"?{request.url.query}" if request.url.query else ""),
+        getattr(route, "path", None), body, response.status_code, time.perf_counter() - start
+    )
+    return response
+
+
+@app.post("/jobs")
+async def submit_job(request: EmbeddingJobRequest) -> Dict:
+    """
+    Submit a bulk vectorization job. Returns immediately with a job id;
+    poll /jobs/{job_id} or stream /jobs/{job_id}/events for progress.
+    """
+    if (request.texts is None) == (request.items is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of texts or items")
+
+    payloads = request.texts if request.texts is not None else request.items
+    if request.item_ids is not None and len(request.item_ids) != len(payloads):
+        raise HTTPException(status_code=400, detail="item_ids must match the number of texts/items")
+    if request.store and (request.item_ids is None or request.dimensions):
+        raise HTTPException(status_code=400, detail="store needs item_ids and full-dimension embeddings")
+
+    kind = "texts" if request.texts is not None else "hybrid"
+    # Hybrid embeddings always come from the creative model
+    model_type = request.model_type if kind == "texts" else ModelType.CREATIVE
+    get_projection(model_type, request.dimensions)
+
+    # One SQLite insert per item; keep large submissions off the event loop
+    job_id = await run_in_threadpool(
+        job_queue.submit,
+        kind,
+        model_type.value,
+        payloads,
+        request.item_ids,
+        {"weights": request.weights, "dimensions": request.dimensions, "store": request.store}
+    )
+    job_worker.notify()
+    return {"job_id": job_id, "total": len(payloads)}
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50) -> Dict:
+    """Most recent jobs with their progress"""
+    return {"jobs": job_queue.list(limit)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict:
+    """Job status and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 1000) -> Dict:
+    """Per-item results in submission order (embedding is null until done)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return {"job": job, "results": job_queue.results(job_id, offset, limit)}
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """Server-sent progress events until the job finishes"""
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    async def events():
+        last = None
+        while True:
+            job = job_queue.get(job_id)
+            progress = (job["status"], job["completed"], job["failed"])
+            if progress != last:
+                yield f"data: {json.dumps(job)}\n\n"
+                last = progress
+            if job["status"] in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str) -> Dict:
+    """Cancel a job; items already embedded keep their results"""
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return {"cancelled": job_queue.cancel(job_id)}
+
+
+@app.post("/admin/profile")
+async def start_profiling(request: ProfileRequest) -> Dict:
+    """
+    Profile a sampled subset of the next `requests` requests with torch.profiler
+    (Chrome trace .json) or cProfile (.prof); traces are written under DATA_DIR/profiles.
+    """
+    try:
+        return profiler.arm(request.requests, request.mode, request.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/admin/profile")
+async def profiling_status() -> Dict:
+    """Pending profile captures and the traces written so far"""
+    return profiler.status()
+
+
+@app.post("/admin/capture")
+async def set_traffic_capture(request: CaptureRequest) -> Dict:
+    """
+    Start a new traffic capture under DATA_DIR/captures, or stop the current
+    one; replay it against a local instance with replay.py.
+    """
+    if request.enabled:
+        return capture.start(request.include_payloads)
+    return capture.stop()
+
+
+@app.get("/admin/capture")
+async def traffic_capture_status() -> Dict:
+    """Whether traffic is being captured, where, and how many requests so far"""
+    return capture.status()
+
+
+@app.get("/admin/queues")
+async def queue_stats() -> Dict:
+    """Per-model lane depth, capacity, rejections and wait times, plus work wasted on abandoned requests"""
+    return {
+        "interactive_batch_limit": INTERACTIVE_BATCH_LIMIT,
+        "bulk_slice_size": BULK_SLICE_SIZE,
+        "models": scheduler.stats(),
+        "cancellation": cancellation_stats.to_dict()
+    }
+
+
+@app.get("/admin/migration")
+async def migration_overview() -> Dict:
+    """Stored vectors per model fingerprint: current, stale, re-embeddable, and running migrations"""
+    return {
+        "models": {
+            model_type.value: {
+                **migration_status(store, job_queue, model_type.value, spec["fingerprint"]),
+                "spec": spec
+            }
+            for model_type, spec in fingerprints.items()
+        }
+    }
+
+
+@app.post("/admin/migration")
+async def run_migration(request: MigrationRequest) -> Dict:
+    """
+    Re-embed stored vectors from older model fingerprints as throttled background
+    jobs; stale vectors keep being served until their replacement is written.
+    """
+    if request.throttle < 0:
+        raise HTTPException(status_code=400, detail="throttle must be >= 0")
+    model_types = request.model_types or list(ModelType)
+    results = [
+        start_migration(store, job_queue, model_type.value, fingerprints[model_type]["fingerprint"],
+                        request.throttle, request.limit)
+        for model_type in model_types
+    ]
+    job_worker.notify()
+    return {"migrations": results}
+
+
 @app.get("/")
 async def root():
     """API information"""
@@ -385,9 +1954,38 @@ async def root():
         "endpoints": {
             "/embed": "Single text embedding",
             "/embed/batch": "Batch text embedding",
+            "/embed/long/evaluate": "Compare windowed long-text embeddings with truncated ones",
             "/embed/hybrid": "Weighted multi-category embedding",
+            "/embed/hybrid/batch": "Weighted multi-category embeddings for several items",
+            "/embed/hybrid/reweight": "Recombine stored category embeddings with new weights",
             "/sentiment": "Sentiment analysis",
-            "/similarity/calculate": "Vector similarity metrics"
+            "/sentiment/head/fit": "Fit a sentiment head on an embedding model from the full sentiment model",
+            "/sentiment/head": "List fitted sentiment heads and agreement reports",
+            "/embed/sentiment": "Embeddings plus head sentiment from one forward pass",
+            "/similarity/calculate": "Vector similarity metrics",
+            "/projection/fit": "Fit reduced-dimension PCA projections",
+            "/projection": "List fitted projections and reports",
+            "/vectors/upsert": "Store item embeddings",
+            "/vectors/{item_id}": "Get or delete a stored embedding",
+            "/vectors/export": "Export stored embeddings as an Arrow IPC stream or Parquet file",
+            "/vectors/import": "Import an Arrow/Parquet embedding snapshot",
+            "/vectors/vad/filter": "Find stored items by valence/arousal/dominance ranges",
+            "/pq/train": "Train product-quantization codebooks from stored vectors",
+            "/pq/encode": "Encode vectors to PQ codes",
+            "/pq/decode": "Decode PQ codes to approximate vectors",
+            "/pq/search": "ADC search over PQ codes with exact re-rank",
+            "/playlists/{playlist_id}/tracks/add": "Add songs to a playlist centroid",
+            "/playlists/{playlist_id}/tracks/remove": "Remove songs from a playlist centroid",
+            "/playlists/{playlist_id}/centroid": "Exact playlist centroid lookup",
+            "/playlists/{playlist_id}/profile": "Multi-prototype playlist profile",
+            "/playlists/{playlist_id}/score": "Score songs against a playlist's prototypes",
+            "/playlists/rebuild": "Rebuild playlist centroids and profiles from stored embeddings",
+            "/jobs": "Submit or list background vectorization jobs",
+            "/jobs/{job_id}": "Job progress, results, event stream or cancellation",
+            "/admin/profile": "Profile the next N requests (torch.profiler or cProfile)",
+            "/admin/queues": "Inference queue depth and wait times per model and lane",
+            "/admin/capture": "Capture incoming traffic for replay.py",
+            "/admin/migration": "Re-embed vectors stored by older model versions"
         }
     }
 
@@ -395,13 +1993,21 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return {"status": "healthy", "models_loaded": True}
+    token_caches = {model_type.value: info["tokens"] for model_type, info in models.items()}
+    token_caches["sentiment"] = sentiment_tokens
+    return {
+        "status": "healthy",
+        "models_loaded": True,
+        "token_cache": {
+            name: {"entries": len(cache), "hits": cache.hits, "misses": cache.misses}
+            for name, cache in token_caches.items()
+        }
+    }
 
 
 if __name__ == "__main__":
     import uvicorn
-    import sys
-    PORT = 8000
+    PORT = int(os.environ.get("VECTORIZATION_PORT", 8000))
     print(f"🚀 Text Vectorization API starting on http://localhost:{PORT}", flush=True)
     sys.stdout.flush()
     uvicorn.run(app, host="0.0.0.0", port=PORT, log_level="info")
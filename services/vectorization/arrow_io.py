@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Embedding Snapshots
+-------------------
+Bulk export and import of stored embeddings as Arrow IPC streams or Parquet
+files, instead of nested JSON float lists.
+
+A snapshot holds one model's vectors, one row per item:
+- item_id, fingerprint, text (source text, when stored)
+- embedding: fixed_size_list<float32>[dim]
+- component.<category>: hybrid component vectors (list<float32>), null where
+  an item has none
+- valence, arousal, dominance: VAD features, null where missing
+The schema metadata records the model, dimension, component categories and
+the spec of every fingerprint in the snapshot, so an importing node knows
+what produced the vectors even if it runs a different model version.
+
+Arrow IPC snapshots are read without copying: from a memory map (files) or
+straight from the request body, every batch's vectors are numpy views of
+the Arrow buffers, and the only copy is the write into SQLite. Parquet is
+smaller on disk but decoded on read.
+
+Needs pyarrow (optional dependency): pip install pyarrow
+
+Usage:
+    python arrow_io.py export --model_type general --out general.arrow [--format parquet]
+    python arrow_io.py import general.arrow [--db data/vectors.db]
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from vector_store import VAD_COLUMNS, VectorStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+SNAPSHOT_FORMAT = "vectorization-embeddings/1"
+METADATA_KEY = b"vectorization"
+COMPONENT_PREFIX = "component."
+BATCH_ROWS = 8192
+
+FORMATS = ("arrow", "parquet")
+MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.stream", "parquet": "application/vnd.apache.parquet"}
+PARQUET_MAGIC = b"PAR1"
+
+
+def require_arrow() -> None:
+    if pa is None:
+        raise RuntimeError("Embedding snapshots need pyarrow: pip install pyarrow")
+
+
+def _vectors(matrix: np.ndarray):
+    """fixed_size_list<float32> column over an (n, dim) matrix, without copying it"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    return pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1])
+
+
+def _optional_vectors(vectors: List[Optional[np.ndarray]]):
+    """list<float32> column with nulls; Parquet cannot read back null fixed-size lists"""
+    present = [np.asarray(vector, dtype=np.float32) for vector in vectors if vector is not None]
+    lengths = [len(vector) if vector is not None else 0 for vector in vectors]
+    offsets = pa.array(np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32))
+    values = pa.array(np.concatenate(present) if present else np.zeros(0, dtype=np.float32))
+    mask = pa.array([vector is None for vector in vectors])
+    return pa.ListArray.from_arrays(offsets, values, mask=mask)
+
+
+def _matrix(column) -> np.ndarray:
+    """(n, dim) numpy view of a fixed_size_list<float32> column"""
+    dim = column.type.list_size
+    values = column.values.slice(column.offset * dim, len(column) * dim)
+    return values.to_numpy(zero_copy_only=False).reshape(len(column), dim)
+
+
+def _present_rows(column) -> Dict[int, np.ndarray]:
+    """{row: vector} of the non-null rows of a list<float32> column, as views"""
+    valid = np.flatnonzero(column.is_valid().to_numpy(zero_copy_only=False))
+    if not len(valid):
+        return {}
+    values = column.flatten().to_numpy(zero_copy_only=False)
+    return dict(zip(valid.tolist(), values.reshape(len(valid), -1)))
+
+
+def export_table(store: VectorStore, model: str):
+    """Every stored vector of `model`, with its components and VAD features, as an Arrow table"""
+    require_arrow()
+    item_ids, matrix, texts, fingerprints = store.load_records(model)
+    if not item_ids:
+        raise LookupError(f"No '{model}' vectors stored")
+    dim = matrix.shape[1]
+    components = store.load_components(model)
+    categories = sorted({name for vectors in components.values() for name in vectors})
+    vad = store.get_vad(item_ids, model)
+
+    columns = {
+        "item_id": pa.array(item_ids, pa.string()),
+        "fingerprint": pa.array(fingerprints, pa.string()),
+        "text": pa.array(texts, pa.string()),
+        "embedding": _vectors(matrix),
+    }
+    for name in categories:
+        columns[COMPONENT_PREFIX + name] = _optional_vectors(
+            [components.get(item_id, {}).get(name) for item_id in item_ids]
+        )
+    for feature in VAD_COLUMNS:
+        columns[feature] = pa.array([vad.get(item_id, {}).get(feature) for item_id in item_ids], pa.float32())
+
+    specs = store.fingerprint_specs()
+    metadata = {
+        "format": SNAPSHOT_FORMAT,
+        "model": model,
+        "dimensions": dim,
+        "components": categories,
+        "fingerprints": {fp: specs[fp] for fp in sorted(set(fingerprints) - {None}) if fp in specs},
+    }
+    table = pa.table(columns)
+    return table.replace_schema_metadata({METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+
+
+def write_snapshot(table, sink, fmt: str = "arrow") -> None:
+    """Write a snapshot table to a path or pyarrow output stream"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        pq.write_table(table, sink, row_group_size=BATCH_ROWS)
+        return
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+            writer.write_batch(batch)
+
+
+def snapshot_bytes(table, fmt: str = "arrow") -> bytes:
+    sink = pa.BufferOutputStream()
+    write_snapshot(table, sink, fmt)
+    return sink.getvalue().to_pybytes()
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last `drain()`"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_snapshot(table, fmt: str = "arrow") -> Iterator[bytes]:
+    """
+    The snapshot as chunks of at most one record batch (row group for
+    Parquet) each, so it can be streamed without building the whole file
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', expected one of {', '.join(FORMATS)}")
+    sink = _ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(stream, table.schema)
+    else:
+        writer = pa.ipc.new_stream(stream, table.schema)
+    for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def read_snapshot(source: Union[str, bytes]) -> Tuple[Dict, Iterator]:
+    """
+    (metadata, record batches) of an Arrow IPC stream or Parquet snapshot,
+    given as a path (memory-mapped) or the bytes themselves
+    """
+    require_arrow()
+    stream = pa.memory_map(source, "r") if isinstance(source, str) else pa.BufferReader(pa.py_buffer(source))
+    magic = stream.read(len(PARQUET_MAGIC))
+    stream.seek(0)
+
+    if magic == PARQUET_MAGIC:
+        parquet = pq.ParquetFile(stream)
+        schema, batches = parquet.schema_arrow, parquet.iter_batches(batch_size=BATCH_ROWS)
+    else:
+        reader = pa.ipc.open_stream(stream)
+        schema, batches = reader.schema, iter(reader)
+
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    metadata = json.loads(raw) if raw else {}
+    if metadata.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Not a {SNAPSHOT_FORMAT} snapshot")
+    return metadata, batches
+
+
+def import_snapshot(store: VectorStore, source: Union[str, bytes],
+                    write_vectors: Optional[Callable[[str, List, Optional[str]], None]] = None) -> Dict:
+    """
+    Write a snapshot into the store: vectors (grouped by fingerprint), then
+    components and VAD features. `write_vectors(model, rows, fingerprint)`
+    replaces the plain upsert, e.g. to keep centroids and PQ codes in sync.
+    """
+    started = time.perf_counter()
+    metadata, batches = read_snapshot(source)
+    model = metadata["model"]
+    if write_vectors is None:
+        write_vectors = lambda model_key, rows, fingerprint: store.upsert_many(model_key, rows, fingerprint)
+
+    for spec in metadata["fingerprints"].values():
+        store.register_fingerprint(model, spec)
+
+    counts = {"items": 0, "components": 0, "vad": 0}
+    per_fingerprint: Dict[Optional[str], int] = {}
+    for batch in batches:
+        item_ids = batch.column("item_id").to_pylist()
+        texts = batch.column("text").to_pylist()
+        fingerprints = batch.column("fingerprint").to_pylist()
+        embeddings = _matrix(batch.column("embedding"))
+        present = {name: _present_rows(batch.column(COMPONENT_PREFIX + name)) for name in metadata["components"]}
+
+        groups: Dict[Optional[str], List[int]] = {}
+        for row, fingerprint in enumerate(fingerprints):
+            groups.setdefault(fingerprint, []).append(row)
+        for fingerprint, rows in groups.items():
+            write_vectors(model, [(item_ids[i], embeddings[i], texts[i]) for i in rows], fingerprint)
+            per_fingerprint[fingerprint] = per_fingerprint.get(fingerprint, 0) + len(rows)
+            # Components carry the fingerprint of the vectors they were combined into
+            components = {}
+            for name, vectors in present.items():
+                for i in rows:
+                    if i in vectors:
+                        components.setdefault(item_ids[i], {})[name] = vectors[i]
+            if components:
+                counts["components"] += store.set_components(model, components.items(), fingerprint)
+
+        features = np.stack([batch.column(name).to_numpy(zero_copy_only=False) for name in VAD_COLUMNS], axis=1)
+        with_vad = ~np.isnan(features).any(axis=1)
+        if with_vad.any():
+            store.set_vad(model, [item_id for item_id, keep in zip(item_ids, with_vad) if keep], features[with_vad])
+            counts["vad"] += int(with_vad.sum())
+        counts["items"] += len(item_ids)
+
+    return {
+        "model": model,
+        **counts,
+        "fingerprints": [{"fingerprint": fp, "count": count} for fp, count in per_fingerprint.items()],
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and import stored embeddings as Arrow/Parquet snapshots")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", nargs="?", help="Snapshot to import")
+    parser.add_argument("--db", default=os.path.join(os.environ.get("VECTORIZATION_DATA_DIR", os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data"
+    )), "vectors.db"))
+    parser.add_argument("--model_type", default="general")
+    parser.add_argument("--format", choices=FORMATS, default="arrow")
+    parser.add_argument("--out", help="Snapshot path (default: <model_type>.<format>)")
+    args = parser.parse_args()
+
+    require_arrow()
+    store = VectorStore(args.db)
+    if args.command == "export":
+        out = args.out or f"{args.model_type}.{args.format}"
+        started = time.perf_counter()
+        try:
+            table = export_table(store, args.model_type)
+        except LookupError as e:
+            parser.exit(1, f"{e}\n")
+        write_snapshot(table, out, args.format)
+        print(f"Exported {table.num_rows} '{args.model_type}' vectors to {out} "
+              f"({os.path.getsize(out) / 2**20:.1f} MiB) in {time.perf_counter() - started:.2f}s")
+    else:
+        if not args.path:
+            parser.error("import needs the snapshot path")
+        report = import_snapshot(store, args.path)
+        print(f"Imported {report['items']} '{report['model']}' vectors ({report['components']} with components, "
+              f"{report['vad']} with VAD) in {report['seconds']:.2f}s")
+        for entry in report["fingerprints"]:
+            print(f"  {entry['fingerprint'] or 'unknown':16s} {entry['count']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Request Cancellation
+--------------------
+Request-scoped cancellation for inference work.
+
+A `CancelToken` is held in a context variable for the lifetime of an HTTP
+request, the same way profiling keeps stage timings, and travels with the
+request's work onto the scheduler's model threads. The token is cancelled
+when the client disconnects, and expires at the deadline the client sent
+(X-Request-Timeout, in seconds).
+
+Inference code calls `checkpoint()` before each forward pass, so abandoned
+requests stop between batches instead of running to the end. The scheduler
+drops queued work whose token is already cancelled. Outside a request
+(background jobs, gRPC, scripts), the checks are no-ops.
+"""
+
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+DISCONNECT = "disconnect"
+DEADLINE = "deadline"
+
+
+class Cancelled(Exception):
+    """The request the work belonged to was abandoned; `reason` is "disconnect" or "deadline" """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request cancelled ({reason})")
+        self.reason = reason
+
+
+class CancelToken:
+    """Cancellation state of one request, plus how much model work it used"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.reason: Optional[str] = None
+        # Forward passes started, and queued work items dropped before running
+        self.passes = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "CancelToken":
+        """Token for an X-Request-Timeout header value (seconds), or without a deadline when absent"""
+        if value is None:
+            return cls()
+        timeout = float(value)
+        # NaN compares false with everything, so it would slip past `<= 0`
+        if not math.isfinite(timeout) or timeout <= 0:
+            raise ValueError(f"{TIMEOUT_HEADER} must be a positive number of seconds")
+        return cls(timeout)
+
+    def cancel(self, reason: str = DISCONNECT) -> None:
+        if self.reason is None:
+            self.reason = reason
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.deadline is not None and time.monotonic() > self.deadline:
+            self.reason = DEADLINE
+        return self.reason is not None
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+
+_token: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def set_token(token: Optional[CancelToken]) -> None:
+    _token.set(token)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _token.get()
+
+
+def check_cancelled() -> None:
+    """Raise Cancelled if the current request was abandoned"""
+    token = _token.get()
+    if token is not None:
+        token.check()
+
+
+def checkpoint() -> None:
+    """`check_cancelled()` before a forward pass, counting the pass for the request"""
+    token = _token.get()
+    if token is None:
+        return
+    token.check()
+    token.passes += 1
+
+
+class CancellationStats:
+    """Totals over finished requests: how many were cancelled and the model work they wasted"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cancelled = {DISCONNECT: 0, DEADLINE: 0}
+        self.passes = 0
+        self.wasted_passes = 0
+        self.dropped = 0
+
+    def record(self, token: CancelToken) -> None:
+        with self._lock:
+            self.requests += 1
+            self.passes += token.passes
+            self.dropped += token.dropped
+            if token.reason is not None:
+                self.cancelled[token.reason] += 1
+                # Passes that ran for a request nobody was waiting for anymore
+                self.wasted_passes += token.passes
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cancelled": dict(self.cancelled),
+                "forward_passes": self.passes,
+                "wasted_forward_passes": self.wasted_passes,
+                "dropped_work_items": self.dropped,
+            }
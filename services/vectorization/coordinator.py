@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Sharding Coordinator
+--------------------
+Fans embedding work out to several vectorization nodes (api.py instances).
+
+Each text goes to a node chosen by consistent hashing of its content, so a
+repeated text lands on the node whose token cache already holds it. Hybrid
+items are routed by item id (where their stored components live) or by
+their texts. Sub-batches run in parallel and results are merged back in
+request order.
+
+When a node fails or is overloaded, its texts move to the next node on the
+ring and the node sits out a short cooldown. Adding or removing a node only
+moves the keys next to its ring positions (about 1/N of them), so the other
+nodes keep their caches.
+
+Projections (`dimensions`) are fitted per node, so a reduced dimension is
+only served when every reachable node has the same projection fitted;
+otherwise the request fails with 400 whichever nodes it would be routed to.
+
+Usage (several local processes):
+    VECTORIZATION_PORT=8001 VECTORIZATION_DATA_DIR=data/node1 python api.py &
+    VECTORIZATION_PORT=8002 VECTORIZATION_DATA_DIR=data/node2 python api.py &
+    python coordinator.py --nodes http://localhost:8001 http://localhost:8002 [--port 8100]
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from embedding_cache import text_key
+from model_registry import MODEL_DIMENSIONS, ModelType
+
+# Status codes worth retrying on another node; anything else is the same answer everywhere
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with `replicas` virtual points per node"""
+
+    def __init__(self, nodes: Sequence[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.replicas):
+            point = _ring_hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def preference(self, key: str) -> List[str]:
+        """Distinct nodes in ring order from the key's position: owner first, then fallbacks"""
+        if not self._points:
+            return []
+        start = bisect.bisect(self._points, _ring_hash(key)) % len(self._points)
+        order: List[str] = []
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in order:
+                order.append(owner)
+                if len(order) == len(self._nodes):
+                    break
+        return order
+
+    def ownership(self) -> Dict[str, float]:
+        """Share of the key space owned by each node"""
+        shares = {node: 0.0 for node in self._nodes}
+        if not self._points:
+            return shares
+        span = 2 ** 64
+        for i, owner in enumerate(self._owners):
+            # A point owns the arc from the previous point up to itself
+            previous = self._points[i - 1] if i else self._points[-1] - span
+            shares[owner] += (self._points[i] - previous) / span
+        return shares
+
+
+class NodeError(Exception):
+    """A node answered with an error that retrying elsewhere will not fix"""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(str(detail))
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Coordinator:
+    """Routes embedding work across nodes and merges the results"""
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 128, timeout: float = 120.0,
+                 cooldown: float = 10.0, max_batch: int = 512, max_workers: int = 32,
+                 projection_ttl: float = 30.0):
+        self.ring = HashRing([node.rstrip("/") for node in nodes], replicas)
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.max_batch = max_batch
+        self.projection_ttl = projection_ttl
+        self._down_until: Dict[str, float] = {}
+        self._projections: Dict[str, Tuple[float, Dict[Tuple[str, int], Optional[str]]]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coordinator")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    # -------------------------------------------------------------------------
+    # Membership and health
+    # -------------------------------------------------------------------------
+
+    def join(self, node: str) -> Dict[str, float]:
+        with self._lock:
+            self.ring.add(node.rstrip("/"))
+            return self.ring.ownership()
+
+    def leave(self, node: str) -> Dict[str, float]:
+        with self._lock:
+            self.ring.remove(node.rstrip("/"))
+            self._down_until.pop(node.rstrip("/"), None)
+            self._projections.pop(node.rstrip("/"), None)
+            return self.ring.ownership()
+
+    def _route(self, key: str) -> List[str]:
+        """Preference list with nodes in cooldown moved to the back"""
+        with self._lock:
+            order = self.ring.preference(key)
+            now = time.monotonic()
+            return [n for n in order if self._down_until.get(n, 0) <= now] + \
+                   [n for n in order if self._down_until.get(n, 0) > now]
+
+    def _record(self, node: str, field: str, amount: int = 1) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(node, {"requests": 0, "items": 0, "failures": 0})
+            stats[field] += amount
+            if field == "failures":
+                self._down_until[node] = time.monotonic() + self.cooldown
+
+    def status(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            ownership = self.ring.ownership()
+            return {
+                "nodes": {
+                    node: {
+                        "share": ownership[node],
+                        "healthy": self._down_until.get(node, 0) <= now,
+                        **self._stats.get(node, {"requests": 0, "items": 0, "failures": 0})
+                    }
+                    for node in self.ring.nodes
+                },
+                "replicas": self.ring.replicas,
+            }
+
+    # -------------------------------------------------------------------------
+    # Fan-out
+    # -------------------------------------------------------------------------
+
+    def _post(self, node: str, path: str, payload: Dict) -> Dict:
+        self._record(node, "requests")
+        try:
+            response = self._session.post(f"{node}{path}", json=payload, timeout=self.timeout)
+        except requests.RequestException:
+            self._record(node, "failures")
+            raise
+        if response.status_code in RETRYABLE_STATUSES:
+            self._record(node, "failures")
+            raise requests.HTTPError(f"{node} answered {response.status_code}", response=response)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise NodeError(response.status_code, detail)
+        return response.json()
+
+    def _fan_out(self, keys: List[str], path: str, build_payload, extract) -> Tuple[List[Any], List[Dict]]:
+        """
+        Send each unique key's work to its preferred node in per-node chunks,
+        moving failed chunks to the next node on the ring. Returns one result
+        per key (in order) and the raw node responses.
+        """
+        unique = list(dict.fromkeys(keys))
+        routes = {key: self._route(key) for key in unique}
+        if any(not route for route in routes.values()):
+            raise NodeError(503, "No vectorization nodes registered")
+        attempt = {key: 0 for key in unique}
+        results: Dict[str, Any] = {}
+        responses: List[Dict] = []
+        last_error: Optional[Exception] = None
+
+        pending = unique
+        while pending:
+            groups: Dict[str, List[str]] = {}
+            for key in pending:
+                if attempt[key] >= len(routes[key]):
+                    raise NodeError(503, f"All nodes failed: {last_error}")
+                groups.setdefault(routes[key][attempt[key]], []).append(key)
+
+            chunks = [(node, group[i:i + self.max_batch])
+                      for node, group in groups.items()
+                      for i in range(0, len(group), self.max_batch)]
+            futures = [(node, chunk, self._pool.submit(self._post, node, path, build_payload(chunk)))
+                       for node, chunk in chunks]
+
+            pending = []
+            for node, chunk, future in futures:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    last_error = e
+                    for key in chunk:
+                        attempt[key] += 1
+                    pending.extend(chunk)
+                    continue
+                self._record(node, "items", len(chunk))
+                responses.append(response)
+                results.update(zip(chunk, extract(response)))
+
+        return [results[key] for key in keys], responses
+
+    def _node_projections(self, node: str) -> Optional[Dict[Tuple[str, int], Optional[str]]]:
+        """{(model, dimensions): checksum} of the projections fitted on a node, None if it cannot be reached"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._projections.get(node)
+        if cached and now - cached[0] < self.projection_ttl:
+            return cached[1]
+        try:
+            response = self._session.get(f"{node}/projection", timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        fitted = {(p["model"], p["dimensions"]): p.get("checksum") for p in response.json()["projections"]}
+        with self._lock:
+            self._projections[node] = (now, fitted)
+        return fitted
+
+    def check_projection(self, model_type: str, dimensions: Optional[int]) -> None:
+        """Reject a reduced dimension unless every reachable node serves the same projection for it"""
+        if dimensions is None or dimensions == MODEL_DIMENSIONS[ModelType(model_type)]:
+            return
+        with self._lock:
+            nodes = self.ring.nodes
+        fitted = {node: projections for node, projections in zip(nodes, self._pool.map(self._node_projections, nodes))
+                  if projections is not None}
+        missing = [node for node, projections in fitted.items() if (model_type, dimensions) not in projections]
+        if missing:
+            raise NodeError(400, f"No {dimensions}d projection fitted for model '{model_type}' on "
+                                 f"{', '.join(missing)}. Fit the same projection on every node.")
+        if len({projections[(model_type, dimensions)] for projections in fitted.values()}) > 1:
+            raise NodeError(400, f"Nodes serve different {dimensions}d projections for model '{model_type}'. "
+                                 f"Fit the same projection on every node.")
+
+    @staticmethod
+    def _check_fingerprints(responses: List[Dict]) -> Optional[str]:
+        """Nodes running different model versions would return incomparable vectors"""
+        fingerprints = {r.get("fingerprint") for r in responses if r.get("fingerprint")}
+        if len(fingerprints) > 1:
+            raise NodeError(502, f"Nodes disagree on the model fingerprint: {sorted(fingerprints)}")
+        return next(iter(fingerprints), None)
+
+    def embed_batch(self, texts: List[str], model_type: str, dimensions: Optional[int], include_vad: bool = False,
+                    long_text: Optional[Dict] = None) -> Dict:
+        self.check_projection(model_type, dimensions)
+        by_key = {text_key(text): text for text in texts}
+        keys = [text_key(text) for text in texts]
+        results, responses = self._fan_out(
+            keys, "/embed/batch",
+            lambda chunk: {"texts": [by_key[k] for k in chunk], "model_type": model_type, "dimensions": dimensions,
+                           "include_vad": include_vad, "long_text": long_text},
+            lambda response: zip(response["embeddings"], response["vad"]) if include_vad else response["embeddings"]
+        )
+        result = {
+            "embeddings": [embedding for embedding, _ in results] if include_vad else results,
+            "count": len(results),
+            "model": model_type,
+            "fingerprint": self._check_fingerprints(responses),
+        }
+        if include_vad:
+            result["vad"] = [vad for _, vad in results]
+        return result
+
+    def embed_hybrid_batch(self, items: List[Dict[str, str]], weights: Optional[Dict[str, float]],
+                           dimensions: Optional[int], item_ids: Optional[List[str]],
+                           include_vad: bool = False) -> List[Dict]:
+        self.check_projection(ModelType.CREATIVE.value, dimensions)
+        # Stored items go to the node that keeps their components; others by content
+        keys = [
+            f"item:{item_id}" if item_id else text_key(json.dumps(texts, sort_keys=True))
+            for texts, item_id in zip(items, item_ids or [None] * len(items))
+        ]
+        payloads = {key: (texts, item_id) for key, texts, item_id in zip(keys, items, item_ids or [None] * len(items))}
+
+        def build(chunk):
+            payload = {"items": [payloads[k][0] for k in chunk], "weights": weights, "dimensions": dimensions,
+                       "include_vad": include_vad}
+            if item_ids is not None:
+                payload["item_ids"] = [payloads[k][1] for k in chunk]
+            return payload
+
+        results, responses = self._fan_out(keys, "/embed/hybrid/batch", build, lambda r: r["results"])
+        self._check_fingerprints([result for r in responses for result in r["results"]])
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self._session.close()
+
+
+# =============================================================================
+# Coordinator API
+# =============================================================================
+
+# Same fields as the node request models in api.py, forwarded as they are
+
+class LongTextOptions(BaseModel):
+    window: int = 128
+    overlap: int = 32
+    pooling: str = "weighted"
+
+
+class EmbedRequest(BaseModel):
+    text: str
+    model_type: ModelType = ModelType.GENERAL
+    dimensions: Optional[int] = None
+    include_vad: bool = False
+    long_text: Optional[LongTextOptions] = None
+
+
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+    model_type: ModelType = ModelType.GENERAL
+    dimensions: Optional[int] = None
+    include_vad: bool = False
+    long_text: Optional[LongTextOptions] = None
+
+
+class HybridEmbedRequest(BaseModel):
+    texts: Dict[str, str]
+    weights: Optional[Dict[str, float]] = None
+    dimensions: Optional[int] = None
+    item_id: Optional[str] = None
+    include_vad: bool = False
+
+
+class HybridBatchRequest(BaseModel):
+    items: List[Dict[str, str]]
+    weights: Optional[Dict[str, float]] = None
+    dimensions: Optional[int] = None
+    item_ids: Optional[List[str]] = None
+    include_vad: bool = False
+
+
+class NodeRequest(BaseModel):
+    url: str
+
+
+coordinator = Coordinator(
+    [node for node in os.environ.get("VECTORIZATION_NODES", "").split(",") if node],
+    replicas=int(os.environ.get("VECTORIZATION_RING_REPLICAS", 128)),
+)
+
+app = FastAPI(title="Text Vectorization Coordinator")
+
+
+async def run_routed(fn, *args):
+    """Run blocking fan-out off the event loop, mapping node errors to HTTP errors"""
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except NodeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def long_text_options(options: Optional[LongTextOptions]) -> Optional[Dict]:
+    return options.model_dump() if options is not None else None
+
+
+@app.post("/embed")
+async def embed(request: EmbedRequest) -> Dict:
+    result = await run_routed(
+        coordinator.embed_batch, [request.text], request.model_type.value, request.dimensions, request.include_vad,
+        long_text_options(request.long_text)
+    )
+    embedding = result["embeddings"][0]
+    response = {"embedding": embedding, "model": request.model_type, "dimensions": len(embedding),
+                "fingerprint": result["fingerprint"]}
+    if request.include_vad:
+        response["vad"] = result["vad"][0]
+    return response
+
+
+@app.post("/embed/batch")
+async def embed_batch(request: EmbedBatchRequest) -> Dict:
+    """Texts are sharded across nodes by content hash and merged back in order"""
+    if not request.texts:
+        return {"embeddings": [], "count": 0, "model": request.model_type}
+    return await run_routed(
+        coordinator.embed_batch, request.texts, request.model_type.value, request.dimensions, request.include_vad,
+        long_text_options(request.long_text)
+    )
+
+
+@app.post("/embed/hybrid")
+async def embed_hybrid(request: HybridEmbedRequest) -> Dict:
+    results = await run_routed(
+        coordinator.embed_hybrid_batch, [request.texts], request.weights, request.dimensions,
+        [request.item_id] if request.item_id else None, request.include_vad
+    )
+    return results[0]
+
+
+@app.post("/embed/hybrid/batch")
+async def embed_hybrid_batch(request: HybridBatchRequest) -> Dict:
+    """Items are sharded by item id (or content) and merged back in order"""
+    if request.item_ids is not None and len(request.item_ids) != len(request.items):
+        raise HTTPException(status_code=400, detail="item_ids must match the number of items")
+    if not request.items:
+        return {"results": [], "count": 0}
+    results = await run_routed(
+        coordinator.embed_hybrid_batch, request.items, request.weights, request.dimensions, request.item_ids,
+        request.include_vad
+    )
+    return {"results": results, "count": len(results)}
+
+
+@app.get("/nodes")
+async def list_nodes() -> Dict:
+    """Ring membership, key-space share, health and traffic per node"""
+    return coordinator.status()
+
+
+@app.post("/nodes")
+async def join_node(request: NodeRequest) -> Dict:
+    """Add a node; only keys next to its ring points move to it"""
+    return {"ownership": coordinator.join(request.url)}
+
+
+@app.delete("/nodes")
+async def leave_node(request: NodeRequest) -> Dict:
+    """Remove a node; its keys fall to the next nodes on the ring"""
+    return {"ownership": coordinator.leave(request.url)}
+
+
+@app.get("/health")
+async def health() -> Dict:
+    status = coordinator.status()
+    healthy = [node for node, info in status["nodes"].items() if info["healthy"]]
+    return {"status": "healthy" if healthy else "degraded", "nodes": len(status["nodes"]), "healthy_nodes": len(healthy)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Shard embedding requests across vectorization nodes")
+    parser.add_argument("--nodes", nargs="+", default=[], help="Node base URLs, e.g. http://localhost:8001")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VECTORIZATION_PORT", 8100)))
+    args = parser.parse_args()
+
+    for node in args.nodes:
+        coordinator.join(node)
+    print(f"🚀 Vectorization coordinator on http://localhost:{args.port} for {len(coordinator.ring.nodes)} nodes",
+          flush=True)
+    uvicorn.run(app, host="0.0.0.0", port=args.port, log_level="info")
@@ -7,24 +7,51 @@ This module implements a flexible, adaptive matching algorithm that:
 2. Adapts weights based on playlist characteristics
 3. Avoids fixed categories for moods and themes
 4. Uses contextual understanding for better matching
+
+Usage:
+    python dynamic_matcher.py <test_file>
+    python dynamic_matcher.py --playlist <playlist.json> --songs <songs.jsonl|songs.json>
+        [--top_k 20] [--output scores.ndjson] [--explain] [--chart top.png]
+
+The second form streams songs from JSON lines or a JSON array in batches,
+writes one NDJSON score line per song and keeps only the top-k in memory,
+so it works for libraries of any size. Explanations and the chart are only
+produced when asked for.
+
+With --cascade N, songs are first scored with the cheap FAST model and only
+the best N are embedded and scored again with the CREATIVE model.
+--evaluate_cascade N [N ...] reports recall of the full CREATIVE top-k
+within each shortlist and the speedup, to pick N:
+    python dynamic_matcher.py --playlist <playlist.json> --songs <songs.jsonl> --evaluate_cascade 50 100 200
+
+Aspect embeddings (theme, mood, activity, intensity) of songs and playlists
+are kept on disk (--cache, off with --no_cache), keyed by model and a hash
+of the aspect text, which is built only from the analysis fields that aspect
+uses. A re-match embeds only new or changed songs, and playlist aspects are
+reused until the playlist analysis changes. The cascade evaluation always
+embeds from scratch so its timings stay honest.
 """
 
+import heapq
+import itertools
 import json
+import sys
+import time
 import numpy as np
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Iterable, Iterator, Tuple, Optional
 import torch
 import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import DBSCAN
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from embedding_cache import EmbeddingCache
+from model_registry import MODEL_NAMES, ModelType, embedding_cache_namespace, model_source
 
 # Load model
 print("Loading matching model...")
 model_name = "sentence-transformers/all-MiniLM-L6-v2"  # Better performing model
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModel.from_pretrained(model_name)
+tokenizer = AutoTokenizer.from_pretrained(model_source(model_name))
+model = AutoModel.from_pretrained(model_source(model_name))
 
 # Move model to GPU if available
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -101,36 +128,69 @@ def extract_key_aspects(playlist: Dict[str, Any]) -> Dict[str, float]:
     
     return aspects
 
-def create_contextual_embedding(item: Dict[str, Any], aspect: str) -> np.ndarray:
+_encoders: Dict[str, Dict[str, Any]] = {model_name: {"name": model_name, "tokenizer": tokenizer, "model": model}}
+
+def load_encoder(model_type: ModelType) -> Dict[str, Any]:
+    """Tokenizer and model for a served ModelType, loaded on first use"""
+    name = MODEL_NAMES[model_type]
+    if name not in _encoders:
+        print(f"Loading {model_type.value} model ({name})...")
+        _encoders[name] = {
+            "name": name,
+            "tokenizer": AutoTokenizer.from_pretrained(model_source(name)),
+            "model": AutoModel.from_pretrained(model_source(name)).to(device)
+        }
+    return _encoders[name]
+
+def embed_texts(texts: List[str], batch_size: int = 32, encoder: Optional[Dict[str, Any]] = None,
+                cache: Optional[EmbeddingCache] = None) -> np.ndarray:
     """
-    Create a contextual embedding for a specific aspect of a song or playlist
+    Normalized embeddings for many texts, in length-sorted batches (default
+    model unless `encoder`). With a cache, only texts it does not hold for
+    this model's fingerprint reach the model, and their embeddings are added
+    to it.
     """
+    encoder = encoder or _encoders[model_name]
+    if cache is not None and texts:
+        revision = getattr(encoder["model"].config, "_commit_hash", None)
+        return cache.embed(embedding_cache_namespace(encoder["name"], revision), texts,
+                           lambda missing: embed_texts(missing, batch_size, encoder))
+    embeddings = np.zeros((len(texts), encoder["model"].config.hidden_size), dtype=np.float32)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        encoded_input = encoder["tokenizer"]([texts[i] for i in rows], padding=True, truncation=True,
+                                             max_length=512, return_tensors='pt').to(device)
+        with torch.no_grad():
+            model_output = encoder["model"](**encoded_input)
+        batch = F.normalize(mean_pooling(model_output, encoded_input['attention_mask']), p=2, dim=1)
+        embeddings[rows] = batch.cpu().numpy()
+    return embeddings
+
+def aspect_text(item: Dict[str, Any], aspect: str) -> Optional[str]:
+    """Text describing one aspect of a song or playlist, None when the item has none"""
     if aspect == "theme":
         themes = item.get("meaning", {}).get("themes", [])
         if not themes:
-            return np.zeros(384)  # Default embedding size
+            return None
         
         # Combine theme names and descriptions
         theme_texts = [f"{t.get('name', '')} {t.get('description', '')}" for t in themes]
-        combined_text = " ".join(theme_texts)
-        
-        return get_embedding(combined_text)
+        return " ".join(theme_texts)
     
     elif aspect == "mood":
         mood = item.get("emotional", {}).get("dominant_mood", {})
         if not mood:
-            return np.zeros(384)
+            return None
         
-        mood_text = f"{mood.get('mood', '')} {mood.get('description', '')}"
-        return get_embedding(mood_text)
+        return f"{mood.get('mood', '')} {mood.get('description', '')}"
     
     elif aspect == "activity":
         activities = item.get("context", {}).get("situations", {}).get("perfect_for", [])
         if not activities:
-            return np.zeros(384)
+            return None
         
-        activity_text = " ".join(activities)
-        return get_embedding(activity_text)
+        return " ".join(activities)
     
     elif aspect == "intensity":
         # For intensity, we use a combination of mood and emotional progression
@@ -141,10 +201,19 @@ def create_contextual_embedding(item: Dict[str, Any], aspect: str) -> np.ndarray
         if progression:
             intensity_text += " " + " ".join([p.get("mood", "") for p in progression])
         
-        return get_embedding(intensity_text)
+        return intensity_text
     
     # Default case
-    return np.zeros(384)
+    return None
+
+def create_contextual_embedding(item: Dict[str, Any], aspect: str) -> np.ndarray:
+    """
+    Create a contextual embedding for a specific aspect of a song or playlist
+    """
+    text = aspect_text(item, aspect)
+    if text is None:
+        return np.zeros(384)  # Default embedding size
+    return get_embedding(text)
 
 def detect_contradictions(
     playlist_embedding: np.ndarray,
@@ -161,6 +230,13 @@ def detect_contradictions(
     # Using a non-linear transformation to emphasize strong contradictions
     contradiction_score = max(0, 1 - similarity)
     
+    return {
+        "score": contradiction_score,
+        "explanation": contradiction_explanation(contradiction_score, aspect)
+    }
+
+def contradiction_explanation(contradiction_score: float, aspect: str) -> str:
+    """Human-readable contradiction level"""
     # Generate explanation based on contradiction level
     if contradiction_score < 0.2:
         explanation = f"No significant {aspect} contradiction detected."
@@ -173,10 +249,7 @@ def detect_contradictions(
     else:
         explanation = f"Major {aspect} contradiction detected. These {aspect}s are opposites."
     
-    return {
-        "score": contradiction_score,
-        "explanation": explanation
-    }
+    return explanation
 
 def calculate_aspect_similarity(
     playlist_embedding: np.ndarray,
@@ -188,9 +261,26 @@ def calculate_aspect_similarity(
     
     return float(cosine_similarity([playlist_embedding], [song_embedding])[0][0])
 
+def aspect_embeddings(items: List[Dict[str, Any]], aspects: List[str], batch_size: int = 32,
+                      encoder: Optional[Dict[str, Any]] = None,
+                      cache: Optional[EmbeddingCache] = None) -> List[Dict[str, np.ndarray]]:
+    """
+    `create_contextual_embedding` for every aspect of every item, embedded in
+    batches (and through `cache` when given)
+    """
+    texts = [[aspect_text(item, aspect) for aspect in aspects] for item in items]
+    vectors = iter(embed_texts([t for row in texts for t in row if t is not None], batch_size, encoder, cache))
+    dim = (encoder or _encoders[model_name])["model"].config.hidden_size
+    return [
+        {aspect: next(vectors) if text is not None else np.zeros(dim) for aspect, text in zip(aspects, row)}
+        for row in texts
+    ]
+
 def match_song_to_playlist(
     playlist: Dict[str, Any],
-    song: Dict[str, Any]
+    song: Dict[str, Any],
+    playlist_embeddings: Optional[Dict[str, np.ndarray]] = None,
+    song_embeddings: Optional[Dict[str, np.ndarray]] = None
 ) -> Dict[str, Any]:
     """
     Match a song to a playlist using dynamic weighting and contextual understanding
@@ -199,13 +289,11 @@ def match_song_to_playlist(
     # Extract key aspects and their importance
     aspect_weights = extract_key_aspects(playlist)
     
-    # Create embeddings for each aspect
-    playlist_embeddings = {}
-    song_embeddings = {}
-    
-    for aspect in aspect_weights:
-        playlist_embeddings[aspect] = create_contextual_embedding(playlist, aspect)
-        song_embeddings[aspect] = create_contextual_embedding(song["analysis"], aspect)
+    # Create embeddings for each aspect, unless the caller already has them
+    if playlist_embeddings is None:
+        playlist_embeddings = {aspect: create_contextual_embedding(playlist, aspect) for aspect in aspect_weights}
+    if song_embeddings is None:
+        song_embeddings = {aspect: create_contextual_embedding(song["analysis"], aspect) for aspect in aspect_weights}
     
     # Calculate similarity for each aspect
     aspect_similarities = {}
@@ -321,16 +409,23 @@ def generate_match_explanation(
 
 def match_songs_to_playlist(
     playlist: Dict[str, Any],
-    songs: List[Dict[str, Any]]
+    songs: List[Dict[str, Any]],
+    cache: Optional[EmbeddingCache] = None
 ) -> List[Dict[str, Any]]:
     """
     Match multiple songs to a playlist
     Returns sorted match results
     """
+    # Every aspect of the playlist and the songs is embedded up front, in batches
+    aspects = list(extract_key_aspects(playlist))
+    playlist_embeddings, *song_embeddings = aspect_embeddings(
+        [playlist] + [song["analysis"] for song in songs], aspects, cache=cache
+    )
+
     results = []
     
-    for song in songs:
-        match_result = match_song_to_playlist(playlist, song)
+    for song, embeddings in zip(songs, song_embeddings):
+        match_result = match_song_to_playlist(playlist, song, playlist_embeddings, embeddings)
         results.append(match_result)
     
     # Sort by final score (descending)
@@ -338,10 +433,281 @@ def match_songs_to_playlist(
     
     return results
 
+def prepare_playlist(playlist: Dict[str, Any], encoder: Optional[Dict[str, Any]] = None,
+                     cache: Optional[EmbeddingCache] = None) -> Dict[str, Any]:
+    """
+    Aspect weights and aspect embeddings of a playlist, computed once for batch
+    scoring; songs scored against it go through the same encoder and cache
+    """
+    aspect_weights = extract_key_aspects(playlist)
+    aspects = [aspect for aspect, weight in aspect_weights.items() if weight > 0]
+    texts = {aspect: aspect_text(playlist, aspect) for aspect in aspects}
+    present = [aspect for aspect in aspects if texts[aspect] is not None]
+    vectors = dict(zip(present, embed_texts([texts[aspect] for aspect in present], encoder=encoder, cache=cache)))
+    dim = (encoder or _encoders[model_name])["model"].config.hidden_size
+    return {
+        "aspect_weights": aspect_weights,
+        "embeddings": {aspect: vectors.get(aspect, np.zeros(dim, dtype=np.float32)) for aspect in aspects},
+        "encoder": encoder,
+        "cache": cache
+    }
+
+def score_songs_batch(prepared: Dict[str, Any], songs: List[Dict[str, Any]],
+                      batch_size: int = 32) -> List[Dict[str, Any]]:
+    """
+    Batched equivalent of `match_song_to_playlist` for a prepared playlist:
+    every aspect text of the batch is embedded in a few forward passes and
+    scored with matrix operations, using the encoder the playlist was
+    prepared with. Returns scores and per-aspect similarities and
+    contradiction scores, without explanations.
+    """
+    aspect_weights = prepared["aspect_weights"]
+    aspects = list(prepared["embeddings"])
+
+    # Embed every (song, aspect) text of the batch together
+    texts = {aspect: [aspect_text(song["analysis"], aspect) for song in songs] for aspect in aspects}
+    flat = [text for aspect in aspects for text in texts[aspect] if text is not None]
+    vectors = iter(embed_texts(flat, batch_size, prepared["encoder"], prepared.get("cache")))
+
+    weighted_similarity = np.zeros(len(songs))
+    contradiction_penalty = np.ones(len(songs))
+    similarities, contradictions = {}, {}
+    for aspect in aspects:
+        playlist_embedding = prepared["embeddings"][aspect]
+        song_embeddings = np.zeros((len(songs), len(playlist_embedding)), dtype=np.float32)
+        for row, text in enumerate(texts[aspect]):
+            if text is not None:
+                song_embeddings[row] = next(vectors)
+
+        # Same rules as calculate_aspect_similarity and detect_contradictions:
+        # cosine is 0 for empty vectors, similarity falls back to a neutral 0.5
+        norms = np.linalg.norm(song_embeddings, axis=1) * np.linalg.norm(playlist_embedding)
+        cosine = np.divide(song_embeddings @ playlist_embedding, norms, out=np.zeros(len(songs)), where=norms > 0)
+        empty = ~song_embeddings.any(axis=1) | (not playlist_embedding.any())
+        similarity = np.where(empty, 0.5, cosine)
+        contradiction = np.maximum(0, 1 - cosine)
+
+        weight = aspect_weights[aspect]
+        weighted_similarity += similarity * weight
+        if weight > 0.2:
+            penalized = contradiction > 0.4
+            contradiction_penalty[penalized] *= 1 - contradiction[penalized] * weight * 0.8
+        similarities[aspect] = similarity
+        contradictions[aspect] = contradiction
+
+    final_scores = weighted_similarity * contradiction_penalty
+    return [
+        {
+            "track_info": song["track"],
+            "final_score": float(final_scores[row]),
+            "aspect_weights": aspect_weights,
+            "aspect_similarities": {aspect: float(similarities[aspect][row]) for aspect in aspects},
+            "contradiction_scores": {aspect: float(contradictions[aspect][row]) for aspect in aspects},
+        }
+        for row, song in enumerate(songs)
+    ]
+
+def explain_result(result: Dict[str, Any]) -> str:
+    """Explanation for a `score_songs_batch` result"""
+    contradictions = {
+        aspect: {"score": score, "explanation": contradiction_explanation(score, aspect)}
+        for aspect, score in result["contradiction_scores"].items()
+    }
+    return generate_match_explanation(
+        result["aspect_weights"], result["aspect_similarities"], contradictions, result["final_score"]
+    )
+
+def iter_songs(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Songs from a JSON-lines file or a top-level JSON array, read incrementally"""
+    with open(path, 'r') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+
+        if head != "[":
+            # JSON lines
+            for line in itertools.chain([head + f.readline()], f):
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer, eof = "", False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                if not buffer:
+                    raise ValueError("need more data")
+                song, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise ValueError(f"Truncated JSON array in {path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield song
+            buffer = buffer[end:]
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def stream_matches(
+    playlist: Dict[str, Any],
+    songs: Iterable[Dict[str, Any]],
+    output_file: str,
+    top_k: int = 20,
+    batch_size: int = 64,
+    explain: bool = False,
+    cache: Optional[EmbeddingCache] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Score songs batch by batch, writing one NDJSON line per song, and return
+    (top_k results sorted by score, number of songs scored). Memory stays
+    bounded by the batch and the top-k heap.
+    """
+    prepared = prepare_playlist(playlist, cache=cache)
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []
+    count = 0
+    with open(output_file, 'w') as out:
+        for batch in batched(songs, batch_size):
+            for result in score_songs_batch(prepared, batch):
+                record = {
+                    "track": result["track_info"],
+                    "score": result["final_score"],
+                    "aspects": result["aspect_similarities"],
+                    "contradictions": result["contradiction_scores"],
+                }
+                if explain:
+                    record["explanation"] = explain_result(result)
+                out.write(json.dumps(record) + "\n")
+
+                # On equal scores the earlier song ranks higher, as in a stable sort
+                entry = (result["final_score"], -count, result)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+                count += 1
+            print(f"Scored {count} songs...", file=sys.stderr)
+
+    top = [result for _, _, result in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+    return top, count
+
+def cascade_matches(
+    playlist: Dict[str, Any],
+    songs: Iterable[Dict[str, Any]],
+    shortlist: int = 100,
+    batch_size: int = 64,
+    recall_model: ModelType = ModelType.FAST,
+    rerank_model: ModelType = ModelType.CREATIVE,
+    cache: Optional[EmbeddingCache] = None
+) -> Dict[str, Any]:
+    """
+    Two-stage ranking: stream every song through aspect scoring with the cheap
+    `recall_model`, keep the best `shortlist`, then embed and score only those
+    with `rerank_model`. Returns the re-ranked shortlist and per-stage timings.
+    """
+    start = time.perf_counter()
+    prepared = prepare_playlist(playlist, load_encoder(recall_model), cache)
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []
+    count = 0
+    for batch in batched(songs, batch_size):
+        for song, result in zip(batch, score_songs_batch(prepared, batch)):
+            # Ties keep the earliest songs, as in a stable sort
+            entry = (result["final_score"], -count, song)
+            if len(heap) < shortlist:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            count += 1
+    recall_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidates = sorted(heap, key=lambda e: (-e[0], -e[1]))
+    prepared = prepare_playlist(playlist, load_encoder(rerank_model), cache)
+    results = []
+    for batch in batched(candidates, batch_size):
+        for (recall_score, _, _), result in zip(batch, score_songs_batch(prepared, [song for _, _, song in batch])):
+            result["recall_score"] = recall_score
+            results.append(result)
+    results.sort(key=lambda r: r["final_score"], reverse=True)
+
+    return {
+        "results": results,
+        "songs": count,
+        "recall_seconds": recall_seconds,
+        "rerank_seconds": time.perf_counter() - start,
+    }
+
+def evaluate_cascade(
+    playlist: Dict[str, Any],
+    songs: List[Dict[str, Any]],
+    shortlist_sizes: List[int],
+    k: int = 20,
+    batch_size: int = 64,
+    recall_model: ModelType = ModelType.FAST,
+    rerank_model: ModelType = ModelType.CREATIVE
+) -> Dict[str, Any]:
+    """
+    Compare the cascade with scoring every song with `rerank_model`: for each
+    shortlist size N, recall@N is the share of the full ranking's top-k that
+    survives the shortlist (and so ends up in the cascade's top-k), and the
+    speedup is full-ranking time over recall + re-rank time.
+    """
+    def score_all(prepared, items):
+        start = time.perf_counter()
+        scores = [r["final_score"] for batch in batched(items, batch_size) for r in score_songs_batch(prepared, batch)]
+        return np.array(scores), time.perf_counter() - start
+
+    recall_prepared = prepare_playlist(playlist, load_encoder(recall_model))
+    rerank_prepared = prepare_playlist(playlist, load_encoder(rerank_model))
+
+    recall_scores, recall_seconds = score_all(recall_prepared, songs)
+    full_scores, full_seconds = score_all(rerank_prepared, songs)
+
+    k = min(k, len(songs))
+    reference = set(np.argsort(-full_scores, kind="stable")[:k].tolist())
+    recall_order = np.argsort(-recall_scores, kind="stable")
+
+    report = []
+    for n in shortlist_sizes:
+        shortlist = recall_order[:n].tolist()
+        _, rerank_seconds = score_all(rerank_prepared, [songs[i] for i in shortlist])
+        cascade_seconds = recall_seconds + rerank_seconds
+        report.append({
+            "shortlist": len(shortlist),
+            "recall": len(reference.intersection(shortlist)) / k if k else 1.0,
+            "cascade_seconds": cascade_seconds,
+            "speedup": full_seconds / cascade_seconds if cascade_seconds > 0 else float("inf"),
+        })
+
+    return {
+        "songs": len(songs),
+        "k": k,
+        "recall_model": recall_model.value,
+        "rerank_model": rerank_model.value,
+        "recall_seconds": recall_seconds,
+        "full_seconds": full_seconds,
+        "shortlists": report,
+    }
+
 def visualize_matches(match_results: List[Dict[str, Any]], output_file: str = None):
     """
     Visualize match results with detailed breakdown
     """
+    # Plotting libraries are only needed when a chart is requested
+    import matplotlib.pyplot as plt
+
     # Extract data for visualization
     songs = [f"{r['track_info']['artist']} - {r['track_info']['title']}" for r in match_results]
     scores = [r["final_score"] for r in match_results]
@@ -377,7 +743,78 @@ def visualize_matches(match_results: List[Dict[str, Any]], output_file: str = No
     else:
         plt.show()
 
-def test_dynamic_matcher(test_file: str):
+def open_cache(args) -> Optional[EmbeddingCache]:
+    return None if args.no_cache else EmbeddingCache(args.cache)
+
+def report_cache(cache: Optional[EmbeddingCache]) -> None:
+    if cache is not None:
+        print(f"Aspect embedding cache: {cache.hits} reused, {cache.misses} embedded", file=sys.stderr)
+
+def run_streaming(args):
+    """Streaming CLI mode: score a song file of any size against one playlist"""
+    with open(args.playlist, 'r') as f:
+        playlist = json.load(f)
+    # Accept a test file ({"playlist": ..., "songs": ...}) as the playlist source
+    playlist = playlist.get("playlist", playlist)
+
+    if args.evaluate_cascade:
+        report = evaluate_cascade(
+            playlist, list(iter_songs(args.songs)), args.evaluate_cascade, args.top_k, args.batch_size,
+            ModelType(args.recall_model), ModelType(args.rerank_model)
+        )
+        print(f"\nCascade {report['recall_model']} -> {report['rerank_model']}, {report['songs']} songs, "
+              f"top-{report['k']} of the full ranking")
+        print(f"Full {report['rerank_model']} ranking: {report['full_seconds']:.2f}s, "
+              f"{report['recall_model']} recall pass: {report['recall_seconds']:.2f}s")
+        for row in report["shortlists"]:
+            print(f"  N={row['shortlist']:6d}  recall@N {row['recall']:.3f}  "
+                  f"{row['cascade_seconds']:.2f}s  speedup {row['speedup']:.1f}x")
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.report}")
+        return
+
+    cache = open_cache(args)
+    if args.cascade:
+        cascade = cascade_matches(
+            playlist, iter_songs(args.songs), args.cascade, args.batch_size,
+            ModelType(args.recall_model), ModelType(args.rerank_model), cache
+        )
+        with open(args.output, 'w') as out:
+            for result in cascade["results"]:
+                record = {
+                    "track": result["track_info"],
+                    "score": result["final_score"],
+                    "recall_score": result["recall_score"],
+                    "aspects": result["aspect_similarities"],
+                    "contradictions": result["contradiction_scores"],
+                }
+                if args.explain:
+                    record["explanation"] = explain_result(result)
+                out.write(json.dumps(record) + "\n")
+        top, count = cascade["results"][:args.top_k], cascade["songs"]
+        print(f"Shortlisted {len(cascade['results'])} of {count} songs in {cascade['recall_seconds']:.2f}s, "
+              f"re-ranked in {cascade['rerank_seconds']:.2f}s; scores written to {args.output}")
+    else:
+        top, count = stream_matches(
+            playlist, iter_songs(args.songs), args.output, args.top_k, args.batch_size, args.explain, cache
+        )
+        print(f"Scored {count} songs, scores written to {args.output}")
+    report_cache(cache)
+
+    print(f"\nTop {len(top)} matches:")
+    print("-" * 80)
+    for i, result in enumerate(top):
+        print(f"{i+1}. {result['track_info']['artist']} - {result['track_info']['title']}")
+        print(f"   Score: {result['final_score']:.2f}")
+        if args.explain:
+            print(f"   {explain_result(result)}")
+    print("-" * 80)
+
+    if args.chart and top:
+        visualize_matches(top, args.chart)
+
+def test_dynamic_matcher(test_file: str, cache: Optional[EmbeddingCache] = None):
     """Test the dynamic matcher with a test file"""
     with open(test_file, 'r') as f:
         test_data = json.load(f)
@@ -388,7 +825,8 @@ def test_dynamic_matcher(test_file: str):
     print(f"Testing dynamic matcher with {len(songs)} songs...")
     
     # Match songs to playlist
-    match_results = match_songs_to_playlist(playlist, songs)
+    match_results = match_songs_to_playlist(playlist, songs, cache)
+    report_cache(cache)
     
     # Print results
     print("\nMatch Results:")
@@ -406,11 +844,33 @@ def test_dynamic_matcher(test_file: str):
     return match_results
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: python dynamic_matcher.py <test_file>")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Match songs to a playlist")
+    parser.add_argument("test_file", nargs="?", help="Test file with a playlist and songs (loaded in memory)")
+    parser.add_argument("--playlist", help="Playlist JSON for streaming mode")
+    parser.add_argument("--songs", help="Songs as JSON lines or a JSON array, streamed in batches")
+    parser.add_argument("--output", default="dynamic_matcher_scores.ndjson", help="NDJSON scores output")
+    parser.add_argument("--top_k", type=int, default=20)
+    parser.add_argument("--batch_size", type=int, default=64, help="Songs scored per batch")
+    parser.add_argument("--explain", action="store_true", help="Add explanations to the output")
+    parser.add_argument("--chart", help="Save a chart of the top-k matches to this path")
+    parser.add_argument("--cascade", type=int, metavar="N",
+                        help="Shortlist N songs with the recall model, re-rank only those")
+    parser.add_argument("--evaluate_cascade", type=int, nargs="+", metavar="N",
+                        help="Report recall@N and speedup of the cascade for these shortlist sizes")
+    parser.add_argument("--report", default="dynamic_matcher_cascade.json", help="Cascade evaluation report output")
+    parser.add_argument("--recall_model", default=ModelType.FAST.value, choices=[m.value for m in ModelType])
+    parser.add_argument("--rerank_model", default=ModelType.CREATIVE.value, choices=[m.value for m in ModelType])
+    parser.add_argument("--cache", default="dynamic_matcher_embeddings.db",
+                        help="Aspect embedding cache, reused across runs")
+    parser.add_argument("--no_cache", action="store_true", help="Embed every aspect from scratch")
+    args = parser.parse_args()
+
+    if args.playlist and args.songs:
+        run_streaming(args)
+    elif args.test_file:
+        test_dynamic_matcher(args.test_file, open_cache(args))
+    else:
+        parser.print_usage()
         sys.exit(1)
-    
-    test_file = sys.argv[1]
-    test_dynamic_matcher(test_file)
@@ -0,0 +1,87 @@
+"""
+Embedding Cache
+---------------
+Persistent on-disk cache of embeddings keyed by model fingerprint and a hash of the
+embedded text, so repeated evaluation or matching runs only embed text that is
+new or has changed.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed (model, text hash) → float32 embedding cache"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, np.ndarray]:
+        result: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+            result.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return result
+
+    def put_many(self, model: str, keys: List[str], embeddings: np.ndarray) -> None:
+        rows = [(model, key, np.asarray(emb, dtype=np.float32).tobytes()) for key, emb in zip(keys, embeddings)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, embedding) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def embed(self, model: str, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray],
+              keys: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Embeddings for `texts` in order, calling `embed_fn` only for unique texts
+        not cached yet. `keys` overrides the default text-hash keys.
+        """
+        keys = keys or [text_key(text) for text in texts]
+        cached = self.get_many(model, keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        self.hits += len(keys) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_embeddings = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+            self.put_many(model, list(missing.keys()), new_embeddings)
+            cached.update(zip(missing.keys(), new_embeddings))
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
@@ -0,0 +1,335 @@
+"""
+Background Embedding Jobs
+-------------------------
+Durable job queue for bulk vectorization (e.g. a whole liked-songs library).
+
+Jobs and their per-item results are persisted in SQLite, so a crash or restart
+only loses the batch in flight: on startup every unfinished item goes back to
+pending and the worker resumes where it left off.
+
+A single worker thread processes pending items in length-bucketed batches and
+only runs while no interactive request is in flight. The batches themselves
+run on the model's bulk lane (scheduler.py), behind any interactive work;
+that ordering and the job's `throttle`, not OS thread priority, are what keep
+background jobs out of the interactive path's way.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class InteractiveGate:
+    """Tracks in-flight interactive requests so background work can yield to them"""
+
+    def __init__(self, grace_seconds: float = 0.05):
+        self.grace_seconds = grace_seconds
+        self._active = 0
+        self._last_finished = 0.0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            self._active += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._last_finished = time.monotonic()
+
+    def is_idle(self) -> bool:
+        with self._lock:
+            return self._active == 0 and time.monotonic() - self._last_finished >= self.grace_seconds
+
+
+class JobQueue:
+    """SQLite persistence for jobs and their items"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                model TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                item_id TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result BLOB,
+                error TEXT,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS job_items_pending ON job_items (job_id, status);
+        """)
+        self._conn.commit()
+        self.recover()
+
+    def recover(self) -> int:
+        """Return items claimed by a crashed worker to pending; returns how many"""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE job_items SET status = 'pending' WHERE status = 'running'")
+            self._conn.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+            self._conn.commit()
+        return cursor.rowcount
+
+    def submit(self, kind: str, model: str, payloads: List, item_ids: Optional[List[str]], options: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        item_ids = item_ids or [None] * len(payloads)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, model, options, status, total, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)",
+                (job_id, kind, model, json.dumps(options), len(payloads), now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, item_id, payload, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(job_id, i, item_id, json.dumps(payload)) for i, (item_id, payload) in enumerate(zip(item_ids, payloads))]
+            )
+            if not payloads:
+                self._conn.execute("UPDATE jobs SET status = 'completed' WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, kind, model, status, total, completed, failed, error, created_at, updated_at "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "kind", "model", "status", "total", "completed", "failed", "error", "created_at", "updated_at")
+        job = dict(zip(keys, row))
+        job["progress"] = (job["completed"] + job["failed"]) / job["total"] if job["total"] else 1.0
+        return job
+
+    def unfinished(self) -> List[Dict]:
+        """Pending or running jobs with their options"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, options FROM jobs WHERE status IN ('pending', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [{**self.get(job_id), "options": json.loads(options)} for job_id, options in rows]
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )]
+        return [self.get(job_id) for job_id in ids]
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, item_id, status, result, error FROM job_items WHERE job_id = ? "
+                "ORDER BY idx LIMIT ? OFFSET ?", (job_id, limit, offset)
+            ).fetchall()
+        return [
+            {
+                "index": idx,
+                "item_id": item_id,
+                "status": status,
+                "embedding": np.frombuffer(result, dtype=np.float32).tolist() if result is not None else None,
+                "error": error,
+            }
+            for idx, item_id, status, result, error in rows
+        ]
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE job_id = ? "
+                "AND status NOT IN ('completed', 'failed', 'cancelled')", (time.time(), job_id)
+            )
+            self._conn.execute(
+                "UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def claim(self, window: int):
+        """Claim up to `window` pending items of the oldest unfinished job"""
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT job_id, kind, model, options FROM jobs j WHERE status IN ('pending', 'running') "
+                "AND EXISTS (SELECT 1 FROM job_items i WHERE i.job_id = j.job_id AND i.status = 'pending') "
+                "ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if job is None:
+                return None
+            job_id, kind, model, options = job
+            rows = self._conn.execute(
+                "SELECT idx, item_id, payload FROM job_items WHERE job_id = ? AND status = 'pending' "
+                "ORDER BY idx LIMIT ?", (job_id, window)
+            ).fetchall()
+
+            self._conn.executemany(
+                "UPDATE job_items SET status = 'running' WHERE job_id = ? AND idx = ?",
+                [(job_id, idx) for idx, _, _ in rows]
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE job_id = ?", (time.time(), job_id)
+            )
+            self._conn.commit()
+
+        items = [{"index": idx, "item_id": item_id, "payload": json.loads(payload)} for idx, item_id, payload in rows]
+        return {"job_id": job_id, "kind": kind, "model": model, "options": json.loads(options), "items": items}
+
+    def _finish(self, job_id: str) -> None:
+        outstanding = self._conn.execute(
+            "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('pending', 'running')", (job_id,)
+        ).fetchone()[0]
+        if outstanding == 0:
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN failed = total AND total > 0 THEN 'failed' ELSE 'completed' END, "
+                "updated_at = ? WHERE job_id = ? AND status IN ('pending', 'running')",
+                (time.time(), job_id)
+            )
+
+    def record(self, job_id: str, indexes: List[int], embeddings: Optional[List[List[float]]] = None,
+               error: Optional[str] = None) -> None:
+        """Store results (or a shared error) for claimed items"""
+        with self._lock:
+            if error is None:
+                self._conn.executemany(
+                    "UPDATE job_items SET status = 'done', result = ? WHERE job_id = ? AND idx = ?",
+                    [(np.asarray(emb, dtype=np.float32).tobytes(), job_id, idx) for idx, emb in zip(indexes, embeddings)]
+                )
+                column = "completed"
+            else:
+                self._conn.executemany(
+                    "UPDATE job_items SET status = 'failed', error = ? WHERE job_id = ? AND idx = ?",
+                    [(error, job_id, idx) for idx in indexes]
+                )
+                column = "failed"
+            self._conn.execute(
+                f"UPDATE jobs SET {column} = {column} + ?, updated_at = ?, error = COALESCE(?, error) WHERE job_id = ?",
+                (len(indexes), time.time(), error, job_id)
+            )
+            self._finish(job_id)
+            self._conn.commit()
+
+    def release(self, job_id: str, indexes: List[int]) -> None:
+        """Hand claimed but unprocessed items back to the queue"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE job_items SET status = 'pending' WHERE job_id = ? AND idx = ? AND status = 'running'",
+                [(job_id, idx) for idx in indexes]
+            )
+            self._conn.commit()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is None or row[0] == "cancelled"
+
+
+def _payload_length(payload) -> int:
+    if isinstance(payload, dict):
+        return sum(len(v or "") for v in payload.values())
+    return len(payload or "")
+
+
+class JobWorker:
+    """
+    Background thread draining the job queue.
+
+    Items are claimed in windows, sorted by text length and split into batches
+    so each forward pass pads as little as possible. Between batches the worker
+    waits for the interactive gate to be idle, and for the job's `throttle`
+    option (seconds) when set.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        process_batch: Callable[[Dict, List[Dict]], List[List[float]]],
+        gate: InteractiveGate,
+        on_results: Optional[Callable[[Dict, List[Dict], List[List[float]]], None]] = None,
+        batch_size: int = 32,
+        window: int = 256,
+    ):
+        self.queue = queue
+        self.process_batch = process_batch
+        self.gate = gate
+        self.on_results = on_results
+        self.batch_size = batch_size
+        self.window = window
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _wait_for_idle(self) -> bool:
+        while not self.gate.is_idle():
+            if self._stop.wait(0.01):
+                return False
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            claimed = self.queue.claim(self.window)
+            if claimed is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._process(claimed)
+
+    def _process(self, claimed: Dict) -> None:
+        items = sorted(claimed["items"], key=lambda item: _payload_length(item["payload"]))
+        throttle = claimed["options"].get("throttle") or 0
+        for start in range(0, len(items), self.batch_size):
+            remaining = items[start:]
+            stopped = throttle and self._stop.wait(throttle)
+            if stopped or not self._wait_for_idle() or self.queue.is_cancelled(claimed["job_id"]):
+                self.queue.release(claimed["job_id"], [item["index"] for item in remaining])
+                return
+
+            batch = items[start:start + self.batch_size]
+            indexes = [item["index"] for item in batch]
+            try:
+                embeddings = self.process_batch(claimed, batch)
+                if self.on_results is not None:
+                    self.on_results(claimed, batch, embeddings)
+            except Exception as e:
+                self.queue.record(claimed["job_id"], indexes, error=str(e))
+                continue
+            self.queue.record(claimed["job_id"], indexes, embeddings)
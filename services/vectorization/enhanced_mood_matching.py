@@ -14,11 +14,14 @@ import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel
 from sklearn.metrics.pairwise import cosine_similarity
 
+from model_registry import model_source
+from vad_features import EMOTIONAL_DIMENSIONS, VADAnchors
+
 # Load models
 print("Loading mood matching models...")
 model_name = "sentence-transformers/all-MiniLM-L6-v2"  # Better performing model
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModel.from_pretrained(model_name)
+tokenizer = AutoTokenizer.from_pretrained(model_source(model_name))
+model = AutoModel.from_pretrained(model_source(model_name))
 
 # Move model to GPU if available
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -46,21 +49,14 @@ def get_embedding(text: str) -> np.ndarray:
     
     return embedding.cpu().numpy()[0]
 
-# Define emotional dimensions for a more nuanced understanding
-EMOTIONAL_DIMENSIONS = {
-    "valence": {  # Positive vs. Negative
-        "positive": ["happy", "joyful", "uplifting", "optimistic", "cheerful", "hopeful", "content", "satisfied", "peaceful"],
-        "negative": ["sad", "melancholy", "depressing", "gloomy", "angry", "frustrated", "anxious", "fearful", "resentful"]
-    },
-    "arousal": {  # High energy vs. Low energy
-        "high": ["energetic", "exciting", "intense", "powerful", "dynamic", "lively", "passionate", "vigorous"],
-        "low": ["calm", "relaxing", "soothing", "gentle", "mellow", "tranquil", "serene", "peaceful"]
-    },
-    "dominance": {  # Empowering vs. Vulnerable
-        "empowering": ["confident", "strong", "empowering", "bold", "assertive", "determined", "resilient"],
-        "vulnerable": ["vulnerable", "sensitive", "intimate", "delicate", "fragile", "uncertain", "insecure"]
-    }
-}
+# Keyword anchors are embedded once, on first use
+_anchors: Optional[VADAnchors] = None
+
+def get_anchors() -> VADAnchors:
+    global _anchors
+    if _anchors is None:
+        _anchors = VADAnchors(lambda keywords: np.stack([get_embedding(keyword) for keyword in keywords]))
+    return _anchors
 
 def analyze_mood_dimensions(mood_text: str) -> Dict[str, Dict[str, float]]:
     """
@@ -73,19 +69,10 @@ def analyze_mood_dimensions(mood_text: str) -> Dict[str, Dict[str, float]]:
     # Get embedding for the mood text
     mood_embedding = get_embedding(mood_text)
     
-    # Analyze each dimension
-    for dimension, categories in EMOTIONAL_DIMENSIONS.items():
-        results[dimension] = {}
-        
-        for category, keywords in categories.items():
-            # Get embeddings for each keyword
-            keyword_embeddings = [get_embedding(keyword) for keyword in keywords]
-            
-            # Calculate similarity with each keyword
-            similarities = [cosine_similarity([mood_embedding], [emb])[0][0] for emb in keyword_embeddings]
-            
-            # Use max similarity as the score for this category
-            results[dimension][category] = float(max(similarities))
+    # Max similarity with each category's keywords, against the cached anchors
+    anchors = get_anchors()
+    for (dimension, category), score in zip(anchors.poles, anchors.pole_scores(mood_embedding)[0]):
+        results.setdefault(dimension, {})[category] = float(score)
     
     return results
 
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Fixture Models
+--------------
+Tiny random-weight stand-ins for every served checkpoint, built locally so
+api.py, dynamic_matcher.py and enhanced_mood_matching.py can be tested and
+benchmarked without downloading anything.
+
+Each ModelType gets a one-layer BERT with the real model's output dimension
+and a small WordPiece vocabulary; the sentiment model is a one-layer RoBERTa
+classifier with the same three labels. Weights come from a fixed seed, so the
+same seed always produces the same models and the same embeddings. The
+vectors carry no meaning: use them for batching, caching, scheduling and
+throughput, not for match quality.
+
+Fixture mode is switched on by pointing VECTORIZATION_FIXTURE_MODELS at a
+directory; models are built there on first load (a few seconds) and reused.
+
+Usage:
+    VECTORIZATION_FIXTURE_MODELS=/tmp/fixture-models python api.py
+    python fixture_models.py [--dir DIR]   # build ahead of time
+"""
+
+import argparse
+import json
+import os
+import string
+import tempfile
+from typing import Dict
+
+from model_registry import MODEL_DIMENSIONS, MODEL_NAMES, SENTIMENT_MODEL_NAME
+
+FIXTURE_VERSION = 1
+MARKER = "fixture.json"
+
+SENTIMENT_LABELS = {0: "negative", 1: "neutral", 2: "positive"}
+
+# Whole-word entries keep common song/playlist text from falling back to characters
+WORDS = (
+    "the a an and of to in is it you that was for on are with as i his they be at one have this from or "
+    "by but what all your when up how if will about then them would like so her make see him has more "
+    "day go no who know than first people down now my me we our love heart night time life baby feel "
+    "song music sound beat rhythm vocal vocals guitar piano synth drums bass track album artist genre "
+    "mood theme happy sad calm energetic dark bright chill dance party summer rain dream memory lost "
+    "home road city lights fire slow fast soft loud sweet pain hope fear joy anger peace playlist"
+).split()
+
+LAYERS = 1
+HEADS = 4
+INTERMEDIATE_SIZE = 64
+SENTIMENT_HIDDEN_SIZE = 64
+MAX_POSITIONS = 514
+
+
+def fixture_dir() -> str:
+    return os.environ.get("VECTORIZATION_FIXTURE_MODELS") or os.path.join(tempfile.gettempdir(), "vectorization-fixtures")
+
+
+def _wordpiece_vocab() -> list:
+    chars = string.ascii_lowercase + string.digits
+    tokens = (
+        ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+        + list(chars + string.punctuation)
+        + ["##" + c for c in chars]
+        + WORDS
+    )
+    # Single-letter words are already there as characters
+    return list(dict.fromkeys(tokens))
+
+
+def _build_encoder(path: str, dimensions: int, seed: int, vocab_file: str) -> None:
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(_wordpiece_vocab()), hidden_size=dimensions, num_hidden_layers=LAYERS,
+        num_attention_heads=HEADS, intermediate_size=INTERMEDIATE_SIZE, max_position_embeddings=MAX_POSITIONS
+    )
+    BertModel(config).eval().save_pretrained(path)
+    BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True, model_max_length=512).save_pretrained(path)
+
+
+def _build_sentiment(path: str, seed: int, work_dir: str) -> None:
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import RobertaConfig, RobertaForSequenceClassification, RobertaTokenizerFast
+
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(
+        [" ".join(WORDS)] * 4, vocab_size=400, show_progress=False,
+        special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+    )
+    bpe.save_model(work_dir)
+    tokenizer = RobertaTokenizerFast(
+        vocab_file=os.path.join(work_dir, "vocab.json"), merges_file=os.path.join(work_dir, "merges.txt"),
+        model_max_length=512
+    )
+
+    torch.manual_seed(seed)
+    config = RobertaConfig(
+        vocab_size=len(tokenizer), hidden_size=SENTIMENT_HIDDEN_SIZE, num_hidden_layers=LAYERS,
+        num_attention_heads=HEADS, intermediate_size=INTERMEDIATE_SIZE, max_position_embeddings=MAX_POSITIONS + 2,
+        num_labels=len(SENTIMENT_LABELS), id2label=SENTIMENT_LABELS,
+        label2id={label: i for i, label in SENTIMENT_LABELS.items()},
+        pad_token_id=tokenizer.pad_token_id, bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id
+    )
+    RobertaForSequenceClassification(config).eval().save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def build_fixture_models(root: str, seed: int = 0) -> Dict[str, str]:
+    """
+    Build every fixture model under `root` ({hub name: local path}), skipping
+    the work when the directory already holds this version and seed
+    """
+    paths = {name: os.path.join(root, name) for name in [*MODEL_NAMES.values(), SENTIMENT_MODEL_NAME]}
+    spec = {"version": FIXTURE_VERSION, "seed": seed}
+    marker = os.path.join(root, MARKER)
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                return paths
+
+    os.makedirs(root, exist_ok=True)
+    with tempfile.TemporaryDirectory() as work_dir:
+        vocab_file = os.path.join(work_dir, "vocab.txt")
+        with open(vocab_file, "w") as f:
+            f.write("\n".join(_wordpiece_vocab()))
+        # Each model type gets its own seed, so they do not embed identically
+        for offset, (model_type, name) in enumerate(MODEL_NAMES.items()):
+            _build_encoder(paths[name], MODEL_DIMENSIONS[model_type], seed + offset, vocab_file)
+        _build_sentiment(paths[SENTIMENT_MODEL_NAME], seed + len(MODEL_NAMES), work_dir)
+
+    with open(marker, "w") as f:
+        json.dump(spec, f)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build tiny offline stand-ins for the served models")
+    parser.add_argument("--dir", default=fixture_dir())
+    args = parser.parse_args()
+
+    for name, path in build_fixture_models(args.dir).items():
+        print(f"{name:55s} -> {path}")
+    print(f"\nexport VECTORIZATION_FIXTURE_MODELS={args.dir}")
+
+
+if __name__ == "__main__":
+    main()
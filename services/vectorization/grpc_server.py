@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+gRPC Transport
+--------------
+Optional gRPC front end for the vectorization API (protos/vectorization.proto).
+
+Vectors travel as packed float32 bytes, and the streaming RPCs keep one
+HTTP/2 stream open per client instead of one HTTP/1.1 request per song.
+Streamed embed requests that are already waiting are micro-batched into a
+single forward pass.
+
+The servicer calls the same model runtime as api.py (models, scheduler lanes,
+interactive gate), so gRPC and HTTP traffic share admission control.
+
+Needs grpcio and grpcio-tools (the .proto is compiled at startup):
+    pip install grpcio grpcio-tools
+
+Usage:
+    VECTORIZATION_GRPC_PORT=50051 python api.py    # alongside FastAPI
+    python grpc_server.py [--port 50051]           # gRPC only
+"""
+
+import os
+import queue
+import sys
+import threading
+from concurrent import futures
+from typing import Iterator, List
+
+import numpy as np
+
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
+PROTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protos")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+STREAM_BATCH_SIZE = 32
+
+_END = object()
+
+
+def load_protos():
+    """(messages, services) modules compiled from vectorization.proto"""
+    if grpc is None:
+        raise RuntimeError("The gRPC transport needs grpcio and grpcio-tools: pip install grpcio grpcio-tools")
+    if PROTO_DIR not in sys.path:
+        sys.path.append(PROTO_DIR)
+    return grpc.protos_and_services("vectorization.proto")
+
+
+def pack(vector) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def unpack(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4")
+
+
+def micro_batches(requests: Iterator, max_batch: int) -> Iterator[List]:
+    """Group streamed requests that are already waiting into batches of up to `max_batch`"""
+    pending: "queue.Queue" = queue.Queue()
+
+    def read():
+        try:
+            for request in requests:
+                pending.put(request)
+        except Exception:
+            # Client went away; the stream ends with what was read so far
+            pass
+        finally:
+            pending.put(_END)
+
+    threading.Thread(target=read, name="grpc-stream-reader", daemon=True).start()
+    while True:
+        first = pending.get()
+        if first is _END:
+            return
+        batch = [first]
+        while len(batch) < max_batch:
+            try:
+                request = pending.get_nowait()
+            except queue.Empty:
+                break
+            if request is _END:
+                yield batch
+                return
+            batch.append(request)
+        yield batch
+
+
+def create_server(runtime, port: int, max_workers: int = 16):
+    """
+    Build (but do not start) a gRPC server backed by `runtime`, the loaded api
+    module: its models, scheduler and embedding functions are reused as-is.
+    """
+    pb, services = load_protos()
+    ModelType = runtime.ModelType
+
+    def status_for(e: Exception):
+        if isinstance(e, runtime.Overloaded):
+            code = grpc.StatusCode.RESOURCE_EXHAUSTED if e.status_code == 429 else grpc.StatusCode.UNAVAILABLE
+            return code, e.detail
+        if isinstance(e, runtime.HTTPException):
+            code = grpc.StatusCode.NOT_FOUND if e.status_code == 404 else grpc.StatusCode.INVALID_ARGUMENT
+            return code, str(e.detail)
+        if isinstance(e, ValueError):
+            return grpc.StatusCode.INVALID_ARGUMENT, str(e)
+        return grpc.StatusCode.INTERNAL, str(e)
+
+    def abort(context, e: Exception):
+        code, detail = status_for(e)
+        if isinstance(e, runtime.Overloaded):
+            context.set_trailing_metadata((("retry-after", str(e.retry_after)),))
+        context.abort(code, detail)
+
+    def run(model: str, lane: str, fn, *args):
+        """Run on the shared scheduler; interactive work pauses background jobs like HTTP requests do"""
+        if lane != "interactive":
+            return runtime.scheduler.submit(model, lane, fn, *args).result()
+        runtime.interactive_gate.enter()
+        try:
+            return runtime.scheduler.submit(model, lane, fn, *args).result()
+        finally:
+            runtime.interactive_gate.exit()
+
+    def embed_texts(texts: List[str], model_type, dimensions) -> np.ndarray:
+        if len(texts) <= runtime.INTERACTIVE_BATCH_LIMIT:
+            embeddings = run(model_type.value, "interactive", runtime.get_embeddings_batch,
+                             texts, model_type, dimensions)
+        else:
+            size = runtime.BULK_SLICE_SIZE
+            slices = [texts[i:i + size] for i in range(0, len(texts), size)]
+            pending = runtime.scheduler.models[model_type.value].submit_many(
+                "bulk", [(runtime.get_embeddings_batch, s, model_type, dimensions) for s in slices]
+            )
+            embeddings = [e for future in pending for e in future.result()]
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def hybrid_response(request_id: str, result) -> "pb.HybridEmbedResponse":
+        return pb.HybridEmbedResponse(
+            request_id=request_id,
+            embedding=pack(result["embedding"]),
+            dimensions=result["dimensions"],
+            components=result["components"],
+            weights=result["weights"],
+            fingerprint=result["fingerprint"],
+        )
+
+    def similarity_response(request) -> "pb.SimilarityResponse":
+        return pb.SimilarityResponse(
+            request_id=request.request_id,
+            **runtime.similarity_metrics(unpack(request.vec1).astype(np.float64), unpack(request.vec2).astype(np.float64))
+        )
+
+    def sentiment_response(request) -> "pb.SentimentResponse":
+        text = request.text[:512] if request.text else ""
+        if not text.strip():
+            return pb.SentimentResponse(request_id=request.request_id, negative=0.33, neutral=0.34, positive=0.33)
+        result = run("sentiment", "interactive", runtime.get_sentiment, text)
+        return pb.SentimentResponse(request_id=request.request_id, **result.model_dump())
+
+    class VectorizationServicer(services.VectorizationServicer):
+
+        def Embed(self, request, context):
+            try:
+                model_type = ModelType(request.model_type or ModelType.GENERAL.value)
+                embedding = run(model_type.value, "interactive", runtime.get_embedding,
+                                request.text, model_type, request.dimensions or None)
+                return pb.EmbedResponse(request_id=request.request_id, embedding=pack(embedding),
+                                        dimensions=len(embedding), model=model_type.value,
+                                        fingerprint=runtime.fingerprints[model_type]["fingerprint"])
+            except Exception as e:
+                abort(context, e)
+
+        def EmbedBatch(self, request, context):
+            try:
+                model_type = ModelType(request.model_type or ModelType.GENERAL.value)
+                embeddings = embed_texts(list(request.texts), model_type, request.dimensions or None)
+                return pb.EmbedBatchResponse(
+                    embeddings=pack(embeddings), count=len(embeddings),
+                    dimensions=embeddings.shape[1] if len(embeddings) else 0, model=model_type.value,
+                    fingerprint=runtime.fingerprints[model_type]["fingerprint"]
+                )
+            except Exception as e:
+                abort(context, e)
+
+        def EmbedHybrid(self, request, context):
+            try:
+                result = run(ModelType.CREATIVE.value, "interactive", runtime.get_hybrid_embedding,
+                             dict(request.texts), dict(request.weights) or None, request.dimensions or None,
+                             request.item_id or None)
+                return hybrid_response(request.request_id, result)
+            except Exception as e:
+                abort(context, e)
+
+        def Sentiment(self, request, context):
+            try:
+                return sentiment_response(request)
+            except Exception as e:
+                abort(context, e)
+
+        def Similarity(self, request, context):
+            try:
+                return similarity_response(request)
+            except Exception as e:
+                abort(context, e)
+
+        def EmbedStream(self, request_iterator, context):
+            for batch in micro_batches(request_iterator, STREAM_BATCH_SIZE):
+                # Requests waiting together share one forward pass per (model, dimensions)
+                groups = {}
+                for request in batch:
+                    groups.setdefault((request.model_type or ModelType.GENERAL.value, request.dimensions), []).append(request)
+                for (model, dimensions), requests in groups.items():
+                    try:
+                        model_type = ModelType(model)
+                        embeddings = embed_texts([r.text for r in requests], model_type, dimensions or None)
+                    except Exception as e:
+                        for request in requests:
+                            yield pb.EmbedResponse(request_id=request.request_id, error=status_for(e)[1])
+                        continue
+                    for request, embedding in zip(requests, embeddings):
+                        yield pb.EmbedResponse(request_id=request.request_id, embedding=pack(embedding),
+                                               dimensions=len(embedding), model=model_type.value,
+                                               fingerprint=runtime.fingerprints[model_type]["fingerprint"])
+
+        def EmbedHybridStream(self, request_iterator, context):
+            for batch in micro_batches(request_iterator, STREAM_BATCH_SIZE):
+                groups = {}
+                for request in batch:
+                    key = (tuple(sorted(request.weights.items())), request.dimensions, bool(request.item_id))
+                    groups.setdefault(key, []).append(request)
+                for (weights, dimensions, stored), requests in groups.items():
+                    try:
+                        results = run(
+                            ModelType.CREATIVE.value, "interactive", runtime.get_hybrid_embeddings_batch,
+                            [dict(r.texts) for r in requests], dict(weights) or None, dimensions or None,
+                            [r.item_id for r in requests] if stored else None
+                        )
+                    except Exception as e:
+                        for request in requests:
+                            yield pb.HybridEmbedResponse(request_id=request.request_id, error=status_for(e)[1])
+                        continue
+                    for request, result in zip(requests, results):
+                        yield hybrid_response(request.request_id, result)
+
+        def SentimentStream(self, request_iterator, context):
+            for request in request_iterator:
+                try:
+                    yield sentiment_response(request)
+                except Exception as e:
+                    yield pb.SentimentResponse(request_id=request.request_id, error=status_for(e)[1])
+
+        def SimilarityStream(self, request_iterator, context):
+            for request in request_iterator:
+                try:
+                    yield similarity_response(request)
+                except Exception as e:
+                    yield pb.SimilarityResponse(request_id=request.request_id, error=status_for(e)[1])
+
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="grpc"),
+        options=[
+            ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+            ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+        ],
+    )
+    services.add_VectorizationServicer_to_server(VectorizationServicer(), server)
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the vectorization API over gRPC only")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VECTORIZATION_GRPC_PORT", 50051)))
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent RPC handler threads")
+    args = parser.parse_args()
+
+    import api
+
+    api.scheduler.start()
+    api.job_worker.start()
+    server = create_server(api, args.port, args.workers)
+    server.start()
+    print(f"🚀 gRPC vectorization server listening on port {args.port}", flush=True)
+    try:
+        server.wait_for_termination()
+    finally:
+        api.job_worker.stop()
+        api.scheduler.stop()
@@ -0,0 +1,72 @@
+"""
+Hybrid Embedding Combination
+----------------------------
+Combines per-category component embeddings (metadata, analysis, context, ...)
+into one normalized vector with category weights.
+
+Components are kept as an (items, categories, dim) tensor plus a presence
+mask, so a new weight set can be applied to a whole library in one einsum,
+without running a model again.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def resolve_weights(keys: Sequence[str], weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Weights for the categories present in an item, normalized to sum to 1.
+    Falls back to equal weights when no weight matches a present category or the
+    matching weights sum to zero; present categories without a weight get 0.
+    """
+    if not keys:
+        return {}
+    filtered = {k: v for k, v in (weights or {}).items() if k in keys}
+    total = sum(filtered.values())
+    if not filtered or total <= 0:
+        return {k: 1.0 / len(keys) for k in keys}
+    return {k: filtered.get(k, 0.0) / total for k in keys}
+
+
+def stack_components(items: Sequence[Dict[str, np.ndarray]],
+                     names: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    (names, components, present) for a list of {category: vector} dicts:
+    components is (n, c, dim) with zeros for missing categories, present is (n, c) bool
+    """
+    names = names or sorted({name for item in items for name in item})
+    dim = next((len(v) for item in items for v in item.values()), 0)
+    components = np.zeros((len(items), len(names), dim), dtype=np.float32)
+    present = np.zeros((len(items), len(names)), dtype=bool)
+    for i, item in enumerate(items):
+        for j, name in enumerate(names):
+            if name in item:
+                components[i, j] = item[name]
+                present[i, j] = True
+    return names, components, present
+
+
+def weight_matrix(names: Sequence[str], present: np.ndarray,
+                  weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Per-item normalized weights (n, c), vectorized equivalent of `resolve_weights`"""
+    weights = weights or {}
+    raw = np.array([weights.get(name, 0.0) for name in names], dtype=np.float64)
+    has_weight = np.array([name in weights for name in names])
+
+    masked = raw[None, :] * present
+    totals = masked.sum(axis=1)
+    use_equal = ~(present & has_weight).any(axis=1) | (totals <= 0)
+
+    counts = present.sum(axis=1)
+    equal = np.divide(present, counts[:, None], out=np.zeros(present.shape), where=counts[:, None] > 0)
+    weighted = np.divide(masked, totals[:, None], out=np.zeros(present.shape), where=totals[:, None] > 0)
+    return np.where(use_equal[:, None], equal, weighted)
+
+
+def combine_components(names: Sequence[str], components: np.ndarray, present: np.ndarray,
+                       weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Weighted, L2-normalized (n, dim) combination; items without components stay zero"""
+    combined = np.einsum("nc,ncd->nd", weight_matrix(names, present, weights), components)
+    norms = np.linalg.norm(combined, axis=1, keepdims=True)
+    return np.divide(combined, norms, out=np.zeros_like(combined), where=norms > 0).astype(np.float32)
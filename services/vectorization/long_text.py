@@ -0,0 +1,133 @@
+"""
+Long-Text Windows
+-----------------
+Embeds texts longer than a model's window as overlapping token windows
+instead of truncating them at max_length.
+
+Each text is tokenized without truncation and cut into windows of `window`
+tokens that overlap by `overlap`; every window gets the model's special
+tokens back. Windows from all texts of a request share the same
+length-sorted batches, and each text's window embeddings are pooled back
+into one vector:
+- "weighted": window means weighted by their token count, i.e. mean pooling
+  over every token state of the text (tokens in overlaps count twice)
+- "mean": plain average of the normalized window embeddings
+
+A text that fits in one window gets exactly its usual embedding with
+"weighted" pooling. Self-attention cost grows with the square of sequence
+length, so short windows are also cheaper per token than one 512-token
+sequence; `encoder_flops` estimates both.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+POOLING_MODES = ("weighted", "mean")
+
+
+def split_windows(token_ids: Sequence[int], window: int, overlap: int) -> List[Sequence[int]]:
+    """Overlapping windows of at most `window` content tokens covering every token"""
+    if window < 1 or not 0 <= overlap < window:
+        raise ValueError("window must be >= 1 and overlap in [0, window)")
+    step = window - overlap
+    return [token_ids[start:start + window] for start in range(0, max(len(token_ids) - overlap, 1), step)]
+
+
+def tokenize_windows(tokenizer, texts: Sequence[str], window: int,
+                     overlap: int) -> Tuple[List[Tuple[int, ...]], List[int]]:
+    """
+    (window token ids with special tokens, index of the text each window
+    belongs to) for non-empty texts, in text order
+    """
+    content = tokenizer(list(texts), add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+    windows, owners = [], []
+    for owner, ids in enumerate(content):
+        for chunk in split_windows(ids, window, overlap):
+            windows.append(tuple(tokenizer.build_inputs_with_special_tokens(list(chunk))))
+            owners.append(owner)
+    return windows, owners
+
+
+def pool_windows(window_means: np.ndarray, token_counts: np.ndarray, owners: Sequence[int], count: int,
+                 pooling: str = "weighted") -> np.ndarray:
+    """(count, dim) normalized text embeddings from (windows, dim) mean-pooled window states"""
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Unknown pooling '{pooling}', expected one of {', '.join(POOLING_MODES)}")
+    window_means = np.asarray(window_means, dtype=np.float32)
+    if pooling == "weighted":
+        weights = np.asarray(token_counts, dtype=np.float32)[:, None]
+    else:
+        norms = np.linalg.norm(window_means, axis=1, keepdims=True)
+        window_means = window_means / np.maximum(norms, 1e-12)
+        weights = np.ones((len(window_means), 1), dtype=np.float32)
+
+    pooled = np.zeros((count, window_means.shape[1]), dtype=np.float32)
+    totals = np.zeros((count, 1), dtype=np.float32)
+    np.add.at(pooled, np.asarray(owners), window_means * weights)
+    np.add.at(totals, np.asarray(owners), weights)
+    pooled /= np.maximum(totals, 1e-12)
+    return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def encoder_flops(lengths: Sequence[int], hidden: int, layers: int, intermediate: int) -> int:
+    """
+    Approximate forward FLOPs of a transformer encoder over sequences of the
+    given lengths: per layer, the QKV/output projections (8·L·h²), the
+    feed-forward block (4·L·h·i) and attention scores plus weighted sum (4·L²·h)
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    per_layer = 8 * lengths * hidden ** 2 + 4 * lengths * hidden * intermediate + 4 * lengths ** 2 * hidden
+    return int(layers * per_layer.sum())
+
+
+def compare_to_truncated(windowed: np.ndarray, truncated: np.ndarray, text_lengths: Sequence[int],
+                         window_lengths: Sequence[int], truncated_lengths: Sequence[int], special_tokens: int,
+                         config, seconds: Dict[str, float]) -> Dict:
+    """
+    Report on windowed vs truncated embeddings of the same texts: how close
+    the vectors are (cosine), how much of the texts each mode reads, and the
+    estimated FLOPs and measured seconds of each (plus the FLOPs of reading
+    each text as one full-length sequence). Lengths are in tokens,
+    `text_lengths` without special tokens.
+    """
+    windowed = np.asarray(windowed, dtype=np.float32)
+    truncated = np.asarray(truncated, dtype=np.float32)
+    cosine = (windowed * truncated).sum(axis=1)
+    text_lengths = np.asarray(text_lengths)
+    read_truncated = np.asarray(truncated_lengths) - special_tokens
+    cut = text_lengths > read_truncated
+
+    shape = (config.hidden_size, config.num_hidden_layers, config.intermediate_size)
+    flops = {
+        "truncated": encoder_flops(truncated_lengths, *shape),
+        "windowed": encoder_flops(window_lengths, *shape),
+        # Each whole text as one sequence, as a model with a long enough context would run it
+        "full_length": encoder_flops(text_lengths + special_tokens, *shape),
+    }
+    tokens = {"total": int(text_lengths.sum()), "truncated": int(read_truncated.sum()),
+              "windowed": int(text_lengths.sum())}
+
+    return {
+        "texts": len(cosine),
+        "windows": len(window_lengths),
+        "quality": {
+            "mean_cosine_to_truncated": float(cosine.mean()) if len(cosine) else None,
+            "min_cosine_to_truncated": float(cosine.min()) if len(cosine) else None,
+            # Only texts that were actually truncated can differ much
+            "mean_cosine_truncated_texts": float(cosine[cut].mean()) if cut.any() else None,
+        },
+        "coverage": {
+            "truncated_texts": int(cut.sum()),
+            "tokens": tokens["total"],
+            "tokens_read_truncated": tokens["truncated"],
+            "tokens_read_windowed": tokens["windowed"],
+        },
+        "flops": {
+            **flops,
+            "truncated_per_token_read": flops["truncated"] / max(tokens["truncated"], 1),
+            "windowed_per_token_read": flops["windowed"] / max(tokens["windowed"], 1),
+            "windowed_vs_full_length": flops["windowed"] / max(flops["full_length"], 1),
+        },
+        "seconds": dict(seconds),
+    }
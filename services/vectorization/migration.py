@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Embedding Migration
+-------------------
+Finds stored vectors whose model fingerprint (model_registry.model_fingerprint)
+differs from the one currently served and re-embeds only those, from the
+source text stored next to them.
+
+Re-embedding runs as ordinary background jobs (embedding_jobs): it survives
+restarts, pauses while interactive requests are in flight and sleeps
+`throttle` seconds between batches. Every item keeps serving its old vector
+until the new one is written, and an item a client re-embedded (or deleted)
+in the meantime is left alone.
+
+Vectors stored without source text (pre-computed embeddings, re-weighted
+hybrids) cannot be re-embedded here; they are counted as `unmigratable` so
+their owner can resubmit them.
+
+Usage:
+    python migration.py [--data_dir DIR]   # stored vectors per model and fingerprint
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from model_registry import ModelType
+
+# Hybrid embeddings always come from the creative model
+HYBRID_MODEL = ModelType.CREATIVE.value
+
+
+def hybrid_source(texts: Dict[str, str], weights: Optional[Dict[str, float]]) -> str:
+    """Source text stored for a hybrid vector, enough to re-embed it"""
+    return json.dumps({"kind": "hybrid", "texts": texts, "weights": weights})
+
+
+def parse_source(text: str, hybrid: bool = True,
+                 legacy_hybrid: bool = False) -> Tuple[str, object, Optional[Dict[str, float]]]:
+    """
+    (job kind, payload, weights) to re-embed a stored source text. Hybrid
+    sources carry a kind marker; unmarked JSON is only read as a hybrid source
+    when `legacy_hybrid` says the item has stored components, since a plain
+    text can look like JSON too.
+    """
+    if hybrid and text.startswith("{"):
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = None
+        if isinstance(value, dict):
+            if value.get("kind") == "hybrid" and isinstance(value.get("texts"), dict):
+                return "hybrid", value["texts"], value.get("weights")
+            if legacy_hybrid:
+                # Stored before the kind marker: {"texts": ..., "weights": ...}
+                if isinstance(value.get("texts"), dict):
+                    return "hybrid", value["texts"], value.get("weights")
+                # Stored before weights were recorded: {category: text}
+                if value and all(isinstance(v, str) for v in value.values()):
+                    return "hybrid", value, None
+    return "texts", text, None
+
+
+def plan_migration(store, model: str, fingerprint: str, limit: Optional[int] = None) -> List[Dict]:
+    """Re-embedding groups (kind, weights, item_ids, payloads) for the stale vectors of a model"""
+    groups: Dict[Tuple[str, str], Dict] = {}
+    stale = store.stale_items(model, fingerprint, limit)
+    hybrid = model == HYBRID_MODEL
+    with_components = store.items_with_components(model, [item_id for item_id, _ in stale]) if hybrid else set()
+    for item_id, text in stale:
+        kind, payload, weights = parse_source(text, hybrid, legacy_hybrid=item_id in with_components)
+        key = (kind, json.dumps(weights, sort_keys=True))
+        group = groups.setdefault(key, {"kind": kind, "weights": weights, "item_ids": [], "payloads": []})
+        group["item_ids"].append(item_id)
+        group["payloads"].append(payload)
+    return list(groups.values())
+
+
+def active_migrations(job_queue, model: str) -> List[Dict]:
+    return [job for job in job_queue.unfinished() if job["model"] == model and job["options"].get("migration")]
+
+
+def start_migration(store, job_queue, model: str, fingerprint: str, throttle: float = 0.5,
+                    limit: Optional[int] = None) -> Dict:
+    """
+    Submit re-embedding jobs for the stale vectors of a model.
+    Does nothing while an earlier migration of the model is still running.
+    """
+    active = active_migrations(job_queue, model)
+    if active:
+        return {"model": model, "submitted": [], "items": 0, "active": [job["job_id"] for job in active]}
+
+    submitted, items = [], 0
+    for group in plan_migration(store, model, fingerprint, limit):
+        job_id = job_queue.submit(
+            group["kind"], model, group["payloads"], group["item_ids"],
+            {"weights": group["weights"], "dimensions": None, "store": True,
+             "migration": fingerprint, "throttle": throttle}
+        )
+        submitted.append(job_id)
+        items += len(group["item_ids"])
+    return {"model": model, "submitted": submitted, "items": items, "active": []}
+
+
+def migration_status(store, job_queue, model: str, fingerprint: str) -> Dict:
+    """Current vs stale vector counts for a model, and its running migration jobs"""
+    counts = store.fingerprint_counts(model)
+    stale = [c for c in counts if c["fingerprint"] != fingerprint]
+    return {
+        "fingerprint": fingerprint,
+        "current": sum(c["count"] for c in counts if c["fingerprint"] == fingerprint),
+        "stale": sum(c["count"] for c in stale),
+        "migratable": sum(c["with_text"] for c in stale),
+        "unmigratable": sum(c["count"] - c["with_text"] for c in stale),
+        "fingerprints": counts,
+        "jobs": active_migrations(job_queue, model) if job_queue is not None else [],
+    }
+
+
+def main():
+    from vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Show stored vectors per model fingerprint")
+    parser.add_argument("--data_dir", default=os.environ.get(
+        "VECTORIZATION_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    ))
+    args = parser.parse_args()
+
+    store = VectorStore(os.path.join(args.data_dir, "vectors.db"))
+    specs = store.fingerprint_specs()
+    for model_type in ModelType:
+        counts = store.fingerprint_counts(model_type.value)
+        if not counts:
+            continue
+        print(f"\n{model_type.value}:")
+        for c in counts:
+            spec = specs.get(c["fingerprint"])
+            described = f"{spec['model']}@{spec['revision']} ({spec['dimensions']}d, pipeline {spec['pipeline']})" \
+                if spec else "unknown"
+            print(f"  {c['fingerprint'] or '-':16s}  {c['count']:7d} vectors  {c['with_text']:7d} with text  {described}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,20 @@
 Model Evaluation Script for Music Matching
 ------------------------------------------
 This script tests different embedding models for music matching tasks.
-It compares their performance on song-playlist matching tasks.
+It compares their ranking quality on song-playlist matching tasks against
+the ground truth, next to their cost: load time, throughput, p95 per-text
+latency, peak RSS and embedding dimension.
+
+Each model is evaluated in its own subprocess so peak RSS is measured per model.
+Query embeddings are cached on disk per model and text hash, so reruns only
+embed new or changed queries, and every playlist/song pair is scored with one
+similarity matrix.
 
 Usage:
-    bun run model_evaluation.py --model_name <model_name> --test_data <test_data_path>
+    python model_evaluation.py [--models <model> ...] --test_data <test_data_path>
 
-Models to try:
-- sentence-transformers/all-MiniLM-L6-v2 (current default, best performing)
-- sentence-transformers/all-mpnet-base-v2
+Models default to every ModelType served by api.py; pass ModelType keys
+(general, creative, ...) or any Hugging Face model name. Other models to try:
 - intfloat/multilingual-e5-large-instruct (previous model)
 - mixedbread-ai/mxbai-embed-large-v1
 - thenlper/gte-large
@@ -18,44 +24,49 @@ Models to try:
 
 import argparse
 import json
+import multiprocessing
 import os
+import resource
+import sys
 import time
 import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import torch
 import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from embedding_cache import EmbeddingCache
+from model_registry import MODEL_NAMES, ModelType, embedding_cache_namespace, model_source
+
 # Suppress warnings
 import warnings
 warnings.filterwarnings("ignore")
 
-# Set up argument parser
-parser = argparse.ArgumentParser(description="Evaluate embedding models for music matching")
-parser.add_argument("--model_name", type=str, default="sentence-transformers/all-MiniLM-L6-v2",
-                    help="Model to evaluate")
-parser.add_argument("--test_data", type=str, 
-                    default="./test_data.json",
-                    help="Path to test data JSON")
-parser.add_argument("--output_dir", type=str, default="./model_evaluation_results",
-                    help="Directory to save results")
-args = parser.parse_args()
-
-# Ensure output directory exists
-os.makedirs(args.output_dir, exist_ok=True)
-
-# Load model
-print(f"Loading model: {args.model_name}")
-tokenizer = AutoTokenizer.from_pretrained(args.model_name)
-model = AutoModel.from_pretrained(args.model_name)
-
 # Move model to GPU if available
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-print(f"Using device: {device}")
+
+# Ground-truth score at or above which a song counts as relevant for precision@k
+RELEVANCE_THRESHOLD = 0.5
+
+
+def resolve_model_name(name: str) -> str:
+    """Map ModelType keys (e.g. "creative") to their checkpoint name"""
+    try:
+        return MODEL_NAMES[ModelType(name)]
+    except ValueError:
+        return name
+
+
+def load_model(model_name: str) -> Tuple[Any, Any, float]:
+    """Load tokenizer and model, returning the load time in seconds"""
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_source(model_name))
+    model = AutoModel.from_pretrained(model_source(model_name)).to(device)
+    model.eval()
+    return tokenizer, model, time.perf_counter() - start
+
 
 def mean_pooling(model_output, attention_mask):
     """Mean pooling to get sentence embeddings"""
@@ -63,20 +74,26 @@ def mean_pooling(model_output, attention_mask):
     input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
     return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
 
-def get_embedding(text: str) -> np.ndarray:
-    """Get embedding for a text using the loaded model"""
-    # Tokenize and get embedding
-    encoded_input = tokenizer(text, padding=True, truncation=True, max_length=512, return_tensors='pt').to(device)
-    with torch.no_grad():
-        model_output = model(**encoded_input)
-    
-    # Perform pooling
-    embedding = mean_pooling(model_output, encoded_input['attention_mask'])
-    
-    # Normalize embeddings
-    embedding = F.normalize(embedding, p=2, dim=1)
-    
-    return embedding.cpu().numpy()[0]
+def embed_texts(texts: List[str], tokenizer, model, batch_size: int = 32) -> np.ndarray:
+    """Embed texts in batches, returning normalized (n, dim) embeddings"""
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        encoded_input = tokenizer(batch, padding=True, truncation=True, max_length=512, return_tensors='pt').to(device)
+        with torch.no_grad():
+            model_output = model(**encoded_input)
+
+        # Perform pooling and normalize embeddings
+        embedding = mean_pooling(model_output, encoded_input['attention_mask'])
+        embeddings.append(F.normalize(embedding, p=2, dim=1).cpu().numpy())
+
+    return np.concatenate(embeddings) if embeddings else np.zeros((0, model.config.hidden_size))
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
 
 def create_song_vector_query(song_analysis: Dict[str, Any]) -> str:
     """Create a comprehensive query for song embedding"""
@@ -114,49 +131,195 @@ def create_playlist_vector_query(playlist_data: Dict[str, Any]) -> str:
     
     return query
 
-def calculate_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculate cosine similarity between two vectors"""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """Row-wise ranks of a (rows, n) matrix, ties sharing their average rank"""
+    rows, n = values.shape
+    order = values.argsort(axis=1, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=1)
 
-def evaluate_model(test_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Evaluate model on test data"""
-    results = {
-        "model_name": args.model_name,
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "matches": []
+    # Give every run of equal values in a row its own group id
+    new_group = np.ones_like(sorted_values, dtype=bool)
+    new_group[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    groups = np.cumsum(new_group, axis=1) - 1 + (np.arange(rows) * n)[:, None]
+
+    ordinal = np.broadcast_to(np.arange(n, dtype=np.float64), (rows, n))
+    averages = np.bincount(groups.ravel(), weights=ordinal.ravel()) / np.bincount(groups.ravel())
+
+    ranks = np.empty((rows, n))
+    np.put_along_axis(ranks, order, averages[groups], axis=1)
+    return ranks
+
+def ranking_metrics(similarities: np.ndarray, ground_truth: np.ndarray, k: int = 5) -> Dict[str, np.ndarray]:
+    """
+    Spearman correlation, NDCG@k and precision@k per playlist, computed in one
+    vectorized pass over the (playlists, songs) similarity and ground-truth matrices
+    """
+    k = min(k, similarities.shape[1])
+    top = np.argsort(-similarities, axis=1)[:, :k]
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+
+    dcg = (np.take_along_axis(ground_truth, top, axis=1) * discounts).sum(axis=1)
+    ideal_dcg = (-np.sort(-ground_truth, axis=1)[:, :k] * discounts).sum(axis=1)
+    ndcg = np.divide(dcg, ideal_dcg, out=np.zeros_like(dcg), where=ideal_dcg > 0)
+
+    relevant = ground_truth >= RELEVANCE_THRESHOLD
+    precision = np.take_along_axis(relevant, top, axis=1).mean(axis=1) if k else np.zeros(len(top))
+
+    # Spearman = Pearson correlation of the rank vectors
+    sim_ranks = _average_ranks(similarities)
+    truth_ranks = _average_ranks(ground_truth)
+    sim_ranks -= sim_ranks.mean(axis=1, keepdims=True)
+    truth_ranks -= truth_ranks.mean(axis=1, keepdims=True)
+    denominator = np.linalg.norm(sim_ranks, axis=1) * np.linalg.norm(truth_ranks, axis=1)
+    spearman = np.divide((sim_ranks * truth_ranks).sum(axis=1), denominator,
+                         out=np.zeros(len(denominator)), where=denominator > 0)
+
+    return {"spearman": spearman, f"ndcg@{k}": ndcg, f"precision@{k}": precision, "k": k}
+
+def load_test_playlists(test_data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Playlists and their (playlists, songs) ground-truth matrix.
+
+    Single-playlist test data keeps `ground_truth: {"score": ...}` per song;
+    multi-playlist test data lists `playlists` and maps each playlist id to
+    its score: `ground_truth: {"<playlist_id>": {"score": ...}}`.
+    """
+    if "playlists" not in test_data:
+        playlist = test_data["playlist"]
+        scores = [[song.get("ground_truth", {}).get("score", 0.0) for song in test_data["songs"]]]
+        return [playlist], np.array(scores, dtype=np.float64)
+
+    playlists = test_data["playlists"]
+    scores = [
+        [song.get("ground_truth", {}).get(str(playlist.get("id")), {}).get("score", 0.0) for song in test_data["songs"]]
+        for playlist in playlists
+    ]
+    return playlists, np.array(scores, dtype=np.float64)
+
+def measure_performance(texts: List[str], tokenizer, model, batch_size: int, throughput_samples: int,
+                        latency_samples: int) -> Dict[str, float]:
+    """Throughput over a batched sample and p95 latency over unbatched texts"""
+    # Warm up so lazy initialization is not counted as throughput
+    embed_texts(texts[:1], tokenizer, model)
+
+    sample = texts[:throughput_samples]
+    start = time.perf_counter()
+    embeddings = embed_texts(sample, tokenizer, model, batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    for text in texts[:latency_samples]:
+        start = time.perf_counter()
+        embed_texts([text], tokenizer, model)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "embedding_dim": int(embeddings.shape[1]),
+        "throughput_texts_per_second": len(sample) / batch_seconds if batch_seconds > 0 else 0.0,
+        "p95_latency_ms": float(np.percentile(latencies, 95) * 1000) if latencies else 0.0,
     }
-    
-    # Get playlist data
-    playlist = test_data["playlist"]
-    playlist_query = create_playlist_vector_query(playlist)
-    playlist_embedding = get_embedding(playlist_query)
-    
-    # Process each song
-    for song in test_data["songs"]:
-        song_query = create_song_vector_query(song["analysis"])
-        song_embedding = get_embedding(song_query)
-        
-        # Calculate similarity
-        similarity = calculate_similarity(playlist_embedding, song_embedding)
-        
-        # Store result
-        results["matches"].append({
-            "track": song["track"],
-            "similarity": similarity,
-            "ground_truth": song.get("ground_truth", {})
+
+def evaluate_model(model_name: str, test_data: Dict[str, Any], batch_size: int = 32,
+                   latency_samples: int = 50, k: int = 5, cache_path: Optional[str] = None,
+                   throughput_samples: int = 256, measure_perf: bool = True) -> Dict[str, Any]:
+    """
+    Evaluate one model's ranking quality and cost on test data.
+    With a cache, only playlist/song queries not embedded by a previous run
+    reach the model; the model is not even loaded when everything is cached
+    and performance measurement is off.
+    """
+    playlists, ground_truth = load_test_playlists(test_data)
+    playlist_queries = [create_playlist_vector_query(playlist) for playlist in playlists]
+    song_queries = [create_song_vector_query(song["analysis"]) for song in test_data["songs"]]
+    texts = playlist_queries + song_queries
+
+    loaded = {}
+
+    def get_model():
+        if not loaded:
+            tokenizer, model, load_seconds = load_model(model_name)
+            loaded.update(tokenizer=tokenizer, model=model, load_seconds=load_seconds)
+        return loaded["tokenizer"], loaded["model"]
+
+    def embed_fn(batch: List[str]) -> np.ndarray:
+        return embed_texts(batch, *get_model(), batch_size)
+
+    cache = EmbeddingCache(cache_path) if cache_path else None
+    embeddings = cache.embed(embedding_cache_namespace(model_name), texts, embed_fn) if cache else embed_fn(texts)
+
+    playlist_embeddings = embeddings[:len(playlists)]
+    song_embeddings = embeddings[len(playlists):]
+    similarities = playlist_embeddings @ song_embeddings.T
+    metrics = ranking_metrics(similarities, ground_truth, k)
+
+    per_playlist = []
+    for p, playlist in enumerate(playlists):
+        matches = [
+            {"track": song["track"], "similarity": float(similarities[p, i]), "ground_truth": float(ground_truth[p, i])}
+            for i, song in enumerate(test_data["songs"])
+        ]
+        # Sort by similarity
+        matches.sort(key=lambda x: x["similarity"], reverse=True)
+        per_playlist.append({
+            "playlist_id": playlist.get("id"),
+            "matches": matches,
+            "quality": {name: float(values[p]) for name, values in metrics.items() if name != "k"},
         })
-    
-    # Sort by similarity
-    results["matches"].sort(key=lambda x: x["similarity"], reverse=True)
-    
-    return results
 
-def visualize_results(results: Dict[str, Any]) -> None:
-    """Visualize model evaluation results"""
+    performance = {"device": str(device), "embedding_dim": int(embeddings.shape[1]), "batch_size": batch_size}
+    if measure_perf:
+        tokenizer, model = get_model()
+        performance.update(measure_performance(texts, tokenizer, model, batch_size,
+                                               throughput_samples, latency_samples))
+    performance["load_seconds"] = loaded.get("load_seconds")
+    performance["peak_rss_mb"] = peak_rss_mb()
+
+    quality = {name: float(np.mean(values)) for name, values in metrics.items() if name != "k"}
+    quality["k"] = metrics["k"]
+
+    return {
+        "model_name": model_name,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "playlists": per_playlist,
+        "quality": quality,
+        "performance": performance,
+        "cache": {"hits": cache.hits, "misses": cache.misses} if cache else None,
+    }
+
+def evaluate_model_isolated(model_name: str, test_data: Dict[str, Any], *args) -> Dict[str, Any]:
+    """Run evaluate_model in a fresh subprocess so peak RSS covers only this model"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(evaluate_model, (model_name, test_data, *args))
+
+def comparison_table(summaries: List[Dict[str, Any]]) -> str:
+    """Markdown quality-vs-cost table, one row per model"""
+    k = summaries[0]["quality"]["k"] if summaries else 0
+    lines = [
+        f"| Model | Dim | Spearman | NDCG@{k} | P@{k} | Load (s) | Texts/s | p95 (ms) | Peak RSS (MB) |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for summary in summaries:
+        quality, perf = summary["quality"], summary["performance"]
+
+        def cell(key: str, fmt: str) -> str:
+            return "-" if perf.get(key) is None else format(perf[key], fmt)
+
+        lines.append(
+            f"| {summary['model_name']} | {perf['embedding_dim']} | {quality['spearman']:.3f} "
+            f"| {quality[f'ndcg@{k}']:.3f} | {quality[f'precision@{k}']:.3f} | {cell('load_seconds', '.2f')} "
+            f"| {cell('throughput_texts_per_second', '.1f')} | {cell('p95_latency_ms', '.1f')} "
+            f"| {cell('peak_rss_mb', '.0f')} |"
+        )
+    return "\n".join(lines)
+
+def visualize_results(results: Dict[str, Any], output_dir: str) -> None:
+    """Visualize model evaluation results for the first playlist"""
     # Extract data for plotting
-    tracks = [f"{m['track']['artist']} - {m['track']['title']}" for m in results["matches"]]
-    similarities = [m["similarity"] for m in results["matches"]]
-    ground_truth = [m.get("ground_truth", {}).get("score", 0) for m in results["matches"]]
+    matches = results["playlists"][0]["matches"]
+    tracks = [f"{m['track']['artist']} - {m['track']['title']}" for m in matches]
+    similarities = [m["similarity"] for m in matches]
+    ground_truth = [m["ground_truth"] for m in matches]
     
     # Create figure
     plt.figure(figsize=(12, 8))
@@ -169,13 +332,14 @@ def visualize_results(results: Dict[str, Any]) -> None:
         plt.barh(tracks, ground_truth, color='green', alpha=0.4, label='Ground Truth')
     
     plt.xlabel('Similarity Score')
-    plt.title(f'Model Evaluation: {args.model_name}')
+    plt.title(f'Model Evaluation: {results["model_name"]}')
     plt.legend()
     plt.tight_layout()
     
     # Save figure
-    output_path = os.path.join(args.output_dir, f"{args.model_name.replace('/', '_')}_results.png")
+    output_path = os.path.join(output_dir, f"{results['model_name'].replace('/', '_')}_results.png")
     plt.savefig(output_path)
+    plt.close()
     print(f"Visualization saved to {output_path}")
 
 def create_test_data_template():
@@ -234,34 +398,81 @@ def create_test_data_template():
     print("Test data template created: test_data_template.json")
 
 def main():
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description="Evaluate embedding models for music matching")
+    parser.add_argument("--models", "--model_name", type=str, nargs="+",
+                        default=[model_type.value for model_type in ModelType],
+                        help="Models to evaluate: ModelType keys or Hugging Face names (default: all served models)")
+    parser.add_argument("--test_data", type=str,
+                        default="./test_data.json",
+                        help="Path to test data JSON")
+    parser.add_argument("--output_dir", type=str, default="./model_evaluation_results",
+                        help="Directory to save results")
+    parser.add_argument("--batch_size", type=int, default=32, help="Batch size for embedding")
+    parser.add_argument("--latency_samples", type=int, default=50,
+                        help="Texts embedded one at a time to measure per-text latency")
+    parser.add_argument("--k", type=int, default=5, help="Cutoff for NDCG@k and precision@k")
+    parser.add_argument("--no_isolate", action="store_true",
+                        help="Evaluate all models in this process (peak RSS becomes cumulative)")
+    parser.add_argument("--cache_path", type=str, default=None,
+                        help="Embedding cache database (default: <output_dir>/embedding_cache.db)")
+    parser.add_argument("--no_cache", action="store_true", help="Embed every query from scratch")
+    parser.add_argument("--throughput_samples", type=int, default=256,
+                        help="Texts embedded in batches to measure throughput")
+    parser.add_argument("--skip_perf", action="store_true",
+                        help="Only compute ranking quality (no model load when everything is cached)")
+    args = parser.parse_args()
+
+    # Ensure output directory exists
+    os.makedirs(args.output_dir, exist_ok=True)
+
     # Check if test data exists
     if not os.path.exists(args.test_data):
         print(f"Test data not found at {args.test_data}")
         create_test_data_template()
         return
-    
+
     # Load test data
     with open(args.test_data, "r") as f:
         test_data = json.load(f)
-    
-    # Evaluate model
-    print(f"Evaluating model on {len(test_data['songs'])} songs...")
-    results = evaluate_model(test_data)
-    
-    # Save results
-    output_path = os.path.join(args.output_dir, f"{args.model_name.replace('/', '_')}_results.json")
-    with open(output_path, "w") as f:
-        json.dump(results, f, indent=2)
-    
-    print(f"Results saved to {output_path}")
-    
-    # Visualize results
-    visualize_results(results)
-    
-    # Print top matches
-    print("\nTop matches:")
-    for i, match in enumerate(results["matches"][:5]):
-        print(f"{i+1}. {match['track']['artist']} - {match['track']['title']}: {match['similarity']:.4f}")
+
+    print(f"Using device: {device}")
+    evaluate = evaluate_model if args.no_isolate else evaluate_model_isolated
+    cache_path = None if args.no_cache else (args.cache_path or os.path.join(args.output_dir, "embedding_cache.db"))
+    summaries = []
+
+    for model_name in [resolve_model_name(name) for name in args.models]:
+        print(f"\nEvaluating {model_name} on {len(test_data['songs'])} songs...")
+        results = evaluate(model_name, test_data, args.batch_size, args.latency_samples, args.k,
+                           cache_path, args.throughput_samples, not args.skip_perf)
+        if results["cache"]:
+            print(f"Embedding cache: {results['cache']['hits']} hits, {results['cache']['misses']} misses")
+
+        # Save results
+        output_path = os.path.join(args.output_dir, f"{model_name.replace('/', '_')}_results.json")
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {output_path}")
+
+        # Visualize results
+        visualize_results(results, args.output_dir)
+
+        # Print top matches
+        print("\nTop matches:")
+        for i, match in enumerate(results["playlists"][0]["matches"][:5]):
+            print(f"{i+1}. {match['track']['artist']} - {match['track']['title']}: {match['similarity']:.4f}")
+
+        summaries.append({key: results[key] for key in ("model_name", "quality", "performance")})
+
+    # Combined quality-vs-cost comparison
+    table = comparison_table(summaries)
+    with open(os.path.join(args.output_dir, "comparison.json"), "w") as f:
+        json.dump(summaries, f, indent=2)
+    with open(os.path.join(args.output_dir, "comparison.md"), "w") as f:
+        f.write(table + "\n")
+
+    print("\nQuality vs cost:")
+    print(table)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+"""
+Model Registry
+--------------
+Names and dimensions of the models served by the vectorization API.
+
+Kept free of torch/transformers imports so tools (evaluation, migrations, ...)
+can list the served models without loading them.
+"""
+
+import hashlib
+import json
+import os
+from enum import Enum
+from typing import Dict, Optional
+
+
+class ModelType(str, Enum):
+    GENERAL = "general"
+    CREATIVE = "creative"
+    SEMANTIC = "semantic"
+    FAST = "fast"
+
+
+MODEL_NAMES = {
+    ModelType.GENERAL: "sentence-transformers/all-MiniLM-L6-v2",
+    ModelType.CREATIVE: "sentence-transformers/all-mpnet-base-v2",
+    ModelType.SEMANTIC: "sentence-transformers/multi-qa-mpnet-base-dot-v1",
+    ModelType.FAST: "sentence-transformers/paraphrase-MiniLM-L3-v2",
+}
+
+MODEL_DIMENSIONS = {
+    ModelType.GENERAL: 384,
+    ModelType.CREATIVE: 768,
+    ModelType.SEMANTIC: 768,
+    ModelType.FAST: 384,
+}
+
+# Hub revisions to load; None follows the model's default branch
+MODEL_REVISIONS: Dict[ModelType, Optional[str]] = {
+    ModelType.GENERAL: None,
+    ModelType.CREATIVE: None,
+    ModelType.SEMANTIC: None,
+    ModelType.FAST: None,
+}
+
+SENTIMENT_MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+
+# Offline fixture mode (see fixture_models.py): every served name resolves to
+# a tiny random-weight model built in this directory
+FIXTURE_MODELS_DIR = os.environ.get("VECTORIZATION_FIXTURE_MODELS")
+FIXTURE_REVISION = "fixture"
+
+POOLING = "mean+l2"
+
+# Bump when api.py changes how text becomes a vector (empty-text handling,
+# hybrid combination, ...) so stored embeddings are re-embedded
+PIPELINE_VERSION = 1
+
+
+def model_source(name: str) -> str:
+    """What to pass to from_pretrained for a hub model name: the name, or its local fixture in fixture mode"""
+    if not FIXTURE_MODELS_DIR:
+        return name
+    from fixture_models import build_fixture_models
+    return build_fixture_models(FIXTURE_MODELS_DIR).get(name, name)
+
+
+def model_fingerprint(model_type: ModelType, revision: Optional[str] = None, max_length: int = 512) -> Dict:
+    """
+    Everything that determines an embedding: model id, resolved revision,
+    pooling, max token length, dimension and pipeline version, plus a short
+    `fingerprint` hash of them. Vectors with different fingerprints are not
+    comparable.
+    """
+    spec = {
+        "model": MODEL_NAMES[model_type],
+        "revision": revision or (FIXTURE_REVISION if FIXTURE_MODELS_DIR else MODEL_REVISIONS[model_type]) or "main",
+        "pooling": POOLING,
+        "max_length": max_length,
+        "dimensions": MODEL_DIMENSIONS[model_type],
+        "pipeline": PIPELINE_VERSION,
+    }
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"fingerprint": digest[:16], **spec}
+
+
+def embedding_cache_namespace(name: str, revision: Optional[str] = None, max_length: int = 512) -> str:
+    """
+    EmbeddingCache model key for a hub model name: the name plus its
+    fingerprint, so a new revision, pooling or pipeline version never reuses
+    embeddings cached for the old one. Pass the loaded model's commit as
+    `revision` when there is one. Names outside MODEL_NAMES get the same spec
+    without a known dimension.
+    """
+    for model_type, served_name in MODEL_NAMES.items():
+        if served_name == name:
+            return f"{name}@{model_fingerprint(model_type, revision, max_length)['fingerprint']}"
+    spec = {
+        "model": name,
+        "revision": revision or (FIXTURE_REVISION if FIXTURE_MODELS_DIR else "main"),
+        "pooling": POOLING,
+        "max_length": max_length,
+        "dimensions": None,
+        "pipeline": PIPELINE_VERSION,
+    }
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{name}@{digest[:16]}"
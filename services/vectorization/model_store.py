@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Model Store
+-----------
+Prepared local copies of the served models that start without deserializing
+their weights.
+
+`prepare` loads each model once through from_pretrained and writes:
+- weights.safetensors: every parameter and buffer, float32, in one file
+- config.json and the fast tokenizer (tokenizer.json)
+- manifest.json: source checkpoint, the revision asked for (MODEL_REVISIONS;
+  a model is prepared again when it changes), resolved hub revision (so
+  fingerprints stay the same as when loading from the hub) and attention
+  implementation
+
+`load` builds the model skeleton on the meta device (no allocation, no random
+init) and points every tensor straight into a private, copy-on-write mmap of
+weights.safetensors. Pages are read lazily on first use, and processes on
+the same host serving the same store share them through the page cache.
+Inference never writes to the weights, so nothing is ever copied.
+
+api.py uses the store when VECTORIZATION_MODEL_STORE points at a directory;
+missing models are prepared there on first start (from the hub, or fixture
+models in fixture mode).
+
+Usage:
+    python model_store.py prepare [--dir DIR]
+    python model_store.py benchmark [--dir DIR] [--processes 2]   # cold start and RSS, hub vs store
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+from typing import Dict, Tuple
+
+from model_registry import MODEL_NAMES, MODEL_REVISIONS, SENTIMENT_MODEL_NAME, model_source
+
+STORE_VERSION = 1
+WEIGHTS_FILE = "weights.safetensors"
+MANIFEST_FILE = "manifest.json"
+
+ENCODER = "encoder"
+CLASSIFIER = "classifier"
+
+# Every model api.py serves, with the head it is loaded with
+SERVED_MODELS = {
+    **{name: (ENCODER, MODEL_REVISIONS[model_type]) for model_type, name in MODEL_NAMES.items()},
+    SENTIMENT_MODEL_NAME: (CLASSIFIER, None),
+}
+
+SAFETENSORS_DTYPES = {"F32": "float32", "F16": "float16", "BF16": "bfloat16", "I64": "int64", "I32": "int32"}
+
+
+def _auto_class(kind: str):
+    from transformers import AutoModel, AutoModelForSequenceClassification
+    return AutoModelForSequenceClassification if kind == CLASSIFIER else AutoModel
+
+
+def _read_header(path: str) -> Tuple[int, Dict]:
+    """(data start offset, {tensor name: {dtype, shape, data_offsets}}) of a safetensors file"""
+    with open(path, "rb") as f:
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    header.pop("__metadata__", None)
+    return 8 + length, header
+
+
+class ModelStore:
+    """Directory of prepared models, one subdirectory per hub name"""
+
+    def __init__(self, root: str):
+        self.root = root
+        # Maps stay open for the process lifetime; tensors point into them
+        self._maps = []
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def manifest(self, name: str) -> Dict:
+        try:
+            with open(os.path.join(self.path(name), MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_prepared(self, name: str, kind: str, revision=None) -> bool:
+        manifest = self.manifest(name)
+        return (manifest.get("version") == STORE_VERSION and manifest.get("kind") == kind
+                and manifest.get("source") == model_source(name)
+                and manifest.get("requested_revision") == revision)
+
+    def prepare(self, name: str, kind: str, revision=None) -> Dict:
+        """Load `name` once through from_pretrained and write its mmap-ready copy"""
+        import torch
+        from safetensors.torch import save_file
+        from transformers import AutoTokenizer
+
+        source = model_source(name)
+        tokenizer = AutoTokenizer.from_pretrained(source, revision=revision)
+        model = _auto_class(kind).from_pretrained(source, revision=revision)
+        if not tokenizer.is_fast:
+            raise RuntimeError(f"{name} has no fast tokenizer to serialize")
+
+        # Buffers are included so nothing is left on the meta device at load time;
+        # tied parameters are stored once and re-tied after loading
+        tensors = {}
+        seen = set()
+        for key, tensor in [*model.named_parameters(), *model.named_buffers()]:
+            if tensor.numel() and tensor.data_ptr() in seen:
+                continue
+            seen.add(tensor.data_ptr())
+            tensors[key] = tensor.detach().to(torch.float32 if tensor.is_floating_point() else tensor.dtype).contiguous()
+
+        path = self.path(name)
+        os.makedirs(path, exist_ok=True)
+        save_file(tensors, os.path.join(path, WEIGHTS_FILE))
+        model.config.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+
+        manifest = {
+            "version": STORE_VERSION,
+            "name": name,
+            "kind": kind,
+            "source": source,
+            "requested_revision": revision,
+            "revision": getattr(model.config, "_commit_hash", None),
+            "attn_implementation": model.config._attn_implementation,
+            "tensors": len(tensors),
+            "bytes": os.path.getsize(os.path.join(path, WEIGHTS_FILE)),
+        }
+        # Written last: a half-prepared model is prepared again
+        with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def prepare_all(self) -> Dict[str, Dict]:
+        return {
+            name: self.manifest(name) if self.is_prepared(name, kind, revision) else self.prepare(name, kind, revision)
+            for name, (kind, revision) in SERVED_MODELS.items()
+        }
+
+    def _map_tensors(self, name: str) -> Dict:
+        import torch
+
+        weights = os.path.join(self.path(name), WEIGHTS_FILE)
+        start, header = _read_header(weights)
+        with open(weights, "rb") as f:
+            # ACCESS_COPY maps privately: clean pages stay shared with other processes
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._maps.append(mapped)
+
+        tensors = {}
+        for key, info in header.items():
+            dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+            begin, end = info["data_offsets"]
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            flat = torch.frombuffer(mapped, dtype=dtype, count=count, offset=start + begin) if count else \
+                torch.empty(0, dtype=dtype)
+            tensors[key] = flat.view(info["shape"])
+        return tensors
+
+    def load(self, name: str, kind: str = ENCODER, revision=None):
+        """(tokenizer, model) for a served model, preparing it first when missing"""
+        import torch
+        from transformers import AutoConfig, AutoTokenizer
+        from transformers.modeling_utils import no_init_weights
+
+        if not self.is_prepared(name, kind, revision):
+            print(f"Preparing {name} in the model store...")
+            self.prepare(name, kind, revision)
+
+        path = self.path(name)
+        manifest = self.manifest(name)
+        config = AutoConfig.from_pretrained(path)
+        # Same attention kernel from_pretrained picked, so outputs match exactly.
+        # Skipping init matters even on meta: random init there pulls in torch._dynamo
+        with torch.device("meta"), no_init_weights():
+            model = _auto_class(kind).from_config(config, attn_implementation=manifest.get("attn_implementation"))
+
+        tensors = self._map_tensors(name)
+        for key, tensor in tensors.items():
+            module_name, _, leaf = key.rpartition(".")
+            module = model.get_submodule(module_name)
+            if leaf in module._parameters:
+                module._parameters[leaf] = torch.nn.Parameter(tensor, requires_grad=False)
+            else:
+                module._buffers[leaf] = tensor
+        model.tie_weights()
+
+        missing = [key for key, tensor in [*model.named_parameters(), *model.named_buffers()] if tensor.is_meta]
+        if missing:
+            raise RuntimeError(f"{name}: '{missing[0]}' is not in the model store, prepare it again")
+
+        model.eval()
+        # Fingerprints use the resolved hub revision, as when loading from the hub
+        model.config._commit_hash = manifest.get("revision")
+        return AutoTokenizer.from_pretrained(path), model
+
+
+def memory_usage() -> Dict[str, int]:
+    """Resident, proportional and shared memory of this process in bytes (Linux)"""
+    usage = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Shared_Clean", "Private_Dirty"):
+                usage[key.lower()] = int(value.split()[0]) * 1024
+    return usage
+
+
+def _child(mode: str, root: str) -> None:
+    """Load every served model like api.py does, report, then wait so siblings overlap"""
+    started = time.perf_counter()
+    import torch
+    # Library import cost is the same either way; keep it out of the load timing
+    from transformers import AutoTokenizer, PreTrainedModel  # noqa: F401
+    imported = time.perf_counter()
+
+    store = ModelStore(root)
+    loaded = []
+    for name, (kind, revision) in SERVED_MODELS.items():
+        if mode == "store":
+            loaded.append(store.load(name, kind, revision))
+        else:
+            source = model_source(name)
+            loaded.append((AutoTokenizer.from_pretrained(source, revision=revision),
+                           _auto_class(kind).from_pretrained(source, revision=revision)))
+    load_seconds = time.perf_counter() - imported
+
+    # One forward pass per model touches the pages a first request would
+    with torch.no_grad():
+        for tokenizer, model in loaded:
+            model(**tokenizer(["warm up"], return_tensors="pt"))
+    ready_seconds = time.perf_counter() - started
+
+    print(json.dumps({"import_seconds": imported - started, "load_seconds": load_seconds,
+                      "ready_seconds": ready_seconds}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(memory_usage()), flush=True)
+    sys.stdin.readline()
+
+
+def benchmark(root: str, processes: int = 2) -> Dict[str, Dict]:
+    """Cold start time and memory of `processes` concurrent servers, hub loading vs store"""
+    ModelStore(root).prepare_all()
+    results = {}
+    for mode in ("hub", "store"):
+        children = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), "_child", mode, "--dir", root],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            for _ in range(processes)
+        ]
+        timings = [json.loads(child.stdout.readline()) for child in children]
+        # Memory is read only once every process is loaded, so shared pages show up in Pss
+        for child in children:
+            child.stdin.write("\n")
+            child.stdin.flush()
+        memory = [json.loads(child.stdout.readline()) for child in children]
+        for child in children:
+            child.stdin.write("\n")
+            child.stdin.flush()
+            child.wait()
+        results[mode] = {
+            key: sum(t[key] for t in timings) / processes for key in timings[0]
+        } | {
+            key: sum(m[key] for m in memory) / processes for key in memory[0]
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare and benchmark the memory-mapped model store")
+    parser.add_argument("command", choices=["prepare", "benchmark", "_child"])
+    parser.add_argument("mode", nargs="?", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", default=os.environ.get("VECTORIZATION_MODEL_STORE", os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data", "model_store"
+    )))
+    parser.add_argument("--processes", type=int, default=2, help="Concurrent servers to measure")
+    args = parser.parse_args()
+
+    if args.command == "_child":
+        _child(args.mode, args.dir)
+    elif args.command == "prepare":
+        for name, manifest in ModelStore(args.dir).prepare_all().items():
+            print(f"{name:55s} {manifest['bytes'] / 2**20:8.1f} MiB  revision {manifest['revision'] or '-'}")
+    else:
+        results = benchmark(args.dir, args.processes)
+        print(f"\n{'':6s} {'load':>8s} {'ready':>8s} {'RSS':>10s} {'PSS':>10s} {'shared':>10s}   "
+              f"(per process, {args.processes} running)")
+        for mode, r in results.items():
+            print(f"{mode:6s} {r['load_seconds']:7.2f}s {r['ready_seconds']:7.2f}s "
+                  f"{r['rss'] / 2**20:8.1f}MB {r['pss'] / 2**20:8.1f}MB {r['shared_clean'] / 2**20:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
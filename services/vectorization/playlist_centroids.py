@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Incremental Playlist Centroids
+------------------------------
+Keeps a running float64 sum and member count per (playlist, model), updated
+by add/remove-track events from the song embeddings already in the vector
+store, so the exact mean over every song in a playlist is an O(1) lookup.
+
+Usage:
+    python playlist_centroids.py rebuild [--playlist <id>] [--model creative] [--db data/vectors.db]
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_store import VectorStore
+
+
+class PlaylistCentroids:
+    """Running sums/counts over playlist members, stored next to the vector store"""
+
+    def __init__(self, store: VectorStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(store.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS playlist_members (
+                playlist_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                PRIMARY KEY (playlist_id, model, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS playlist_members_item ON playlist_members (model, item_id);
+            CREATE TABLE IF NOT EXISTS playlist_sums (
+                playlist_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector_sum BLOB NOT NULL,
+                count INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (playlist_id, model)
+            );
+        """)
+        self._conn.commit()
+
+    def _load_sum(self, playlist_id: str, model: str):
+        row = self._conn.execute(
+            "SELECT vector_sum, count FROM playlist_sums WHERE playlist_id = ? AND model = ?",
+            (playlist_id, model)
+        ).fetchone()
+        if row is None:
+            return None, 0
+        return np.frombuffer(row[0], dtype=np.float64).copy(), row[1]
+
+    def _save_sum(self, playlist_id: str, model: str, vector_sum: Optional[np.ndarray], count: int) -> None:
+        if count <= 0 or vector_sum is None:
+            self._conn.execute(
+                "DELETE FROM playlist_sums WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+            )
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO playlist_sums (playlist_id, model, vector_sum, count, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (playlist_id, model, vector_sum.astype(np.float64).tobytes(), count, time.time())
+        )
+
+    def _members(self, playlist_id: str, model: str) -> List[str]:
+        return [r[0] for r in self._conn.execute(
+            "SELECT item_id FROM playlist_members WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+        )]
+
+    def add_tracks(self, playlist_id: str, model: str, item_ids: List[str]) -> Dict:
+        """Add songs to a playlist's running sum; songs without a stored embedding are skipped"""
+        with self._lock:
+            members = set(self._members(playlist_id, model))
+            new_ids = [i for i in dict.fromkeys(item_ids) if i not in members]
+            vectors = self.store.get_many(new_ids, model)
+            added = [i for i in new_ids if i in vectors]
+
+            vector_sum, count = self._load_sum(playlist_id, model)
+            if added:
+                delta = np.sum([vectors[i] for i in added], axis=0, dtype=np.float64)
+                vector_sum = delta if vector_sum is None else vector_sum + delta
+                count += len(added)
+                self._conn.executemany(
+                    "INSERT INTO playlist_members (playlist_id, model, item_id) VALUES (?, ?, ?)",
+                    [(playlist_id, model, i) for i in added]
+                )
+                self._save_sum(playlist_id, model, vector_sum, count)
+                self._conn.commit()
+
+        return {
+            "added": len(added),
+            "missing_embeddings": [i for i in new_ids if i not in vectors],
+            "count": count,
+        }
+
+    def remove_tracks(self, playlist_id: str, model: str, item_ids: List[str]) -> Dict:
+        """Remove songs from a playlist's running sum"""
+        with self._lock:
+            members = set(self._members(playlist_id, model))
+            removed = [i for i in dict.fromkeys(item_ids) if i in members]
+            vectors = self.store.get_many(removed, model)
+
+            vector_sum, count = self._load_sum(playlist_id, model)
+            if removed:
+                for item_id in removed:
+                    if item_id in vectors and vector_sum is not None:
+                        vector_sum -= vectors[item_id]
+                self._conn.executemany(
+                    "DELETE FROM playlist_members WHERE playlist_id = ? AND model = ? AND item_id = ?",
+                    [(playlist_id, model, i) for i in removed]
+                )
+                count -= len(removed)
+                self._save_sum(playlist_id, model, vector_sum, count)
+                self._conn.commit()
+
+        # A member whose embedding was already deleted leaves the sum inexact
+        stale = [i for i in removed if i not in vectors]
+        if stale:
+            self.rebuild(model, playlist_id)
+
+        return {"removed": len(removed), "count": max(count, 0)}
+
+    def apply_vector_update(self, model: str, item_id: str, old: np.ndarray, new: Optional[np.ndarray]) -> int:
+        """
+        Carry a changed (or deleted, when `new` is None) song embedding into every
+        playlist containing it. Returns the number of playlists updated.
+        """
+        with self._lock:
+            playlist_ids = [r[0] for r in self._conn.execute(
+                "SELECT playlist_id FROM playlist_members WHERE model = ? AND item_id = ?", (model, item_id)
+            )]
+            for playlist_id in playlist_ids:
+                vector_sum, count = self._load_sum(playlist_id, model)
+                if vector_sum is None:
+                    continue
+                vector_sum -= old
+                if new is None:
+                    count -= 1
+                    self._conn.execute(
+                        "DELETE FROM playlist_members WHERE playlist_id = ? AND model = ? AND item_id = ?",
+                        (playlist_id, model, item_id)
+                    )
+                else:
+                    vector_sum += new
+                self._save_sum(playlist_id, model, vector_sum, count)
+            self._conn.commit()
+        return len(playlist_ids)
+
+    def members(self, playlist_id: str, model: str) -> List[str]:
+        with self._lock:
+            return self._members(playlist_id, model)
+
+    def playlists(self, model: str) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT playlist_id FROM playlist_members WHERE model = ?", (model,)
+            )]
+
+    def member_items(self, model: str, item_ids: List[str]) -> List[str]:
+        """Which of `item_ids` belong to at least one playlist"""
+        result = []
+        with self._lock:
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                result.extend(r[0] for r in self._conn.execute(
+                    f"SELECT DISTINCT item_id FROM playlist_members WHERE model = ? AND item_id IN ({placeholders})",
+                    (model, *chunk)
+                ))
+        return result
+
+    def centroid(self, playlist_id: str, model: str) -> Optional[Dict]:
+        """Exact mean embedding of every stored member song"""
+        with self._lock:
+            vector_sum, count = self._load_sum(playlist_id, model)
+        if vector_sum is None or count == 0:
+            return None
+        return {"centroid": (vector_sum / count).astype(np.float32), "count": count}
+
+    def rebuild(self, model: str, playlist_id: Optional[str] = None) -> Dict:
+        """
+        Recompute sums from the stored member embeddings and report how far the
+        incrementally maintained sums had drifted.
+        """
+        with self._lock:
+            if playlist_id is None:
+                playlist_ids = [r[0] for r in self._conn.execute(
+                    "SELECT DISTINCT playlist_id FROM playlist_members WHERE model = ?", (model,)
+                )]
+            else:
+                playlist_ids = [playlist_id]
+
+            report = {"playlists": len(playlist_ids), "max_drift": 0.0, "count_mismatches": 0, "dropped_members": 0}
+            for pid in playlist_ids:
+                members = self._members(pid, model)
+                vectors = self.store.get_many(members, model)
+                dropped = [i for i in members if i not in vectors]
+                if dropped:
+                    self._conn.executemany(
+                        "DELETE FROM playlist_members WHERE playlist_id = ? AND model = ? AND item_id = ?",
+                        [(pid, model, i) for i in dropped]
+                    )
+                    report["dropped_members"] += len(dropped)
+
+                exact = np.sum(list(vectors.values()), axis=0, dtype=np.float64) if vectors else None
+                old_sum, old_count = self._load_sum(pid, model)
+                if old_count != len(vectors):
+                    report["count_mismatches"] += 1
+                if old_sum is not None and exact is not None and len(old_sum) == len(exact):
+                    report["max_drift"] = max(report["max_drift"], float(np.abs(old_sum - exact).max()))
+
+                self._save_sum(pid, model, exact, len(vectors))
+            self._conn.commit()
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description="Maintain incremental playlist centroids")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute centroids from stored embeddings")
+    rebuild_parser.add_argument("--playlist", type=str, default=None, help="Only rebuild this playlist")
+    rebuild_parser.add_argument("--model", type=str, default="creative", help="Model type of the embeddings")
+    data_dir = os.environ.get(
+        "VECTORIZATION_DATA_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    )
+    rebuild_parser.add_argument("--db", type=str, default=os.path.join(data_dir, "vectors.db"),
+                                help="Path to the vector store")
+    args = parser.parse_args()
+
+    centroids = PlaylistCentroids(VectorStore(args.db))
+    print(json.dumps(centroids.rebuild(args.model, args.playlist), indent=2))
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Multi-Prototype Playlist Profiles
+---------------------------------
+A single centroid describes a mixed playlist (half ambient, half punk) as a
+point between its moods that matches neither. A profile instead clusters the
+member-song embeddings into a few weighted prototype vectors.
+
+Like the centroids, each prototype is kept as a float64 sum and count, and
+every member remembers its prototype, so add/remove/re-embed events update
+the profile incrementally. After enough incremental changes the clustering
+is rebuilt from the stored member embeddings.
+
+Candidates are scored against the prototypes only (best match or
+weight-averaged), so scoring cost does not grow with playlist size.
+
+Usage:
+    python playlist_profiles.py rebuild [--playlist <id>] [--model creative] [--db data/vectors.db]
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pq_codec import kmeans
+from playlist_centroids import PlaylistCentroids
+from vector_store import VectorStore
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def build_prototypes(vectors: np.ndarray, max_prototypes: int = 4, min_cluster_size: int = 3,
+                     merge_threshold: float = 0.9, iterations: int = 20,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cluster member embeddings into at most `max_prototypes` groups.
+    Returns (sums (k, dim) float64, counts (k,), assignments (n,)). Clusters
+    smaller than `min_cluster_size` or whose means are more similar than
+    `merge_threshold` are merged, so homogeneous playlists end up with one.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    unit = _normalize(vectors)
+    k = max(1, min(max_prototypes, n // max(min_cluster_size, 1)))
+
+    if k == 1:
+        assignments = np.zeros(n, dtype=np.int64)
+    else:
+        centers = _normalize(kmeans(unit, k, iterations, seed))
+        assignments = (unit @ centers.T).argmax(axis=1)
+
+    while True:
+        labels, assignments = np.unique(assignments, return_inverse=True)
+        counts = np.bincount(assignments)
+        if len(labels) == 1:
+            break
+        means = np.zeros((len(labels), vectors.shape[1]), dtype=np.float64)
+        np.add.at(means, assignments, unit)
+        means = _normalize(means)
+
+        similarity = means @ means.T
+        np.fill_diagonal(similarity, -np.inf)
+        smallest = counts.argmin()
+        if counts[smallest] < min_cluster_size:
+            # Fold a tiny cluster into its most similar neighbour
+            source, target = smallest, similarity[smallest].argmax()
+        elif similarity.max() > merge_threshold:
+            source, target = np.unravel_index(similarity.argmax(), similarity.shape)
+        else:
+            break
+        assignments[assignments == source] = target
+
+    sums = np.zeros((len(counts), vectors.shape[1]), dtype=np.float64)
+    np.add.at(sums, assignments, vectors)
+    return sums, counts, assignments
+
+
+def score_prototypes(candidates: np.ndarray, prototypes: np.ndarray, weights: np.ndarray,
+                     mode: str = "max") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (scores, best prototype index) of each candidate against a profile.
+    `max` takes the best-matching prototype, `weighted` averages similarities
+    by prototype weight.
+    """
+    similarities = np.asarray(candidates, dtype=np.float32) @ prototypes.T
+    best = similarities.argmax(axis=1)
+    if mode == "max":
+        return similarities.max(axis=1), best
+    if mode == "weighted":
+        return similarities @ weights, best
+    raise ValueError(f"Unknown scoring mode '{mode}', expected 'max' or 'weighted'")
+
+
+class PlaylistProfiles:
+    """Prototype sums, counts and member assignments, stored next to the playlist centroids"""
+
+    def __init__(self, centroids: PlaylistCentroids, max_prototypes: int = 4, min_cluster_size: int = 3,
+                 merge_threshold: float = 0.9, refresh_fraction: float = 0.5):
+        self.centroids = centroids
+        self.store: VectorStore = centroids.store
+        self.max_prototypes = max_prototypes
+        self.min_cluster_size = min_cluster_size
+        self.merge_threshold = merge_threshold
+        # Re-cluster once this fraction of the members changed since the last build
+        self.refresh_fraction = refresh_fraction
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.store.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS profile_prototypes (
+                playlist_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                vector_sum BLOB NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (playlist_id, model, idx)
+            );
+            CREATE TABLE IF NOT EXISTS profile_assignments (
+                playlist_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                PRIMARY KEY (playlist_id, model, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS profile_assignments_item ON profile_assignments (model, item_id);
+            CREATE TABLE IF NOT EXISTS profile_meta (
+                playlist_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                members INTEGER NOT NULL,
+                updates_since_build INTEGER NOT NULL,
+                built_at REAL NOT NULL,
+                PRIMARY KEY (playlist_id, model)
+            );
+        """)
+        self._conn.commit()
+
+    # -------------------------------------------------------------------------
+    # Storage helpers (callers hold the lock)
+    # -------------------------------------------------------------------------
+
+    def _load(self, playlist_id: str, model: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        rows = self._conn.execute(
+            "SELECT vector_sum, count FROM profile_prototypes WHERE playlist_id = ? AND model = ? ORDER BY idx",
+            (playlist_id, model)
+        ).fetchall()
+        if not rows:
+            return None, None
+        sums = np.stack([np.frombuffer(blob, dtype=np.float64) for blob, _ in rows]).copy()
+        return sums, np.array([count for _, count in rows], dtype=np.int64)
+
+    def _save(self, playlist_id: str, model: str, sums: np.ndarray, counts: np.ndarray) -> None:
+        self._conn.execute(
+            "DELETE FROM profile_prototypes WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+        )
+        self._conn.executemany(
+            "INSERT INTO profile_prototypes (playlist_id, model, idx, vector_sum, count) VALUES (?, ?, ?, ?, ?)",
+            [(playlist_id, model, i, s.astype(np.float64).tobytes(), int(c)) for i, (s, c) in enumerate(zip(sums, counts))]
+        )
+
+    def _assignments(self, playlist_id: str, model: str, item_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT item_id, idx FROM profile_assignments WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+        ).fetchall()
+        assignments = dict(rows)
+        if item_ids is None:
+            return assignments
+        return {i: assignments[i] for i in item_ids if i in assignments}
+
+    def _bump(self, playlist_id: str, model: str, changes: int, members: int) -> bool:
+        """Count incremental changes; returns True when the profile is due for re-clustering"""
+        row = self._conn.execute(
+            "SELECT updates_since_build FROM profile_meta WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+        ).fetchone()
+        updates = (row[0] if row else 0) + changes
+        self._conn.execute(
+            "UPDATE profile_meta SET updates_since_build = ?, members = ? WHERE playlist_id = ? AND model = ?",
+            (updates, members, playlist_id, model)
+        )
+        return updates >= max(self.min_cluster_size, self.refresh_fraction * members)
+
+    def _rebuild_locked(self, playlist_id: str, model: str) -> Dict:
+        members = self.centroids.members(playlist_id, model)
+        vectors = self.store.get_many(members, model)
+        item_ids = [i for i in members if i in vectors]
+
+        self._conn.execute(
+            "DELETE FROM profile_assignments WHERE playlist_id = ? AND model = ?", (playlist_id, model)
+        )
+        if not item_ids:
+            self._conn.execute("DELETE FROM profile_prototypes WHERE playlist_id = ? AND model = ?", (playlist_id, model))
+            self._conn.execute("DELETE FROM profile_meta WHERE playlist_id = ? AND model = ?", (playlist_id, model))
+            return {"prototypes": 0, "members": 0}
+
+        sums, counts, assignments = build_prototypes(
+            np.stack([vectors[i] for i in item_ids]), self.max_prototypes, self.min_cluster_size, self.merge_threshold
+        )
+        self._save(playlist_id, model, sums, counts)
+        self._conn.executemany(
+            "INSERT INTO profile_assignments (playlist_id, model, item_id, idx) VALUES (?, ?, ?, ?)",
+            [(playlist_id, model, item_id, int(a)) for item_id, a in zip(item_ids, assignments)]
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO profile_meta (playlist_id, model, members, updates_since_build, built_at) "
+            "VALUES (?, ?, ?, 0, ?)",
+            (playlist_id, model, len(item_ids), time.time())
+        )
+        return {"prototypes": len(counts), "members": len(item_ids)}
+
+    # -------------------------------------------------------------------------
+    # Events
+    # -------------------------------------------------------------------------
+
+    def rebuild(self, model: str, playlist_id: Optional[str] = None) -> Dict:
+        """Re-cluster one playlist (or every playlist) from its stored member embeddings"""
+        playlist_ids = [playlist_id] if playlist_id is not None else self.centroids.playlists(model)
+        with self._lock:
+            report = {pid: self._rebuild_locked(pid, model) for pid in playlist_ids}
+            self._conn.commit()
+        return report
+
+    def add_tracks(self, playlist_id: str, model: str, item_ids: List[str]) -> Dict:
+        """Assign newly added playlist members to their nearest prototype"""
+        with self._lock:
+            sums, counts = self._load(playlist_id, model)
+            if sums is None:
+                result = self._rebuild_locked(playlist_id, model)
+                self._conn.commit()
+                return {"rebuilt": True, **result}
+
+            members = set(self.centroids.members(playlist_id, model))
+            assigned = self._assignments(playlist_id, model)
+            new_ids = [i for i in dict.fromkeys(item_ids) if i in members and i not in assigned]
+            vectors = self.store.get_many(new_ids, model)
+            new_ids = [i for i in new_ids if i in vectors]
+            if new_ids:
+                batch = np.stack([vectors[i] for i in new_ids])
+                targets = (_normalize(batch) @ _normalize(sums).T).argmax(axis=1)
+                np.add.at(sums, targets, batch)
+                counts += np.bincount(targets, minlength=len(counts))
+                self._save(playlist_id, model, sums, counts)
+                self._conn.executemany(
+                    "INSERT INTO profile_assignments (playlist_id, model, item_id, idx) VALUES (?, ?, ?, ?)",
+                    [(playlist_id, model, item_id, int(t)) for item_id, t in zip(new_ids, targets)]
+                )
+
+            rebuilt = self._bump(playlist_id, model, len(new_ids), int(counts.sum()))
+            if rebuilt:
+                self._rebuild_locked(playlist_id, model)
+            self._conn.commit()
+        return {"assigned": len(new_ids), "rebuilt": rebuilt}
+
+    def remove_tracks(self, playlist_id: str, model: str, item_ids: List[str]) -> Dict:
+        """Take removed members out of their prototypes"""
+        with self._lock:
+            sums, counts = self._load(playlist_id, model)
+            if sums is None:
+                return {"removed": 0, "rebuilt": False}
+            assigned = self._assignments(playlist_id, model, list(dict.fromkeys(item_ids)))
+            vectors = self.store.get_many(list(assigned), model)
+
+            for item_id, idx in assigned.items():
+                if item_id in vectors:
+                    sums[idx] -= vectors[item_id]
+                counts[idx] -= 1
+            self._conn.executemany(
+                "DELETE FROM profile_assignments WHERE playlist_id = ? AND model = ? AND item_id = ?",
+                [(playlist_id, model, i) for i in assigned]
+            )
+
+            # A member without its embedding or an emptied prototype needs a fresh clustering
+            rebuilt = (
+                len(vectors) < len(assigned)
+                or (counts <= 0).any()
+                or self._bump(playlist_id, model, len(assigned), int(counts.sum()))
+            )
+            if rebuilt:
+                self._rebuild_locked(playlist_id, model)
+            else:
+                self._save(playlist_id, model, sums, counts)
+            self._conn.commit()
+        return {"removed": len(assigned), "rebuilt": rebuilt}
+
+    def apply_vector_update(self, model: str, item_id: str, old: np.ndarray, new: Optional[np.ndarray]) -> int:
+        """Carry a changed (or deleted) song embedding into every profile containing it"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT playlist_id, idx FROM profile_assignments WHERE model = ? AND item_id = ?", (model, item_id)
+            ).fetchall()
+            for playlist_id, idx in rows:
+                sums, counts = self._load(playlist_id, model)
+                if sums is None:
+                    continue
+                sums[idx] -= old
+                if new is None:
+                    counts[idx] -= 1
+                    self._conn.execute(
+                        "DELETE FROM profile_assignments WHERE playlist_id = ? AND model = ? AND item_id = ?",
+                        (playlist_id, model, item_id)
+                    )
+                else:
+                    sums[idx] += new
+                if counts[idx] <= 0 or self._bump(playlist_id, model, 1, int(counts.sum())):
+                    self._rebuild_locked(playlist_id, model)
+                else:
+                    self._save(playlist_id, model, sums, counts)
+            self._conn.commit()
+        return len(rows)
+
+    # -------------------------------------------------------------------------
+    # Lookup and scoring
+    # -------------------------------------------------------------------------
+
+    def profile(self, playlist_id: str, model: str) -> Optional[Dict]:
+        """Normalized prototype vectors with their weights (member share)"""
+        with self._lock:
+            sums, counts = self._load(playlist_id, model)
+        if sums is None:
+            return None
+        return {
+            "prototypes": _normalize(sums / counts[:, None]).astype(np.float32),
+            "weights": counts / counts.sum(),
+            "counts": counts,
+        }
+
+    def score(self, playlist_id: str, model: str, candidates: np.ndarray, mode: str = "max"):
+        """(scores, best prototype index) of candidate embeddings, or None without a profile"""
+        profile = self.profile(playlist_id, model)
+        if profile is None:
+            return None
+        return score_prototypes(candidates, profile["prototypes"], profile["weights"], mode)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description="Maintain multi-prototype playlist profiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Re-cluster profiles from stored embeddings")
+    rebuild_parser.add_argument("--playlist", type=str, default=None, help="Only rebuild this playlist")
+    rebuild_parser.add_argument("--model", type=str, default="creative", help="Model type of the embeddings")
+    data_dir = os.environ.get(
+        "VECTORIZATION_DATA_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    )
+    rebuild_parser.add_argument("--db", type=str, default=os.path.join(data_dir, "vectors.db"),
+                                help="Path to the vector store")
+    args = parser.parse_args()
+
+    profiles = PlaylistProfiles(PlaylistCentroids(VectorStore(args.db)))
+    print(json.dumps(profiles.rebuild(args.model, args.playlist), indent=2))
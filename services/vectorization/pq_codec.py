@@ -0,0 +1,281 @@
+"""
+Product Quantization Codec
+--------------------------
+Compresses embeddings into a few dozen bytes each by splitting every vector
+into `m` sub-vectors and replacing each with the id of its nearest centroid in
+a per-subspace codebook (256 centroids → 1 byte per subspace).
+
+Search uses asymmetric distance computation (ADC): the float query is compared
+against the codebooks once, then every stored code is scored with `m` table
+lookups. The best candidates are re-ranked with their exact float vectors.
+
+Codebooks are tagged with the fingerprint of the model version whose vectors
+they were trained on, like projections: another version's vectors need new
+codebooks.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means returning (k, dim) centroids; empty clusters are reseeded"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    vector_norms = (vectors ** 2).sum(axis=1, keepdims=True)
+
+    for _ in range(iterations):
+        distances = vector_norms - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignments = distances.argmin(axis=1)
+
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            # Reseed from the points furthest from their current centroid
+            worst = distances[np.arange(len(vectors)), assignments].argsort()[::-1]
+            centroids[empty] = vectors[worst[:empty.sum()]]
+
+    return centroids
+
+
+class ProductQuantizer:
+    """Codebooks of shape (m, ksub, dsub) with uint8 encode/decode and ADC scoring"""
+
+    def __init__(self, codebooks: np.ndarray, fingerprint: str = ""):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.fingerprint = fingerprint
+
+    @property
+    def num_subspaces(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def num_centroids(self) -> int:
+        return self.codebooks.shape[1]
+
+    @property
+    def subspace_dim(self) -> int:
+        return self.codebooks.shape[2]
+
+    @property
+    def dim(self) -> int:
+        return self.num_subspaces * self.subspace_dim
+
+    @property
+    def code_size(self) -> int:
+        """Bytes per encoded vector"""
+        return self.num_subspaces
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, num_subspaces: Optional[int] = None, num_centroids: int = 256,
+              iterations: int = 20, seed: int = 0, fingerprint: str = "") -> "ProductQuantizer":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        # Default to 16-d subspaces: 48 bytes for 768-d, 24 bytes for 384-d vectors
+        num_subspaces = num_subspaces or max(1, dim // 16)
+
+        if dim % num_subspaces != 0:
+            raise ValueError(f"Dimension {dim} is not divisible into {num_subspaces} subspaces")
+        if not 1 < num_centroids <= 256:
+            raise ValueError("num_centroids must be between 2 and 256 to fit uint8 codes")
+        if n < num_centroids:
+            raise ValueError(f"Need at least {num_centroids} vectors to train {num_centroids} centroids, got {n}")
+
+        subspace_dim = dim // num_subspaces
+        codebooks = np.stack([
+            kmeans(vectors[:, j * subspace_dim:(j + 1) * subspace_dim], num_centroids, iterations, seed + j)
+            for j in range(num_subspaces)
+        ])
+        return cls(codebooks, fingerprint)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[-1]}-d")
+        return vectors.reshape(len(vectors), self.num_subspaces, self.subspace_dim)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) floats → (n, m) uint8 codes"""
+        subvectors = self._split(vectors)
+        codes = np.empty((len(subvectors), self.num_subspaces), dtype=np.uint8)
+        for j in range(self.num_subspaces):
+            codebook = self.codebooks[j]
+            distances = (
+                (subvectors[:, j] ** 2).sum(axis=1, keepdims=True)
+                - 2 * subvectors[:, j] @ codebook.T
+                + (codebook ** 2).sum(axis=1)
+            )
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """(n, m) uint8 codes → (n, dim) approximate floats"""
+        codes = np.asarray(codes, dtype=np.intp)
+        parts = self.codebooks[np.arange(self.num_subspaces), codes]  # (n, m, dsub)
+        return parts.reshape(len(codes), self.dim)
+
+    def inner_product_table(self, query: np.ndarray) -> np.ndarray:
+        """(m, ksub) inner products between each query sub-vector and its codebook"""
+        subquery = self._split(np.asarray(query)[None])[0]
+        return np.einsum("md,mkd->mk", subquery, self.codebooks)
+
+    def adc_scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner product of a float query with every encoded vector"""
+        table = self.inner_product_table(query)
+        return table[np.arange(self.num_subspaces), codes.astype(np.intp)].sum(axis=1)
+
+    def save(self, path: str) -> None:
+        np.savez(path, codebooks=self.codebooks, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path: str) -> "ProductQuantizer":
+        with np.load(path) as data:
+            # Codebooks saved before fingerprints were recorded match no model version
+            fingerprint = str(data["fingerprint"]) if "fingerprint" in data.files else ""
+            return cls(data["codebooks"], fingerprint)
+
+
+class PQIndex:
+    """
+    In-memory codes for one model's stored vectors, searchable with ADC + exact
+    re-rank. Updates and searches run on different threads; a lock keeps
+    `item_ids`, `codes` and the row map consistent with each other.
+    """
+
+    def __init__(self, quantizer: ProductQuantizer, item_ids: List[str], codes: np.ndarray):
+        self.quantizer = quantizer
+        self.item_ids = list(item_ids)
+        self.codes = codes.reshape(len(self.item_ids), quantizer.code_size).astype(np.uint8)
+        self._rows = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def add(self, item_ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Encode and add (or replace) vectors; returns their codes"""
+        codes = self.quantizer.encode(vectors)
+        with self._lock:
+            appended = []
+            for item_id, code in zip(item_ids, codes):
+                row = self._rows.get(item_id)
+                if row is None:
+                    self._rows[item_id] = len(self.item_ids) + len(appended)
+                    appended.append((item_id, code))
+                else:
+                    self.codes[row] = code
+            if appended:
+                self.item_ids.extend(item_id for item_id, _ in appended)
+                self.codes = np.vstack([self.codes, np.stack([code for _, code in appended])])
+        return codes
+
+    def remove(self, item_id: str) -> None:
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            last = len(self.item_ids) - 1
+            if row != last:
+                # Swap-remove keeps the codes matrix contiguous
+                self.item_ids[row] = self.item_ids[last]
+                self.codes[row] = self.codes[last]
+                self._rows[self.item_ids[row]] = row
+            self.item_ids.pop()
+            self.codes = self.codes[:last]
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 10,
+        rerank: int = 100,
+        fetch_vectors: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+    ) -> List[Dict]:
+        """
+        Rank stored items against a float query.
+        ADC scores pick the `rerank` best candidates, which are then re-scored with
+        their exact vectors from `fetch_vectors` (when given) before taking `top_k`.
+        """
+        # Scoring and the row -> item id lookup see one state; re-ranking needs no lock
+        with self._lock:
+            if not self.item_ids:
+                return []
+
+            approximate = self.quantizer.adc_scores(query, self.codes)
+            candidates = min(max(rerank, top_k), len(approximate))
+            shortlist = np.argpartition(-approximate, candidates - 1)[:candidates]
+
+            results = [
+                {"item_id": self.item_ids[i], "approximate_score": float(approximate[i]),
+                 "score": float(approximate[i])}
+                for i in shortlist
+            ]
+
+        if fetch_vectors is not None:
+            exact = fetch_vectors([r["item_id"] for r in results])
+            query = np.asarray(query, dtype=np.float32)
+            for result in results:
+                vector = exact.get(result["item_id"])
+                if vector is not None:
+                    result["score"] = float(vector @ query)
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:top_k]
+
+
+def evaluate_quantizer(quantizer: ProductQuantizer, vectors: np.ndarray, k: int = 10,
+                       queries: int = 100) -> Dict:
+    """Compression and ADC-ranking quality of a trained quantizer on stored vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    codes = quantizer.encode(vectors)
+    reconstruction = quantizer.decode(codes)
+
+    report = {
+        "vectors": len(vectors),
+        "bytes_per_vector_float32": quantizer.dim * 4,
+        "bytes_per_vector_pq": quantizer.code_size,
+        "compression_ratio": quantizer.dim * 4 / quantizer.code_size,
+        "mean_reconstruction_error": float(np.linalg.norm(vectors - reconstruction, axis=1).mean()),
+    }
+
+    k = min(k, len(vectors))
+    sample = vectors[:queries]
+    exact_top = np.argsort(-(sample @ vectors.T), axis=1)[:, :k]
+    adc_top = np.stack([np.argsort(-quantizer.adc_scores(q, codes))[:k] for q in sample])
+    report["adc_recall_at_k"] = float(np.mean([
+        len(set(a).intersection(b)) / k for a, b in zip(exact_top.tolist(), adc_top.tolist())
+    ]))
+    report["k"] = k
+    return report
+
+
+class PQRegistry:
+    """Trained quantizers per model, persisted as .npz and loaded with their stored codes"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.indexes: Dict[str, PQIndex] = {}
+
+    def path(self, model_key: str) -> str:
+        return os.path.join(self.directory, f"{model_key}.npz")
+
+    def get(self, model_key: str, load_codes: Callable[[str], tuple]) -> Optional[PQIndex]:
+        if model_key not in self.indexes:
+            if not os.path.exists(self.path(model_key)):
+                return None
+            item_ids, codes = load_codes(model_key)
+            self.indexes[model_key] = PQIndex(ProductQuantizer.load(self.path(model_key)), item_ids, codes)
+        return self.indexes[model_key]
+
+    def set(self, model_key: str, index: PQIndex) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        index.quantizer.save(self.path(model_key))
+        self.indexes[model_key] = index
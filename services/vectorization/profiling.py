@@ -0,0 +1,188 @@
+"""
+Request Profiling
+-----------------
+Per-request stage timings and on-demand profiler capture.
+
+Stage timings are collected into a dict held in a context variable, so code
+deep inside the embedding path can record `tokenize`, `forward`, ... without
+threading a timer through every call. Outside a timed request (background
+jobs, scripts) `stage()` is a no-op.
+
+`RequestProfiler` captures torch.profiler or cProfile traces for a sampled
+subset of the next N requests and writes them to disk. Inference runs on the
+scheduler's model threads, not the request's, so a captured request is
+marked in a context variable that travels with its work items (see
+scheduler.py), and each item runs under its own profiler on the model
+thread via `profiled()`. The pieces are merged into the request's trace:
+cProfile stats are added to those of the request thread, torch traces are
+concatenated (torch cannot run two profiler sessions at once, so torch mode
+profiles the model work only, one item at a time).
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+_capture: ContextVar[Optional["_Capture"]] = ContextVar("profile_capture", default=None)
+
+
+def start_timing() -> Dict[str, float]:
+    """Begin collecting stage timings for the current request; returns the (shared, mutable) dict"""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """Add the wall time of the block to `name` (repeated stages accumulate)"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format millisecond timings as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={duration:.2f}" for name, duration in timings.items())
+
+
+class _Capture:
+    """Profiles of one request's model work, gathered from the threads it ran on"""
+
+    def __init__(self, mode: str, directory: str):
+        self.mode = mode
+        self.directory = directory
+        self.parts: List[Any] = []  # cProfile.Profile objects or lists of chrome trace events
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable, *args):
+        if self.mode != "torch":
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(fn, *args)
+            finally:
+                with self._lock:
+                    self.parts.append(profile)
+
+        from torch.profiler import ProfilerActivity, profile
+
+        # One torch profiler session at a time, even across model threads
+        with self._lock:
+            try:
+                with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+                    return fn(*args)
+            finally:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f".part-{threading.get_ident()}-{time.time_ns()}.json")
+                prof.export_chrome_trace(path)
+                with open(path) as f:
+                    self.parts.append(json.load(f)["traceEvents"])
+                os.remove(path)
+
+
+def profiled(fn: Callable, *args):
+    """Run fn(*args), under the profiler if the current request is being captured"""
+    capture = _capture.get()
+    if capture is None:
+        return fn(*args)
+    return capture.run(fn, *args)
+
+
+class RequestProfiler:
+    """Profiles a sampled subset of the next N requests, one request at a time"""
+
+    MODES = ("torch", "cprofile")
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.mode = "torch"
+        self.remaining = 0
+        self.sample_rate = 1.0
+        self.traces: List[str] = []
+        self._lock = threading.Lock()
+        self._busy = False
+
+    def arm(self, requests: int, mode: str = "torch", sample_rate: float = 1.0) -> Dict:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode '{mode}', expected one of {self.MODES}")
+        if requests < 1 or not 0 < sample_rate <= 1:
+            raise ValueError("requests must be positive and sample_rate in (0, 1]")
+        with self._lock:
+            self.mode = mode
+            self.remaining = requests
+            self.sample_rate = sample_rate
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "remaining": self.remaining,
+            "sample_rate": self.sample_rate,
+            "directory": self.directory,
+            "traces": list(self.traces),
+        }
+
+    def claim(self) -> bool:
+        """Whether the calling request should be profiled"""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            # Profilers are process-wide, so only one request is captured at a time
+            if self._busy or random.random() >= self.sample_rate:
+                return False
+            self._busy = True
+            return True
+
+    def _trace_path(self, label: str, extension: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = label.strip("/").replace("/", "_") or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6:06d}-{safe_label}{extension}"
+        return os.path.join(self.directory, filename)
+
+    @contextmanager
+    def capture(self, label: str):
+        """Profile the block and the model work it submits; call only after `claim()` returned True"""
+        capture = _Capture(self.mode, self.directory)
+        marker = _capture.set(capture)
+        try:
+            if self.mode == "torch":
+                yield
+                path = self._trace_path(label, ".json")
+                with capture._lock:
+                    events = [event for part in capture.parts for event in part]
+                with open(path, "w") as f:
+                    json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+                path = self._trace_path(label, ".prof")
+                stats = pstats.Stats(profiler)
+                with capture._lock:
+                    for part in capture.parts:
+                        stats.add(part)
+                stats.dump_stats(path)
+            self.traces.append(path)
+            print(f"Profile written to {path}")
+        finally:
+            _capture.reset(marker)
+            with self._lock:
+                self._busy = False
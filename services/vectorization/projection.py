@@ -0,0 +1,196 @@
+"""
+Embedding Projection
+--------------------
+Fits, persists and applies per-model PCA projections so embeddings can be
+served at a reduced dimension (e.g. 128 or 256 instead of 768).
+
+The projection is an uncentered PCA (truncated SVD): it keeps the directions
+that best preserve dot products between the normalized embeddings, which is
+what cosine-similarity matching relies on.
+
+Projections are fitted from a corpus of embeddings produced by the same model
+and stored as .npz files, one per (model, target dimension) pair, tagged with
+the fingerprint of the model version whose embeddings they were fitted on:
+another version's embedding space has different principal directions.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class Projection:
+    """Linear PCA projection from a model's native space to `target_dim`"""
+
+    def __init__(self, components: np.ndarray, explained_variance_ratio: np.ndarray, fingerprint: str = ""):
+        self.components = components.astype(np.float32)  # (target_dim, source_dim)
+        self.explained_variance_ratio = explained_variance_ratio.astype(np.float32)
+        self.fingerprint = fingerprint
+
+    @property
+    def source_dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def target_dim(self) -> int:
+        return self.components.shape[0]
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Project (n, source_dim) vectors and L2-normalize the result"""
+        projected = np.asarray(vectors, dtype=np.float32) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return projected / np.maximum(norms, 1e-12)
+
+    def save(self, path: str) -> None:
+        np.savez(path, components=self.components,
+                 explained_variance_ratio=self.explained_variance_ratio,
+                 fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as data:
+            # Projections saved before fingerprints were recorded match no model version
+            fingerprint = str(data["fingerprint"]) if "fingerprint" in data.files else ""
+            return cls(data["components"], data["explained_variance_ratio"], fingerprint)
+
+
+def fit_projection(embeddings: np.ndarray, target_dim: int, fingerprint: str = "") -> Projection:
+    """Fit a projection to the top `target_dim` right singular vectors of the corpus"""
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    n_samples, source_dim = embeddings.shape
+
+    if target_dim < 1:
+        raise ValueError(f"Target dimension must be positive, got {target_dim}")
+    if target_dim >= source_dim:
+        raise ValueError(f"Target dimension {target_dim} must be smaller than source dimension {source_dim}")
+    if target_dim > n_samples:
+        raise ValueError(f"Need at least {target_dim} embeddings to fit a {target_dim}-d projection, got {n_samples}")
+
+    _, singular_values, vt = np.linalg.svd(embeddings, full_matrices=False)
+
+    energy = singular_values ** 2
+    explained = energy / energy.sum() if energy.sum() > 0 else np.zeros_like(energy)
+
+    return Projection(vt[:target_dim], explained[:target_dim], fingerprint)
+
+
+def _top_k_neighbours(vectors: np.ndarray, k: int, chunk_size: int = 1024) -> Tuple[np.ndarray, float]:
+    """
+    Top-k cosine neighbours (excluding self) of normalized vectors, plus the
+    seconds spent on similarities. Rows are scored in chunks, so memory stays
+    at chunk_size x n instead of n x n.
+    """
+    k = min(k, len(vectors) - 1)
+    neighbours = np.empty((len(vectors), k), dtype=np.int64)
+    elapsed = 0.0
+    for start in range(0, len(vectors), chunk_size):
+        stop = min(start + chunk_size, len(vectors))
+        started = time.perf_counter()
+        similarities = vectors[start:stop] @ vectors.T
+        elapsed += time.perf_counter() - started
+
+        similarities[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        neighbours[start:stop] = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return neighbours, elapsed
+
+
+def evaluate_projection(embeddings: np.ndarray, projection: Projection, k: int = 10) -> Dict:
+    """
+    Compare retrieval on projected vectors against the full-dimension vectors.
+    Returns quality loss (recall@k of the full-space neighbours, similarity error)
+    alongside storage and similarity-compute savings.
+    """
+    full = np.asarray(embeddings, dtype=np.float32)
+    full = full / np.maximum(np.linalg.norm(full, axis=1, keepdims=True), 1e-12)
+    reduced = projection.apply(full)
+
+    report = {
+        "source_dim": projection.source_dim,
+        "target_dim": projection.target_dim,
+        "samples": len(full),
+        "explained_variance": float(projection.explained_variance_ratio.sum()),
+        "storage": {
+            "bytes_per_vector_full": projection.source_dim * 4,
+            "bytes_per_vector_reduced": projection.target_dim * 4,
+            "reduction_ratio": projection.source_dim / projection.target_dim,
+        },
+    }
+
+    if len(full) < 2:
+        return report
+
+    full_neighbours, full_seconds = _top_k_neighbours(full, k)
+    reduced_neighbours, reduced_seconds = _top_k_neighbours(reduced, k)
+
+    overlap = [
+        len(set(a).intersection(b)) / len(a)
+        for a, b in zip(full_neighbours.tolist(), reduced_neighbours.tolist())
+    ]
+
+    # Pairwise similarity error, sampled to keep the report cheap on big corpora
+    sample = full[:500]
+    sample_reduced = reduced[:500]
+    similarity_error = np.abs(sample @ sample.T - sample_reduced @ sample_reduced.T)
+
+    report["retrieval"] = {
+        "k": int(full_neighbours.shape[1]),
+        "recall_at_k": float(np.mean(overlap)),
+        "mean_abs_similarity_error": float(similarity_error.mean()),
+        "max_abs_similarity_error": float(similarity_error.max()),
+    }
+    report["similarity_compute"] = {
+        "flops_per_comparison_full": 2 * projection.source_dim,
+        "flops_per_comparison_reduced": 2 * projection.target_dim,
+        "all_pairs_seconds_full": full_seconds,
+        "all_pairs_seconds_reduced": reduced_seconds,
+    }
+    return report
+
+
+class ProjectionRegistry:
+    """Loads and caches fitted projections from a directory of .npz files"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache: Dict[Tuple[str, int], Projection] = {}
+
+    def _path(self, model_key: str, target_dim: int, extension: str) -> str:
+        return os.path.join(self.directory, f"{model_key}_{target_dim}.{extension}")
+
+    def get(self, model_key: str, target_dim: int) -> Optional[Projection]:
+        key = (model_key, target_dim)
+        if key not in self._cache:
+            path = self._path(model_key, target_dim, "npz")
+            if not os.path.exists(path):
+                return None
+            self._cache[key] = Projection.load(path)
+        return self._cache[key]
+
+    def save(self, model_key: str, projection: Projection, report: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        projection.save(self._path(model_key, projection.target_dim, "npz"))
+        with open(self._path(model_key, projection.target_dim, "json"), "w") as f:
+            json.dump(report, f, indent=2)
+        self._cache[(model_key, projection.target_dim)] = projection
+
+    def list(self) -> List[Dict]:
+        """Reports of every persisted projection"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        reports = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            model_key, target_dim = filename[:-len(".json")].rsplit("_", 1)
+            with open(os.path.join(self.directory, filename)) as f:
+                report = json.load(f)
+            with open(os.path.join(self.directory, filename[:-len(".json")] + ".npz"), "rb") as f:
+                # Identifies the fitted components, e.g. to check that every node serves the same projection
+                checksum = hashlib.sha256(f.read()).hexdigest()[:16]
+            reports.append({"model": model_key, "dimensions": int(target_dim), "checksum": checksum, "report": report})
+        return reports
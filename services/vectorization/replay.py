@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Traffic Replay
+--------------
+Drives a running API with a traffic capture (see traffic_capture.py), at the
+original pace or scaled, and reports latency per route next to the latency
+the captured requests had.
+
+Requests are sent at their captured offsets divided by --speed (--speed 0
+sends as fast as --workers allow). Texts of captures without payloads are
+replaced by deterministic stand-ins of the same length, and equal texts stay
+equal, so cache hit rates, batch shapes and length skew match the capture.
+The same capture always replays the same requests in the same order.
+
+Usage:
+    curl -X POST localhost:8000/admin/capture -d '{"enabled": true}' -H 'Content-Type: application/json'
+    python replay.py data/captures/capture-20250101-120000-000.jsonl [--speed 2] [--workers 64]
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+from traffic_capture import read_capture, restore
+
+
+def prepare(capture: Dict, routes: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Dict]:
+    """Replayable requests: method, path, route, JSON body and the captured timing"""
+    prepared = []
+    for record in capture["requests"]:
+        route = record.get("route") or record["path"]
+        if record["path"].startswith("/admin") or (routes and route not in routes):
+            continue
+        body = record["body"] if capture["header"]["payloads"] else restore(record["body"])
+        prepared.append({**record, "route": route, "body": body})
+    if limit:
+        prepared = prepared[:limit]
+    # Offsets restart at the first replayed request
+    start = prepared[0]["t"] if prepared else 0.0
+    return [{**r, "t": r["t"] - start} for r in prepared]
+
+
+def replay(url: str, plan: List[Dict], speed: float = 1.0, workers: int = 64,
+           timeout: float = 120.0) -> List[Dict]:
+    """Send every planned request on schedule; one result per request, in plan order"""
+    local = threading.local()
+    results: List[Optional[Dict]] = [None] * len(plan)
+
+    def send(index: int, scheduled: float, started: float):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        request = plan[index]
+        sent = time.perf_counter()
+        try:
+            response = local.session.request(
+                request["method"], url + request["path"],
+                json=request["body"] if request["body"] is not None else None, timeout=timeout
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        results[index] = {
+            "route": request["route"],
+            "status": status,
+            "ms": (time.perf_counter() - sent) * 1000,
+            # How late the request left, because the client could not keep up
+            "lag_ms": (sent - started - scheduled) * 1000,
+            "captured_status": request["status"],
+            "captured_ms": request["ms"],
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, request in enumerate(plan):
+            scheduled = request["t"] / speed if speed > 0 else 0.0
+            delay = started + scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, index, scheduled, started)
+    return results
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    values = np.asarray(values, dtype=np.float64)
+    return {f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+
+def summarize(results: List[Dict], elapsed: float, captured_seconds: float) -> Dict[str, Any]:
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+
+    routes = {}
+    for route, items in sorted(by_route.items(), key=lambda item: -len(item[1])):
+        routes[route] = {
+            "requests": len(items),
+            "replayed": _percentiles([r["ms"] for r in items]),
+            "captured": _percentiles([r["captured_ms"] for r in items]),
+            "status": dict(Counter(str(r["status"]) for r in items)),
+            # Same request, different outcome than when it was captured (e.g. 200 now 429)
+            "status_changed": sum(str(r["status"]) != str(r["captured_status"]) for r in items),
+        }
+
+    return {
+        "requests": len(results),
+        "elapsed_seconds": elapsed,
+        "captured_seconds": captured_seconds,
+        "throughput_per_s": len(results) / elapsed if elapsed > 0 else 0.0,
+        "max_lag_ms": max((r["lag_ms"] for r in results), default=0.0),
+        "replayed": _percentiles([r["ms"] for r in results]) if results else {},
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured API traffic against a running server")
+    parser.add_argument("capture", help="Capture file written by /admin/capture")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time scale: 2 replays twice as fast, 0 without pauses")
+    parser.add_argument("--workers", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--routes", nargs="+", help="Only replay these routes, e.g. /embed/hybrid /vectors/{item_id}")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--output", help="Write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    if args.speed < 0:
+        parser.error("--speed must be >= 0")
+
+    plan = prepare(read_capture(args.capture), args.routes, args.limit)
+    if not plan:
+        parser.error("No requests to replay")
+    captured_seconds = plan[-1]["t"]
+    print(f"Replaying {len(plan)} requests captured over {captured_seconds:.1f}s "
+          f"at {'full speed' if args.speed == 0 else f'{args.speed:g}x'}...")
+
+    started = time.perf_counter()
+    results = replay(args.url, plan, args.speed, args.workers)
+    summary = summarize(results, time.perf_counter() - started, captured_seconds)
+
+    print(f"\n{'route':32s} {'n':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s}   {'captured p50/p95':>18s}  status")
+    for route, r in summary["routes"].items():
+        replayed, captured = r["replayed"], r["captured"]
+        print(f"{route:32s} {r['requests']:6d} {replayed['p50_ms']:7.1f}ms {replayed['p95_ms']:7.1f}ms "
+              f"{replayed['p99_ms']:7.1f}ms   {captured['p50_ms']:7.1f}/{captured['p95_ms']:7.1f}ms  "
+              f"{', '.join(f'{k}: {v}' for k, v in r['status'].items())}")
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['throughput_per_s']:.1f}/s), max send lag {summary['max_lag_ms']:.0f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Model Work Scheduler
+--------------------
+Admission control for model inference.
+
+Every model gets a worker thread fed by two bounded lanes: `interactive`
+(single embeds from the matching UI) and `bulk` (large batches, syncs,
+background jobs). The worker always drains interactive work first, and bulk
+requests are split into slices, so an interactive call waits for at most one
+bulk slice instead of a whole sync.
+
+When a lane is full, submissions fail fast with `Overloaded` (429 plus a
+Retry-After estimate); interactive work that waited longer than its deadline
+before starting fails with 503 instead of running late. Work whose request
+was abandoned (see cancellation.py) is dropped without running.
+"""
+
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cancellation import Cancelled, current_token
+from profiling import profiled
+
+LANES = ("interactive", "bulk")
+
+
+class Overloaded(Exception):
+    """Work was rejected; `status_code` is 429 (queue full) or 503 (waited too long)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _WorkItem:
+    __slots__ = ("fn", "args", "context", "future", "enqueued_at", "deadline")
+
+    def __init__(self, fn: Callable, args: tuple, deadline: Optional[float]):
+        self.fn = fn
+        self.args = args
+        # Run in the submitter's context so per-request stage timings and profiling still apply
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.deadline = deadline
+
+
+class _LaneStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.dropped = 0
+        self.waits = deque(maxlen=1000)
+
+
+class ModelScheduler:
+    """Two bounded priority lanes and one worker thread for a single model"""
+
+    def __init__(self, name: str, interactive_capacity: int = 64, bulk_capacity: int = 256,
+                 interactive_max_wait: float = 10.0):
+        self.name = name
+        self.capacity = {"interactive": interactive_capacity, "bulk": bulk_capacity}
+        self.interactive_max_wait = interactive_max_wait
+        self._lanes = {lane: deque() for lane in LANES}
+        self._stats = {lane: _LaneStats() for lane in LANES}
+        self._cond = threading.Condition()
+        self._running: Optional[str] = None
+        # Smoothed seconds per work item, for Retry-After estimates
+        self._service_time = 0.05
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=f"model-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            for queue in self._lanes.values():
+                while queue:
+                    item = queue.popleft()
+                    if item.future.set_running_or_notify_cancel():
+                        item.future.set_exception(Overloaded(503, f"{self.name} scheduler stopped", 1))
+
+    def retry_after(self) -> int:
+        """Seconds until the queued work is expected to drain"""
+        queued = sum(len(lane) for lane in self._lanes.values()) + 1
+        return max(1, math.ceil(queued * self._service_time))
+
+    def submit_many(self, lane: str, calls: Sequence[tuple], block: bool = False) -> List[Future]:
+        """
+        Enqueue (fn, *args) calls on a lane, all or nothing.
+        Raises Overloaded when they do not fit, unless `block` waits for room.
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown lane '{lane}', expected one of {LANES}")
+        capacity = self.capacity[lane]
+        if len(calls) > capacity and not block:
+            self._stats[lane].rejected += 1
+            raise Overloaded(429, f"Request needs {len(calls)} {lane} slots, {self.name} queue holds {capacity}",
+                             self.retry_after())
+
+        if self._thread is None:
+            self.start()
+
+        deadline = time.monotonic() + self.interactive_max_wait if lane == "interactive" else None
+        items = [_WorkItem(call[0], call[1:], deadline) for call in calls]
+        queue = self._lanes[lane]
+        with self._cond:
+            if block:
+                # Large blocking submissions go in as room frees up
+                pending = list(items)
+                while pending:
+                    while len(queue) >= capacity and not self._stop:
+                        self._cond.wait()
+                    room = max(1, capacity - len(queue))
+                    queue.extend(pending[:room])
+                    del pending[:room]
+                    self._cond.notify_all()
+            else:
+                if len(queue) + len(items) > capacity:
+                    self._stats[lane].rejected += 1
+                    raise Overloaded(429, f"{self.name} {lane} queue is full", self.retry_after())
+                queue.extend(items)
+                self._cond.notify_all()
+            self._stats[lane].submitted += len(items)
+        return [item.future for item in items]
+
+    def submit(self, lane: str, fn: Callable, *args, block: bool = False) -> Future:
+        return self.submit_many(lane, [(fn, *args)], block)[0]
+
+    def _next(self):
+        with self._cond:
+            while not self._stop and not any(self._lanes.values()):
+                self._cond.wait()
+            if self._stop:
+                return None, None
+            lane = "interactive" if self._lanes["interactive"] else "bulk"
+            item = self._lanes[lane].popleft()
+            self._running = lane
+            # Wake blocked bulk submitters now that there is room
+            self._cond.notify_all()
+            return lane, item
+
+    def _run(self) -> None:
+        while True:
+            lane, item = self._next()
+            if item is None:
+                return
+            stats = self._stats[lane]
+            started = time.monotonic()
+            stats.waits.append(started - item.enqueued_at)
+
+            if not item.future.set_running_or_notify_cancel():
+                stats.dropped += 1
+                self._running = None
+                continue
+            token = item.context.run(current_token)
+            if token is not None and token.cancelled:
+                stats.dropped += 1
+                token.dropped += 1
+                item.future.set_exception(Cancelled(token.reason))
+                self._running = None
+                continue
+            if item.deadline is not None and started > item.deadline:
+                stats.expired += 1
+                item.future.set_exception(Overloaded(
+                    503, f"{self.name} {lane} work waited {started - item.enqueued_at:.1f}s before starting",
+                    self.retry_after()
+                ))
+                self._running = None
+                continue
+
+            try:
+                item.future.set_result(item.context.run(profiled, item.fn, *item.args))
+            except BaseException as e:
+                item.future.set_exception(e)
+            finally:
+                elapsed = time.monotonic() - started
+                self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+                stats.completed += 1
+                self._running = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            lanes = {}
+            for lane in LANES:
+                stats = self._stats[lane]
+                waits = np.array(stats.waits) * 1000 if stats.waits else np.zeros(1)
+                lanes[lane] = {
+                    "depth": len(self._lanes[lane]),
+                    "capacity": self.capacity[lane],
+                    "submitted": stats.submitted,
+                    "completed": stats.completed,
+                    "rejected": stats.rejected,
+                    "expired": stats.expired,
+                    "dropped": stats.dropped,
+                    "mean_wait_ms": float(waits.mean()),
+                    "p95_wait_ms": float(np.percentile(waits, 95)),
+                    "max_wait_ms": float(waits.max()),
+                }
+            return {"running": self._running, "service_time_ms": self._service_time * 1000, "lanes": lanes}
+
+
+class Scheduler:
+    """One ModelScheduler per model name"""
+
+    def __init__(self, names: Sequence[str], **limits):
+        self.models = {name: ModelScheduler(name, **limits) for name in names}
+
+    def start(self) -> None:
+        for model in self.models.values():
+            model.start()
+
+    def stop(self) -> None:
+        for model in self.models.values():
+            model.stop()
+
+    def submit(self, model: str, lane: str, fn: Callable, *args, block: bool = False) -> Future:
+        return self.models[model].submit(lane, fn, *args, block=block)
+
+    def call(self, model: str, lane: str, fn: Callable, *args) -> Any:
+        """Blocking call from a non-async thread (e.g. the background job worker)"""
+        return self.submit(model, lane, fn, *args, block=True).result()
+
+    async def run(self, model: str, lane: str, fn: Callable, *args) -> Any:
+        """Run `fn(*args)` on the model's worker and await its result"""
+        return await asyncio.wrap_future(self.submit(model, lane, fn, *args))
+
+    async def run_sliced(self, model: str, fn: Callable[[List], List], items: List, slice_size: int,
+                         *args) -> List:
+        """
+        Run `fn(slice, *args)` over bulk slices of `items` and concatenate the
+        results; interactive work is scheduled in between slices.
+        """
+        slices = [items[i:i + slice_size] for i in range(0, len(items), slice_size)] or [items]
+        futures = self.models[model].submit_many("bulk", [(fn, s, *args) for s in slices])
+        try:
+            results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        except BaseException:
+            # The request failed or was abandoned: slices still queued are dropped
+            dropped = sum(future.cancel() for future in futures)
+            token = current_token()
+            if token is not None:
+                token.dropped += dropped
+            raise
+        return [result for part in results for result in part]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: model.stats() for name, model in self.models.items()}
@@ -0,0 +1,238 @@
+"""
+Sentiment Head
+--------------
+A small classifier that predicts the sentiment model's negative / neutral /
+positive probabilities from an embedding model's sentence embedding, so one
+forward pass serves both the embedding and its sentiment.
+
+The head is distilled locally: the full sentiment model labels a corpus with
+its probabilities, and the head (softmax regression, or one ReLU hidden layer)
+is fitted to those soft labels on the same texts' embeddings. Part of the
+corpus is held out to report how often the head agrees with the full model.
+
+Heads are fitted on native-size embeddings, stored as .npz files (one per
+embedding model) and tagged with the embedding model's fingerprint, so a head
+is never applied to vectors from different weights.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Sentiment model outputs, in order
+SENTIMENT_LABELS = ("negative", "neutral", "positive")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class SentimentHead:
+    """Standardization plus dense layers (ReLU between them) ending in sentiment logits"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, layers: List[Tuple[np.ndarray, np.ndarray]],
+                 fingerprint: str = ""):
+        self.mean = mean.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        self.layers = [(weights.astype(np.float32), bias.astype(np.float32)) for weights, bias in layers]
+        self.fingerprint = fingerprint
+
+    @property
+    def source_dim(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    @property
+    def hidden(self) -> int:
+        return self.layers[0][0].shape[1] if len(self.layers) > 1 else 0
+
+    @property
+    def parameters(self) -> int:
+        return sum(weights.size + bias.size for weights, bias in self.layers)
+
+    def logits(self, embeddings: np.ndarray) -> np.ndarray:
+        x = (np.atleast_2d(np.asarray(embeddings, dtype=np.float32)) - self.mean) / self.scale
+        for i, (weights, bias) in enumerate(self.layers):
+            x = x @ weights + bias
+            if i < len(self.layers) - 1:
+                x = np.maximum(x, 0)
+        return x
+
+    def predict(self, embeddings: np.ndarray) -> np.ndarray:
+        """(n, 3) probabilities in SENTIMENT_LABELS order"""
+        return _softmax(self.logits(embeddings))
+
+    def describe(self, embeddings: np.ndarray) -> List[Dict[str, float]]:
+        """{negative, neutral, positive} per embedding"""
+        return [
+            {label: float(p) for label, p in zip(SENTIMENT_LABELS, row)}
+            for row in self.predict(embeddings)
+        ]
+
+    def save(self, path: str) -> None:
+        arrays = {"mean": self.mean, "scale": self.scale, "fingerprint": np.array(self.fingerprint)}
+        for i, (weights, bias) in enumerate(self.layers):
+            arrays[f"weights_{i}"] = weights
+            arrays[f"bias_{i}"] = bias
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "SentimentHead":
+        with np.load(path) as data:
+            count = sum(1 for key in data.files if key.startswith("weights_"))
+            layers = [(data[f"weights_{i}"], data[f"bias_{i}"]) for i in range(count)]
+            return cls(data["mean"], data["scale"], layers, str(data["fingerprint"]))
+
+
+def _train(x: np.ndarray, targets: np.ndarray, hidden: int, epochs: int, learning_rate: float,
+           l2: float, rng: np.random.Generator) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Full-batch Adam on cross-entropy against the soft labels"""
+    sizes = [x.shape[1]] + ([hidden] if hidden else []) + [targets.shape[1]]
+    layers = [
+        (rng.normal(0, np.sqrt(2.0 / fan_in), (fan_in, fan_out)), np.zeros(fan_out))
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:])
+    ]
+    params = [p for layer in layers for p in layer]
+    moments = [np.zeros_like(p) for p in params]
+    velocities = [np.zeros_like(p) for p in params]
+    beta1, beta2 = 0.9, 0.999
+
+    for step in range(1, epochs + 1):
+        activations = [x]
+        for i, (weights, bias) in enumerate(layers):
+            out = activations[-1] @ weights + bias
+            activations.append(np.maximum(out, 0) if i < len(layers) - 1 else out)
+
+        grad = (_softmax(activations[-1]) - targets) / len(x)
+        grads = []
+        for i in range(len(layers) - 1, -1, -1):
+            weights, _ = layers[i]
+            grads[:0] = [activations[i].T @ grad + l2 * weights, grad.sum(axis=0)]
+            if i:
+                grad = (grad @ weights.T) * (activations[i] > 0)
+
+        for j, (p, g) in enumerate(zip(params, grads)):
+            moments[j] = beta1 * moments[j] + (1 - beta1) * g
+            velocities[j] = beta2 * velocities[j] + (1 - beta2) * g * g
+            m = moments[j] / (1 - beta1 ** step)
+            v = velocities[j] / (1 - beta2 ** step)
+            p -= learning_rate * m / (np.sqrt(v) + 1e-8)
+
+    return layers
+
+
+def evaluate_sentiment_head(head: SentimentHead, embeddings: np.ndarray, targets: np.ndarray) -> Dict:
+    """
+    Agreement of the head with the full model's probabilities: how often the
+    top label matches (overall and per full-model label), the probability
+    error, and the confusion matrix (full-model label -> head label).
+    """
+    targets = np.asarray(targets, dtype=np.float32)
+    predicted = head.predict(embeddings)
+    expected = targets.argmax(axis=1)
+    labels = predicted.argmax(axis=1)
+
+    confusion = np.zeros((len(SENTIMENT_LABELS), len(SENTIMENT_LABELS)), dtype=np.int64)
+    np.add.at(confusion, (expected, labels), 1)
+    error = np.abs(predicted - targets)
+
+    return {
+        "samples": len(targets),
+        "agreement": float((expected == labels).mean()) if len(targets) else None,
+        "per_label": {
+            label: {
+                "samples": int(confusion[i].sum()),
+                "agreement": float(confusion[i, i] / confusion[i].sum()) if confusion[i].sum() else None,
+            }
+            for i, label in enumerate(SENTIMENT_LABELS)
+        },
+        "mean_abs_probability_error": float(error.mean()) if len(targets) else None,
+        "max_abs_probability_error": float(error.max()) if len(targets) else None,
+        "confusion": {
+            label: dict(zip(SENTIMENT_LABELS, map(int, confusion[i])))
+            for i, label in enumerate(SENTIMENT_LABELS)
+        },
+    }
+
+
+def fit_sentiment_head(embeddings: np.ndarray, targets: np.ndarray, hidden: int = 0, holdout: float = 0.2,
+                       epochs: int = 300, learning_rate: float = 0.01, l2: float = 1e-4, seed: int = 0,
+                       fingerprint: str = "") -> Tuple[SentimentHead, Dict]:
+    """
+    Fit a head to the full model's (n, 3) probabilities on (n, dim) embeddings.
+    Returns the head, fitted on all but the `holdout` fraction, and a report
+    with its agreement on the fitted and the held-out texts.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    if embeddings.ndim != 2 or targets.shape != (len(embeddings), len(SENTIMENT_LABELS)):
+        raise ValueError(f"Need (n, dim) embeddings and (n, {len(SENTIMENT_LABELS)}) probabilities")
+    if not 0 <= holdout < 1:
+        raise ValueError("holdout must be in [0, 1)")
+    if hidden < 0 or epochs < 1:
+        raise ValueError("hidden must be >= 0 and epochs >= 1")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(embeddings))
+    held = order[:int(len(order) * holdout)]
+    fitted = order[len(held):]
+    if len(fitted) < 2:
+        raise ValueError(f"Need at least 2 texts to fit on, got {len(fitted)}")
+
+    # Sentence embeddings use a small range per dimension; standardizing keeps one learning rate for all
+    mean = embeddings[fitted].mean(axis=0)
+    scale = np.maximum(embeddings[fitted].std(axis=0), 1e-6)
+    layers = _train((embeddings[fitted] - mean) / scale, targets[fitted], hidden, epochs, learning_rate, l2, rng)
+    head = SentimentHead(mean, scale, layers, fingerprint)
+
+    report = {
+        "source_dim": head.source_dim,
+        "hidden": head.hidden,
+        "parameters": head.parameters,
+        "epochs": epochs,
+        "fitted": evaluate_sentiment_head(head, embeddings[fitted], targets[fitted]),
+        "holdout": evaluate_sentiment_head(head, embeddings[held], targets[held]),
+    }
+    return head, report
+
+
+class SentimentHeadRegistry:
+    """Loads and caches fitted heads from a directory of .npz files, one per embedding model"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache: Dict[str, SentimentHead] = {}
+
+    def _path(self, model_key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{model_key}.{extension}")
+
+    def get(self, model_key: str) -> Optional[SentimentHead]:
+        if model_key not in self._cache:
+            path = self._path(model_key, "npz")
+            if not os.path.exists(path):
+                return None
+            self._cache[model_key] = SentimentHead.load(path)
+        return self._cache[model_key]
+
+    def save(self, model_key: str, head: SentimentHead, report: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        head.save(self._path(model_key, "npz"))
+        with open(self._path(model_key, "json"), "w") as f:
+            json.dump(report, f, indent=2)
+        self._cache[model_key] = head
+
+    def list(self) -> List[Dict]:
+        """Reports of every persisted head"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        reports = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(self.directory, filename)) as f:
+                report = json.load(f)
+            reports.append({"model": filename[:-len(".json")], "report": report})
+        return reports
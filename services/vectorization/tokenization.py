@@ -0,0 +1,125 @@
+"""
+Token Cache
+-----------
+Caches token-id sequences per tokenizer by text hash, so texts seen before
+(short metadata strings, repeated moods/genres) skip tokenization entirely.
+
+Misses are encoded in a single batch call, which fast (Rust) tokenizers spread
+across threads natively. `batches()` yields padded, length-sorted model inputs
+from a background thread, so tokenizing the next batch overlaps the forward
+pass of the current one.
+"""
+
+import queue
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import torch
+
+from embedding_cache import text_key
+from profiling import stage
+
+_DONE = object()
+
+
+class TokenCache:
+    """LRU cache of token ids for one tokenizer"""
+
+    def __init__(self, tokenizer, max_entries: int = 50000, max_length: int = 512):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def encode(self, texts: Sequence[str]) -> List[Tuple[int, ...]]:
+        """Token ids (with special tokens, truncated to max_length) for each text"""
+        keys = [text_key(text) for text in texts]
+        found: Dict[str, Tuple[int, ...]] = {}
+        with self._lock:
+            for key in keys:
+                ids = self._entries.get(key)
+                if ids is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = ids
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            encoded = self.tokenizer(list(missing.values()), truncation=True, max_length=self.max_length)
+            found.update(zip(missing.keys(), map(tuple, encoded["input_ids"])))
+            with self._lock:
+                for key in missing:
+                    self._entries[key] = found[key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return [found[key] for key in keys]
+
+    def collate(self, token_ids: Sequence[Sequence[int]]):
+        """Pad token-id sequences into model inputs (input_ids + attention_mask tensors)"""
+        width = max((len(ids) for ids in token_ids), default=0)
+        input_ids = torch.full((len(token_ids), width), self.tokenizer.pad_token_id or 0, dtype=torch.long)
+        attention_mask = torch.zeros((len(token_ids), width), dtype=torch.long)
+        left = self.tokenizer.padding_side == "left"
+        for row, ids in enumerate(token_ids):
+            columns = slice(width - len(ids), width) if left else slice(0, len(ids))
+            input_ids[row, columns] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, columns] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    def __call__(self, texts: Sequence[str]):
+        """Cached equivalent of `tokenizer(texts, padding=True, truncation=True, return_tensors="pt")`"""
+        return self.collate(self.encode(texts))
+
+    def batches(self, texts: Sequence[str], batch_size: int, prefetch: int = 2,
+                window: int = 256) -> Iterator[Tuple[List[int], Dict]]:
+        """
+        Yield (positions, inputs) for `texts` in batches of similar length.
+        Texts are tokenized a window at a time and padded ahead on a background
+        thread; time spent waiting for them is recorded as the `tokenize` stage.
+        """
+        if not texts:
+            return
+
+        buffer: "queue.Queue" = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for offset in range(0, len(texts), window):
+                    token_ids = self.encode(texts[offset:offset + window])
+                    order = sorted(range(len(token_ids)), key=lambda i: len(token_ids[i]))
+                    for start in range(0, len(order), batch_size):
+                        if stop.is_set():
+                            return
+                        rows = order[start:start + batch_size]
+                        positions = [offset + i for i in rows]
+                        buffer.put((positions, self.collate([token_ids[i] for i in rows])))
+            except Exception as e:
+                buffer.put(e)
+            buffer.put(_DONE)
+
+        threading.Thread(target=produce, name="tokenizer-prefetch", daemon=True).start()
+        try:
+            while True:
+                with stage("tokenize"):
+                    item = buffer.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full buffer
+            while not buffer.empty():
+                buffer.get_nowait()
@@ -0,0 +1,171 @@
+"""
+Traffic Capture
+---------------
+Compact log of the requests the API receives, for replaying production-shaped
+load against a local instance (see replay.py).
+
+Captures are JSON lines under DATA_DIR/captures: a header line, then one
+line per request with its offset from the start of the capture, method,
+path and route template, model type, status and duration. Request bodies
+are kept with every text replaced by `{"#": <hash>, "n": <length>}`, so
+repetition (same hash) and length skew survive without storing any text;
+raw bodies are only kept when payloads are switched on.
+
+Enumerated fields (model_type, pooling, ...), item ids and dict keys
+(hybrid category names, weights) are kept as they are.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+CAPTURE_VERSION = 1
+
+# String fields that are parameters or identifiers rather than text. Ids stay
+# as sent, like the ids in request paths, so replayed writes and reads match up
+KEPT_FIELDS = {"model_type", "pooling", "mode", "head", "status", "item_id", "item_ids", "playlist_id", "job_id"}
+
+# Vocabulary for replayed stand-in texts
+WORDS = (
+    "love heart night time life baby feel song music sound beat rhythm vocal guitar piano synth drums "
+    "bass track album artist genre mood theme happy sad calm energetic dark bright chill dance party "
+    "summer rain dream memory lost home road city lights fire slow fast soft loud sweet pain hope fear"
+).split()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def redact(value: Any, field: Optional[str] = None) -> Any:
+    """Body with every text string replaced by its hash and length"""
+    if isinstance(value, str):
+        return value if field in KEPT_FIELDS else {"#": text_hash(value), "n": len(value)}
+    if isinstance(value, dict):
+        return {key: redact(item, key if field is None or key in KEPT_FIELDS else field) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, field) for item in value]
+    return value
+
+
+def stand_in_text(digest: str, length: int) -> str:
+    """Deterministic text of `length` characters for a hash: equal hashes replay as equal texts"""
+    rng = random.Random(digest)
+    words: List[str] = []
+    size = -1
+    while size < length:
+        words.append(rng.choice(WORDS))
+        size += len(words[-1]) + 1
+    return " ".join(words)[:length]
+
+
+def restore(value: Any) -> Any:
+    """Inverse of `redact` up to the texts themselves, which become stand-ins"""
+    if isinstance(value, dict):
+        if set(value) == {"#", "n"}:
+            return stand_in_text(value["#"], value["n"])
+        return {key: restore(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [restore(item) for item in value]
+    return value
+
+
+class TrafficCapture:
+    """Appends request records to a capture file while switched on"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self.include_payloads = False
+        self.requests = 0
+        self._started = 0.0
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def start(self, include_payloads: bool = False) -> Dict:
+        """Begin a new capture file, closing any capture in progress"""
+        self.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() // 10**6 % 1000:03d}"
+        with self._lock:
+            # Exclusive create: two captures started in the same millisecond get separate files
+            suffix = 0
+            while True:
+                path = os.path.join(self.directory, f"capture-{stamp}{f'-{suffix}' if suffix else ''}.jsonl")
+                try:
+                    self._file = open(path, "x", buffering=1)
+                    break
+                except FileExistsError:
+                    suffix += 1
+            self.path = path
+            self.include_payloads = include_payloads
+            self.requests = 0
+            self._started = time.monotonic()
+            self._write({"capture": CAPTURE_VERSION, "started": time.time(), "payloads": include_payloads})
+        print(f"Capturing traffic to {path}")
+        return self.status()
+
+    def stop(self) -> Dict:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "active": self.active,
+            "path": self.path,
+            "include_payloads": self.include_payloads,
+            "requests": self.requests,
+            "directory": self.directory,
+        }
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def offset(self) -> float:
+        """Seconds since the capture started, taken when a request arrives"""
+        return time.monotonic() - self._started
+
+    def record(self, offset: float, method: str, path: str, route: Optional[str], body: bytes, status: int,
+               seconds: float) -> None:
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+
+        record = {
+            "t": round(offset, 4),
+            "method": method,
+            "path": path,
+            "route": route,  # Path template, e.g. /vectors/{item_id}
+            "model": payload.get("model_type") if isinstance(payload, dict) else None,
+            "status": status,
+            "ms": round(seconds * 1000, 2),
+            "body": payload if self.include_payloads else redact(payload),
+        }
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(record)
+            self.requests += 1
+
+
+def read_capture(path: str) -> Dict:
+    """{"header": ..., "requests": [...]} of a capture file, requests in arrival order"""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("capture") != CAPTURE_VERSION:
+        raise ValueError(f"{path} is not a version {CAPTURE_VERSION} capture")
+    # Only the first header counts; any later one is skipped rather than read as a request
+    requests = [line for line in lines[1:] if "capture" not in line]
+    return {"header": lines[0], "requests": sorted(requests, key=lambda r: r["t"])}
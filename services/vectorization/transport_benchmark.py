@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Transport Benchmark
+-------------------
+Compares per-song embedding traffic over HTTP/JSON and gRPC against a running
+server (loopback by default), reporting p50/p95 latency, throughput and
+payload bytes on the wire (message bodies only, no headers or framing).
+
+Modes:
+- http:        one POST /embed per text over a keep-alive session
+- http-batch:  POST /embed/batch in --batch_size chunks
+- grpc:        one unary Embed call per text
+- grpc-stream: all texts over one EmbedStream, --concurrency requests in flight
+
+Usage:
+    VECTORIZATION_GRPC_PORT=50051 python api.py
+    python transport_benchmark.py [--texts 500] [--modes http grpc grpc-stream]
+"""
+
+import argparse
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import requests
+
+from grpc_server import load_protos, unpack
+
+MODES = ("http", "http-batch", "grpc", "grpc-stream")
+
+
+def sample_texts(count: int) -> List[str]:
+    moods = ["melancholic", "euphoric", "calm", "aggressive", "nostalgic", "dreamy", "dark", "playful"]
+    genres = ["indie folk", "synthwave", "jazz", "drum and bass", "shoegaze", "hip hop", "ambient", "post-punk"]
+    return [
+        f"Track {i}: a {moods[i % len(moods)]} {genres[(i // len(moods)) % len(genres)]} song "
+        f"about {['rain', 'summer nights', 'leaving home', 'city lights'][i % 4]} (take {i})"
+        for i in range(count)
+    ]
+
+
+def summarize(latencies: List[float], elapsed: float, count: int, sent: int, received: int) -> Dict[str, Any]:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "texts": count,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "throughput_per_s": count / elapsed if elapsed > 0 else 0.0,
+        "request_bytes": sent,
+        "response_bytes": received,
+        "bytes_per_text": (sent + received) / max(count, 1),
+    }
+
+
+def bench_http(url: str, texts: List[str], model_type: str) -> Dict[str, Any]:
+    session = requests.Session()
+    latencies, sent, received = [], 0, 0
+    started = time.perf_counter()
+    for text in texts:
+        body = json.dumps({"text": text, "model_type": model_type})
+        t0 = time.perf_counter()
+        response = session.post(f"{url}/embed", data=body, headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+        sent += len(body)
+        received += len(response.content)
+    return summarize(latencies, time.perf_counter() - started, len(texts), sent, received)
+
+
+def bench_http_batch(url: str, texts: List[str], model_type: str, batch_size: int) -> Dict[str, Any]:
+    session = requests.Session()
+    latencies, sent, received = [], 0, 0
+    started = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        chunk = texts[i:i + batch_size]
+        body = json.dumps({"texts": chunk, "model_type": model_type})
+        t0 = time.perf_counter()
+        response = session.post(f"{url}/embed/batch", data=body, headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        # Every text in the chunk waited for the whole batch
+        latencies.extend([time.perf_counter() - t0] * len(chunk))
+        sent += len(body)
+        received += len(response.content)
+    return summarize(latencies, time.perf_counter() - started, len(texts), sent, received)
+
+
+def bench_grpc(stub, pb, texts: List[str], model_type: str) -> Dict[str, Any]:
+    latencies, sent, received = [], 0, 0
+    started = time.perf_counter()
+    for i, text in enumerate(texts):
+        request = pb.EmbedRequest(request_id=str(i), text=text, model_type=model_type)
+        t0 = time.perf_counter()
+        response = stub.Embed(request)
+        latencies.append(time.perf_counter() - t0)
+        sent += request.ByteSize()
+        received += response.ByteSize()
+    return summarize(latencies, time.perf_counter() - started, len(texts), sent, received)
+
+
+def bench_grpc_stream(stub, pb, texts: List[str], model_type: str, concurrency: int) -> Dict[str, Any]:
+    # Bounded in-flight window, like a client pipelining songs over one stream
+    window = threading.Semaphore(concurrency)
+    sent_at: Dict[str, float] = {}
+    sizes = {"sent": 0}
+
+    def requests_iter():
+        for i, text in enumerate(texts):
+            window.acquire()
+            request = pb.EmbedRequest(request_id=str(i), text=text, model_type=model_type)
+            sizes["sent"] += request.ByteSize()
+            sent_at[request.request_id] = time.perf_counter()
+            yield request
+
+    latencies, received = [], 0
+    started = time.perf_counter()
+    for response in stub.EmbedStream(requests_iter()):
+        latencies.append(time.perf_counter() - sent_at[response.request_id])
+        received += response.ByteSize()
+        if response.error:
+            raise RuntimeError(f"Request {response.request_id} failed: {response.error}")
+        window.release()
+    return summarize(latencies, time.perf_counter() - started, len(texts), sizes["sent"], received)
+
+
+def check_agreement(url: str, stub, pb, text: str, model_type: str) -> float:
+    """Max absolute difference between the HTTP and gRPC embedding of one text"""
+    http = np.array(requests.post(f"{url}/embed", json={"text": text, "model_type": model_type}).json()["embedding"])
+    grpc_vector = unpack(stub.Embed(pb.EmbedRequest(text=text, model_type=model_type)).embedding)
+    return float(np.abs(http - grpc_vector).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTTP and gRPC transports for embedding calls")
+    parser.add_argument("--http_url", default="http://127.0.0.1:8000")
+    parser.add_argument("--grpc_target", default="127.0.0.1:50051")
+    parser.add_argument("--texts", type=int, default=500, help="Number of texts to embed per mode")
+    parser.add_argument("--model_type", default="general")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--batch_size", type=int, default=32, help="Chunk size for http-batch")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight for grpc-stream")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    warmup = sample_texts(args.warmup)
+
+    stub = pb = None
+    if any(mode.startswith("grpc") for mode in args.modes):
+        import grpc
+
+        pb, services = load_protos()
+        channel = grpc.insecure_channel(args.grpc_target)
+        stub = services.VectorizationStub(channel)
+
+    results = {}
+    for mode in args.modes:
+        if mode == "http":
+            run = lambda batch: bench_http(args.http_url, batch, args.model_type)
+        elif mode == "http-batch":
+            run = lambda batch: bench_http_batch(args.http_url, batch, args.model_type, args.batch_size)
+        elif mode == "grpc":
+            run = lambda batch: bench_grpc(stub, pb, batch, args.model_type)
+        else:
+            run = lambda batch: bench_grpc_stream(stub, pb, batch, args.model_type, args.concurrency)
+        if warmup:
+            run(warmup)
+        results[mode] = run(texts)
+        r = results[mode]
+        print(f"{mode:12s} p50 {r['p50_ms']:7.2f}ms  p95 {r['p95_ms']:7.2f}ms  "
+              f"{r['throughput_per_s']:8.1f} texts/s  {r['bytes_per_text']:8.0f} B/text")
+
+    if stub is not None and "http" in args.modes:
+        results["max_abs_diff_http_vs_grpc"] = check_agreement(args.http_url, stub, pb, texts[0], args.model_type)
+        print(f"Max |HTTP - gRPC| embedding difference: {results['max_abs_diff_http_vs_grpc']:.2e}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
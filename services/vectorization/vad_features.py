@@ -0,0 +1,70 @@
+"""
+Valence / Arousal / Dominance Features
+--------------------------------------
+Emotional-dimension features computed from an embedding that already exists.
+
+Each pole of each dimension in EMOTIONAL_DIMENSIONS (valence: positive vs
+negative, ...) gets an anchor matrix of its keyword embeddings, built once per
+model. A pole's score is the best cosine similarity between an embedding and
+the pole's keywords, as in enhanced_mood_matching.analyze_mood_dimensions, and
+a dimension's feature is the difference between its two poles, in [-1, 1].
+Scoring a batch is one matrix product, with no extra forward passes.
+"""
+
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+# Define emotional dimensions for a more nuanced understanding
+EMOTIONAL_DIMENSIONS = {
+    "valence": {  # Positive vs. Negative
+        "positive": ["happy", "joyful", "uplifting", "optimistic", "cheerful", "hopeful", "content", "satisfied", "peaceful"],
+        "negative": ["sad", "melancholy", "depressing", "gloomy", "angry", "frustrated", "anxious", "fearful", "resentful"]
+    },
+    "arousal": {  # High energy vs. Low energy
+        "high": ["energetic", "exciting", "intense", "powerful", "dynamic", "lively", "passionate", "vigorous"],
+        "low": ["calm", "relaxing", "soothing", "gentle", "mellow", "tranquil", "serene", "peaceful"]
+    },
+    "dominance": {  # Empowering vs. Vulnerable
+        "empowering": ["confident", "strong", "empowering", "bold", "assertive", "determined", "resilient"],
+        "vulnerable": ["vulnerable", "sensitive", "intimate", "delicate", "fragile", "uncertain", "insecure"]
+    }
+}
+
+FEATURE_NAMES = tuple(EMOTIONAL_DIMENSIONS)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class VADAnchors:
+    """Keyword anchor matrices for one embedding model"""
+
+    def __init__(self, embed_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+                 dimensions: Dict[str, Dict[str, List[str]]] = EMOTIONAL_DIMENSIONS):
+        self.dimensions = dimensions
+        self.poles = [(dimension, pole) for dimension, poles in dimensions.items() for pole in poles]
+        keywords = [keyword for poles in dimensions.values() for words in poles.values() for keyword in words]
+        # Keywords are grouped by pole, so a pole's maximum is one reduceat segment
+        sizes = [len(words) for poles in dimensions.values() for words in poles.values()]
+        self._starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.matrix = _normalize(np.asarray(embed_fn(keywords), dtype=np.float32))
+
+    def pole_scores(self, embeddings: np.ndarray) -> np.ndarray:
+        """(n, poles) best keyword cosine per pole; zero embeddings score 0"""
+        similarities = _normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32))) @ self.matrix.T
+        return np.maximum.reduceat(similarities, self._starts, axis=1)
+
+    def features(self, embeddings: np.ndarray) -> np.ndarray:
+        """(n, dimensions) first pole minus second pole, e.g. valence = positive - negative"""
+        scores = self.pole_scores(embeddings)
+        return scores[:, 0::2] - scores[:, 1::2]
+
+    def describe(self, embeddings: np.ndarray) -> List[Dict[str, float]]:
+        """{valence, arousal, dominance} per embedding"""
+        return [
+            {name: float(value) for name, value in zip(self.dimensions, row)}
+            for row in self.features(embeddings)
+        ]
@@ -0,0 +1,360 @@
+"""
+Vector Store
+------------
+SQLite-backed storage for item embeddings (songs, playlists), keyed by item id
+and model, so vectors are embedded once and reused by everything built on top
+of them (quantization codecs, playlist profiles, ...).
+
+Embeddings are stored as raw float32 blobs, tagged with the fingerprint of the
+model setup that produced them (see model_registry.model_fingerprint) so stale
+vectors can be found and re-embedded after a model change.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+VAD_COLUMNS = ("valence", "arousal", "dominance")
+
+
+def to_blob(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class VectorStore:
+    """Embeddings per (item_id, model) in a single SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                item_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                text TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (item_id, model)
+            );
+            CREATE TABLE IF NOT EXISTS pq_codes (
+                item_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                codes BLOB NOT NULL,
+                PRIMARY KEY (item_id, model)
+            );
+            CREATE TABLE IF NOT EXISTS components (
+                item_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                component TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (item_id, model, component)
+            );
+            CREATE TABLE IF NOT EXISTS vad_features (
+                item_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                valence REAL NOT NULL,
+                arousal REAL NOT NULL,
+                dominance REAL NOT NULL,
+                PRIMARY KEY (item_id, model)
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                fingerprint TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        # Stores created before fingerprints get the column; their rows stay NULL (unknown)
+        for table in ("vectors", "components"):
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if "fingerprint" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN fingerprint TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_fingerprint ON vectors (model, fingerprint)")
+        self._conn.commit()
+
+    # -------------------------------------------------------------------------
+    # Float embeddings
+    # -------------------------------------------------------------------------
+
+    def upsert_many(self, model: str, items: Iterable[Tuple[str, np.ndarray, Optional[str]]],
+                    fingerprint: Optional[str] = None) -> int:
+        """Insert or replace (item_id, embedding, source_text) rows for a model"""
+        now = time.time()
+        rows = [
+            (item_id, model, len(embedding), to_blob(embedding), text, fingerprint, now)
+            for item_id, embedding, text in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (item_id, model, dim, embedding, text, fingerprint, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def upsert(self, item_id: str, model: str, embedding: np.ndarray, text: Optional[str] = None,
+               fingerprint: Optional[str] = None) -> None:
+        self.upsert_many(model, [(item_id, embedding, text)], fingerprint)
+
+    def get(self, item_id: str, model: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding FROM vectors WHERE item_id = ? AND model = ?", (item_id, model)
+            ).fetchone()
+        return from_blob(row[0]) if row else None
+
+    def get_many(self, item_ids: List[str], model: str) -> Dict[str, np.ndarray]:
+        """Embeddings for the given ids; missing ids are left out"""
+        result: Dict[str, np.ndarray] = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT item_id, embedding FROM vectors WHERE model = ? AND item_id IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+            result.update((item_id, from_blob(blob)) for item_id, blob in rows)
+        return result
+
+    def delete(self, item_id: str, model: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM vectors WHERE item_id = ? AND model = ?", (item_id, model)
+            )
+            self._conn.execute("DELETE FROM pq_codes WHERE item_id = ? AND model = ?", (item_id, model))
+            self._conn.execute("DELETE FROM components WHERE item_id = ? AND model = ?", (item_id, model))
+            self._conn.execute("DELETE FROM vad_features WHERE item_id = ? AND model = ?", (item_id, model))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def count(self, model: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors WHERE model = ?", (model,)).fetchone()[0]
+
+    def load_matrix(self, model: str) -> Tuple[List[str], np.ndarray]:
+        """All stored ids and embeddings for a model as an (n, dim) matrix"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, embedding FROM vectors WHERE model = ? ORDER BY item_id", (model,)
+            ).fetchall()
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return [r[0] for r in rows], np.stack([from_blob(r[1]) for r in rows])
+
+    def load_records(self, model: str) -> Tuple[List[str], np.ndarray, List[Optional[str]], List[Optional[str]]]:
+        """Like load_matrix, plus each vector's source text and fingerprint (for snapshots)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, embedding, text, fingerprint FROM vectors WHERE model = ? ORDER BY item_id", (model,)
+            ).fetchall()
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.float32), [], []
+        if len({len(r[1]) for r in rows}) > 1:
+            raise ValueError(f"Stored '{model}' vectors have different dimensions")
+        return ([r[0] for r in rows], np.stack([from_blob(r[1]) for r in rows]),
+                [r[2] for r in rows], [r[3] for r in rows])
+
+    # -------------------------------------------------------------------------
+    # Model fingerprints
+    # -------------------------------------------------------------------------
+
+    def register_fingerprint(self, model: str, spec: Dict) -> None:
+        """Remember what a fingerprint stands for, so old ones stay readable after a model change"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO fingerprints (fingerprint, model, spec, created_at) VALUES (?, ?, ?, ?)",
+                (spec["fingerprint"], model, json.dumps(spec), time.time())
+            )
+            self._conn.commit()
+
+    def fingerprint_specs(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT fingerprint, spec FROM fingerprints").fetchall()
+        return {fingerprint: json.loads(spec) for fingerprint, spec in rows}
+
+    def fingerprint_counts(self, model: str) -> List[Dict]:
+        """Stored vectors per fingerprint (None = unknown), and how many of them kept their source text"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fingerprint, COUNT(*), COUNT(text) FROM vectors WHERE model = ? "
+                "GROUP BY fingerprint ORDER BY COUNT(*) DESC", (model,)
+            ).fetchall()
+        return [{"fingerprint": fingerprint, "count": count, "with_text": with_text}
+                for fingerprint, count, with_text in rows]
+
+    def get_fingerprints(self, item_ids: List[str], model: str) -> Dict[str, Optional[str]]:
+        result: Dict[str, Optional[str]] = {}
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT item_id, fingerprint FROM vectors WHERE model = ? AND item_id IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+            result.update(rows)
+        return result
+
+    def stale_items(self, model: str, fingerprint: str, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """(item_id, source_text) of vectors not produced by `fingerprint` that can be re-embedded"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT item_id, text FROM vectors WHERE model = ? AND text IS NOT NULL "
+                "AND (fingerprint IS NULL OR fingerprint != ?) ORDER BY item_id LIMIT ?",
+                (model, fingerprint, -1 if limit is None else limit)
+            ).fetchall()
+
+    # -------------------------------------------------------------------------
+    # Valence / arousal / dominance features
+    # -------------------------------------------------------------------------
+
+    def set_vad(self, model: str, item_ids: List[str], features: np.ndarray) -> None:
+        """Store (n, 3) valence/arousal/dominance rows next to the items' vectors"""
+        rows = [(item_id, model, *map(float, row)) for item_id, row in zip(item_ids, features)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vad_features (item_id, model, valence, arousal, dominance) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get_vad(self, item_ids: List[str], model: str) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT item_id, valence, arousal, dominance FROM vad_features "
+                    f"WHERE model = ? AND item_id IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+            result.update((r[0], dict(zip(VAD_COLUMNS, r[1:]))) for r in rows)
+        return result
+
+    def filter_vad(self, model: str, ranges: Dict[str, Tuple[float, float]],
+                   limit: Optional[int] = None) -> List[Dict]:
+        """Items whose features fall inside every inclusive [low, high] range, e.g. {"arousal": (0.1, 1)}"""
+        unknown = [name for name in ranges if name not in VAD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown feature '{unknown[0]}', expected one of {', '.join(VAD_COLUMNS)}")
+        clauses = "".join(f" AND {name} BETWEEN ? AND ?" for name in ranges)
+        bounds = [bound for low, high in ranges.values() for bound in (low, high)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT item_id, valence, arousal, dominance FROM vad_features WHERE model = ?{clauses} "
+                "ORDER BY item_id LIMIT ?",
+                (model, *bounds, -1 if limit is None else limit)
+            ).fetchall()
+        return [{"item_id": r[0], **dict(zip(VAD_COLUMNS, r[1:]))} for r in rows]
+
+    # -------------------------------------------------------------------------
+    # Product-quantization codes
+    # -------------------------------------------------------------------------
+
+    def set_codes(self, model: str, item_ids: List[str], codes: np.ndarray) -> None:
+        rows = [(item_id, model, row.tobytes()) for item_id, row in zip(item_ids, codes)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pq_codes (item_id, model, codes) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def clear_codes(self, model: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pq_codes WHERE model = ?", (model,))
+            self._conn.commit()
+
+    def load_codes(self, model: str) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, codes FROM pq_codes WHERE model = ? ORDER BY item_id", (model,)
+            ).fetchall()
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.uint8)
+        return [r[0] for r in rows], np.stack([np.frombuffer(r[1], dtype=np.uint8) for r in rows])
+
+    # -------------------------------------------------------------------------
+    # Hybrid component embeddings
+    # -------------------------------------------------------------------------
+
+    def set_components(self, model: str, items: Iterable[Tuple[str, Dict[str, np.ndarray]]],
+                       fingerprint: Optional[str] = None) -> int:
+        """Replace the per-category component embeddings of each (item_id, {category: vector})"""
+        now = time.time()
+        items = list(items)
+        rows = [
+            (item_id, model, name, to_blob(vector), fingerprint, now)
+            for item_id, components in items
+            for name, vector in components.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM components WHERE item_id = ? AND model = ?", [(item_id, model) for item_id, _ in items]
+            )
+            self._conn.executemany(
+                "INSERT INTO components (item_id, model, component, embedding, fingerprint, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(items)
+
+    def items_with_components(self, model: str, item_ids: List[str]) -> Set[str]:
+        """The given ids that have stored component embeddings"""
+        found: Set[str] = set()
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT item_id FROM components WHERE model = ? AND item_id IN ({placeholders})",
+                    (model, *chunk)
+                ))
+        return found
+
+    def load_components(self, model: str, item_ids: Optional[List[str]] = None,
+                        fingerprint: Optional[str] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        {item_id: {category: vector}} for the given ids (all items when None);
+        with `fingerprint`, components embedded by other model versions are left out
+        """
+        if item_ids is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT item_id, component, embedding, fingerprint FROM components WHERE model = ? "
+                    "ORDER BY item_id", (model,)
+                ).fetchall()
+        else:
+            rows = []
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                with self._lock:
+                    rows.extend(self._conn.execute(
+                        "SELECT item_id, component, embedding, fingerprint FROM components "
+                        f"WHERE model = ? AND item_id IN ({placeholders})",
+                        (model, *chunk)
+                    ).fetchall())
+
+        result: Dict[str, Dict[str, np.ndarray]] = {}
+        for item_id, name, blob, row_fingerprint in rows:
+            if fingerprint is None or row_fingerprint == fingerprint:
+                result.setdefault(item_id, {})[name] = from_blob(blob)
+        return result
@@ -42,7 +42,11 @@ export interface VectorizationService {
 	// Generic text embedding
 	embed(text: string, model?: ModelType): Promise<number[]>
 	embedBatch(texts: string[], model?: ModelType): Promise<number[][]>
-	embedHybrid(text: VectorizationText, weights?: EmbeddingWeights): Promise<number[]>
+	embedHybrid(
+		text: VectorizationText,
+		weights?: EmbeddingWeights,
+		itemId?: string
+	): Promise<number[]>
 
 	// Sentiment analysis
 	getSentimentScores(text: string): Promise<SentimentScore>
@@ -87,8 +91,8 @@ export class DefaultVectorizationService implements VectorizationService {
 			// Extract text from song analysis
 			const text = extractSongText(song)
 
-			// Get hybrid embedding
-			const embedding = await this.embedHybrid(text)
+			// Get hybrid embedding (components are kept server-side for re-weighting)
+			const embedding = await this.embedHybrid(text, DEFAULT_WEIGHTS, `song:${songId}`)
 
 			// Cache result
 			vectorCache.setTrackEmbedding(songId, song.analysis, embedding)
@@ -120,8 +124,8 @@ export class DefaultVectorizationService implements VectorizationService {
 			// Extract text from playlist analysis
 			const text = extractPlaylistText(playlist)
 
-			// Get hybrid embedding
-			const embedding = await this.embedHybrid(text)
+			// Get hybrid embedding (components are kept server-side for re-weighting)
+			const embedding = await this.embedHybrid(text, DEFAULT_WEIGHTS, `playlist:${playlistId}`)
 
 			// Cache result
 			vectorCache.setPlaylistEmbedding(playlistId, playlist, embedding)
@@ -192,11 +196,14 @@ export class DefaultVectorizationService implements VectorizationService {
 	}
 
 	/**
-	 * Generate hybrid embedding from categorized text with weights
+	 * Generate hybrid embedding from categorized text with weights.
+	 * With an itemId the service stores the per-category vectors, so new weights
+	 * can be applied later via /embed/hybrid/reweight without re-embedding.
 	 */
 	async embedHybrid(
 		text: VectorizationText,
-		weights: EmbeddingWeights = DEFAULT_WEIGHTS
+		weights: EmbeddingWeights = DEFAULT_WEIGHTS,
+		itemId?: string
 	): Promise<number[]> {
 		try {
 			logger.debug('Hybrid embedding', {
@@ -215,6 +222,7 @@ export class DefaultVectorizationService implements VectorizationService {
 						context: text.context,
 					},
 					weights,
+					item_id: itemId,
 				}),
 			})
 